@@ -0,0 +1,172 @@
+# app/core/config.py
+import os
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# backend/data: training data, caches and other local state
+_DATA_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))), "data")
+
+# --- DECISION ---
+# Policy-approved applications scoring above this are rejected
+RISK_SCORE_CUTOFF = float(os.getenv("RISK_SCORE_CUTOFF", "40"))
+
+# --- POLICY RULES ---
+# JSON file of extra/replacement policy rules (see services/policy_rules.py; "" = built-in rules only)
+POLICY_RULES_FILE = os.getenv("POLICY_RULES_FILE", "")
+
+# --- BATCH SCORING ---
+# Largest number of applications accepted by a single /apply/batch call
+APPLY_BATCH_MAX_SIZE = int(os.getenv("APPLY_BATCH_MAX_SIZE", "50000"))
+
+# --- APPLICATION WRITES (/apply) ---
+# sync (default): every /apply does its own INSERT + COMMIT and returns the row id.
+# write_behind: records are queued and INSERTed in batches (one commit per batch) and
+# /apply returns before the commit, with id null; /apply?durable=true still waits for
+# its batch's commit and gets the row id back.
+APPLICATION_WRITE_MODE = os.getenv("APPLICATION_WRITE_MODE", "sync").lower()
+WRITE_BEHIND_BATCH_SIZE = int(os.getenv("WRITE_BEHIND_BATCH_SIZE", "500"))
+WRITE_BEHIND_FLUSH_MS = float(os.getenv("WRITE_BEHIND_FLUSH_MS", "50"))
+# Queued records beyond this make /apply wait for the writer (backpressure)
+WRITE_BEHIND_MAX_QUEUED = int(os.getenv("WRITE_BEHIND_MAX_QUEUED", "10000"))
+# Batches that still fail after their retries are appended here (JSON lines) to be replayed
+WRITE_BEHIND_DEAD_LETTER_PATH = os.getenv("WRITE_BEHIND_DEAD_LETTER_PATH", os.path.join(_DATA_DIR, "write_behind_dead_letter.jsonl"))
+
+# --- ADMIN ---
+# Shared secret for operator endpoints (POST /model/reload, POST /analytics/threshold-sweep),
+# sent as X-Admin-Token.
+# "" disables those endpoints: any registered user could call them otherwise.
+ADMIN_TOKEN = os.getenv("ADMIN_TOKEN", "")
+
+# --- AUTH CACHE ---
+# Decoded tokens (kept until their exp) and users by email, so warm authenticated
+# requests skip the users query. Other workers see a changed user within the TTL.
+AUTH_CACHE_ENABLED = os.getenv("AUTH_CACHE_ENABLED", "true").lower() == "true"
+AUTH_CACHE_SIZE = int(os.getenv("AUTH_CACHE_SIZE", "10000"))
+AUTH_CACHE_TTL_SECONDS = float(os.getenv("AUTH_CACHE_TTL_SECONDS", "60"))
+
+# --- LISTINGS (/applications, /loan-history, /history) ---
+# Rows per page when the client doesn't pass ?limit=, and the most it may ask for
+PAGE_DEFAULT_LIMIT = int(os.getenv("PAGE_DEFAULT_LIMIT", "100"))
+PAGE_MAX_LIMIT = int(os.getenv("PAGE_MAX_LIMIT", "1000"))
+
+# --- MICRO-BATCHING (/apply) ---
+# Concurrent /apply calls arriving within the window share one model call
+MICRO_BATCH_ENABLED = os.getenv("MICRO_BATCH_ENABLED", "true").lower() == "true"
+MICRO_BATCH_WINDOW_MS = float(os.getenv("MICRO_BATCH_WINDOW_MS", "5"))
+MICRO_BATCH_MAX_SIZE = int(os.getenv("MICRO_BATCH_MAX_SIZE", "64"))
+
+# --- INFERENCE ---
+# Single-row scoring skips pandas and feeds CatBoost a plain feature list
+FAST_INFERENCE = os.getenv("FAST_INFERENCE", "true").lower() == "true"
+# Score batches with the NumPy copy of the trees (ml_model.npz) instead of CatBoost
+USE_COMPILED_MODEL = os.getenv("USE_COMPILED_MODEL", "true").lower() == "true"
+# Explain with exact TreeSHAP over the compiled trees instead of CatBoost's ShapValues
+TREE_SHAP = os.getenv("TREE_SHAP", "true").lower() == "true"
+
+# --- PREDICTION CACHE ---
+# Identical applicants (retries, double-submits) reuse the last score + SHAP
+PREDICTION_CACHE_ENABLED = os.getenv("PREDICTION_CACHE_ENABLED", "true").lower() == "true"
+PREDICTION_CACHE_SIZE = int(os.getenv("PREDICTION_CACHE_SIZE", "10000"))
+PREDICTION_CACHE_TTL_SECONDS = float(os.getenv("PREDICTION_CACHE_TTL_SECONDS", "300"))
+# e.g. redis://localhost:6379/0 to share one cache across uvicorn workers (needs `redis`)
+PREDICTION_CACHE_URL = os.getenv("PREDICTION_CACHE_URL", "")
+
+# --- MODEL LOADING ---
+# lazy: on the first request | background: thread started at app startup |
+# eager: at import, e.g. `gunicorn --preload` so forked workers inherit the loaded model
+MODEL_LOAD_MODE = os.getenv("MODEL_LOAD_MODE", "background").lower()
+# Compiled trees are unpacked here once and memory-mapped by every worker ("" = keep private copies)
+MODEL_MMAP_DIR = os.getenv("MODEL_MMAP_DIR", "/dev/shm/credit-risk-engine" if os.path.isdir("/dev/shm") else "")
+# How long a request waits for a model that is still loading before failing
+MODEL_LOAD_TIMEOUT_SECONDS = float(os.getenv("MODEL_LOAD_TIMEOUT_SECONDS", "60"))
+# Synthetic applicants (mock_bank) scored by every new model before it goes live
+MODEL_WARMUP_ROWS = int(os.getenv("MODEL_WARMUP_ROWS", "256"))
+# Reload automatically when ml_model.joblib changes (seconds between checks, 0 = only via POST /model/reload)
+MODEL_WATCH_INTERVAL_SECONDS = float(os.getenv("MODEL_WATCH_INTERVAL_SECONDS", "0"))
+
+# --- STATEMENT ANALYSIS ---
+# JSON {category: [keywords]} merged over the built-in salary/bounce/gambling keywords
+STATEMENT_KEYWORDS_FILE = os.getenv("STATEMENT_KEYWORDS_FILE", "")
+# JSON {name: profile} of extra statement CSV formats (see app/services/statement_formats.py)
+STATEMENT_FORMATS_FILE = os.getenv("STATEMENT_FORMATS_FILE", "")
+# Rows parsed per chunk when streaming an uploaded statement CSV (bounds peak memory)
+STATEMENT_CHUNK_ROWS = int(os.getenv("STATEMENT_CHUNK_ROWS", "50000"))
+# Uploads are copied here for the worker processes to read ("" = a directory under the system temp dir)
+STATEMENT_UPLOAD_DIR = os.getenv("STATEMENT_UPLOAD_DIR", "")
+
+# --- STATEMENT JOBS (POST /statement-jobs) ---
+# Jobs analyzed at once (they share the statement pool below), and how many jobs may wait
+STATEMENT_JOB_WORKERS = int(os.getenv("STATEMENT_JOB_WORKERS", "2"))
+STATEMENT_JOB_MAX_QUEUED = int(os.getenv("STATEMENT_JOB_MAX_QUEUED", "100"))
+
+# --- EXECUTORS (per API worker) ---
+# Process pool for pandas / statement analysis
+EXECUTOR_STATEMENT_PROCESSES = int(os.getenv("EXECUTOR_STATEMENT_PROCESSES", "2"))
+EXECUTOR_STATEMENT_MAX_QUEUED = int(os.getenv("EXECUTOR_STATEMENT_MAX_QUEUED", "16"))
+# Thread pool for model scoring (CatBoost and the NumPy trees release the GIL)
+EXECUTOR_SCORING_THREADS = int(os.getenv("EXECUTOR_SCORING_THREADS", "4"))
+EXECUTOR_SCORING_MAX_QUEUED = int(os.getenv("EXECUTOR_SCORING_MAX_QUEUED", "256"))
+# Threads for full-table analytics (threshold sweep): one at a time, so they never hold scoring threads
+EXECUTOR_ANALYTICS_THREADS = int(os.getenv("EXECUTOR_ANALYTICS_THREADS", "1"))
+EXECUTOR_ANALYTICS_MAX_QUEUED = int(os.getenv("EXECUTOR_ANALYTICS_MAX_QUEUED", "2"))
+
+# --- DATABASE POOL (per engine, per API worker) ---
+# Keep pool_size + max_overflow (x workers) under the server's / pooler's connection limit
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "5"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+# Seconds a request waits for a free connection before failing (503)
+DB_POOL_TIMEOUT_SECONDS = float(os.getenv("DB_POOL_TIMEOUT_SECONDS", "10"))
+# Connections older than this are replaced (managed Postgres drops idle ones)
+DB_POOL_RECYCLE_SECONDS = int(os.getenv("DB_POOL_RECYCLE_SECONDS", "1800"))
+# Test each connection on checkout, so a dropped one is replaced instead of failing the request
+DB_POOL_PRE_PING = os.getenv("DB_POOL_PRE_PING", "true").lower() == "true"
+
+# --- SCHEMA MIGRATIONS ---
+# Run `alembic upgrade head` when each API worker starts (false = deploys run it themselves)
+DB_MIGRATE_ON_STARTUP = os.getenv("DB_MIGRATE_ON_STARTUP", "true").lower() == "true"
+
+# --- BULK SCORING (python -m app.services.bulk_scoring) ---
+# Applicant rows per chunk: each worker holds about two chunks at a time
+BULK_SCORING_CHUNK_ROWS = int(os.getenv("BULK_SCORING_CHUNK_ROWS", "100000"))
+# Worker processes (0 = one per CPU core)
+BULK_SCORING_WORKERS = int(os.getenv("BULK_SCORING_WORKERS", "0"))
+
+# --- THRESHOLD SWEEP (POST /analytics/threshold-sweep) ---
+# Stored applications fetched per round trip (bounds memory, whatever the table size)
+SWEEP_CHUNK_ROWS = int(os.getenv("SWEEP_CHUNK_ROWS", "200000"))
+
+# --- TRAINING (python -m app.train_model) ---
+# The Home Credit application_train.csv (or anything with the same columns)
+TRAIN_DATA_PATH = os.getenv("TRAIN_DATA_PATH", os.path.join(_DATA_DIR, "application_train.csv"))
+# Engineered feature matrices, memory-mapped by later runs on the same file ("" = rebuild every run)
+TRAIN_FEATURE_CACHE_DIR = os.getenv("TRAIN_FEATURE_CACHE_DIR", os.path.join(_DATA_DIR, "feature_cache"))
+# CSV rows parsed at a time while building the features (bounds peak memory)
+TRAIN_CHUNK_ROWS = int(os.getenv("TRAIN_CHUNK_ROWS", "100000"))
+TRAIN_TEST_SIZE = float(os.getenv("TRAIN_TEST_SIZE", "0.2"))
+TRAIN_RANDOM_SEED = int(os.getenv("TRAIN_RANDOM_SEED", "42"))
+# CatBoost hyperparameters
+TRAIN_ITERATIONS = int(os.getenv("TRAIN_ITERATIONS", "500"))
+TRAIN_DEPTH = int(os.getenv("TRAIN_DEPTH", "6"))
+TRAIN_LEARNING_RATE = float(os.getenv("TRAIN_LEARNING_RATE", "0.1"))
+# Defaulters are ~8% of the data: weight their mistakes ~11x
+TRAIN_SCALE_POS_WEIGHT = float(os.getenv("TRAIN_SCALE_POS_WEIGHT", "11"))
+# CatBoost threads (-1 = every core)
+TRAIN_THREAD_COUNT = int(os.getenv("TRAIN_THREAD_COUNT", "-1"))
+
+# --- TUNING (python -m app.tune_model) ---
+# JSON {catboost parameter: [values]} to search ("" = the built-in grid in app/tune_model.py)
+TUNE_GRID_FILE = os.getenv("TUNE_GRID_FILE", "")
+# Candidates drawn at random from the grid (0 = every combination)
+TUNE_TRIALS = int(os.getenv("TUNE_TRIALS", "0"))
+TUNE_FOLDS = int(os.getenv("TUNE_FOLDS", "5"))
+# CatBoost threads per fit; fits run side by side on TUNE_WORKERS processes (0 = cores / threads per fit)
+TUNE_THREADS_PER_TRIAL = int(os.getenv("TUNE_THREADS_PER_TRIAL", "2"))
+TUNE_WORKERS = int(os.getenv("TUNE_WORKERS", "0"))
+# Stop a fit when the loss on its early-stopping rows hasn't improved for this many trees (0 = fit every iteration)
+TUNE_EARLY_STOPPING_ROUNDS = int(os.getenv("TUNE_EARLY_STOPPING_ROUNDS", "50"))
+# Share of each fold's fitting rows held back to decide when to stop (never the rows AUC is measured on)
+TUNE_EARLY_STOPPING_FRACTION = float(os.getenv("TUNE_EARLY_STOPPING_FRACTION", "0.1"))
+# Candidates within this much of the best CV AUC are ranked by single-row latency instead
+TUNE_AUC_TOLERANCE = float(os.getenv("TUNE_AUC_TOLERANCE", "0.002"))
+TUNE_RESULTS_PATH = os.getenv("TUNE_RESULTS_PATH", os.path.join(_DATA_DIR, "tuning_results.json"))
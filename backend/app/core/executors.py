@@ -0,0 +1,107 @@
+# app/core/executors.py
+# Separately sized pools for the different kinds of blocking work, so one heavy
+# workload can't starve the others (or the event loop, which keeps serving
+# login and history reads through the async database engine):
+#   statement  processes  pandas parsing + statement analysis (holds the GIL)
+#   scoring    threads    CatBoost / compiled-tree scoring (releases the GIL)
+#   analytics  threads    long table scans (threshold sweep), off the scoring pool
+# Async routes `await executors.<pool>.run(fn, ...)`. When a pool already has
+# max_queued calls waiting, run() raises ExecutorSaturated (-> 503) instead of
+# letting the backlog grow.
+import asyncio
+import multiprocessing
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+from . import config, metrics
+
+SECONDS_BUCKETS = [0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60]
+
+class ExecutorSaturated(Exception):
+    """The pool's queue is full; the client should retry later."""
+
+class ManagedExecutor:
+    def __init__(self, name, workers, max_queued, processes=False):
+        self.name = name
+        self.workers = max(1, int(workers))
+        self.max_queued = max(0, int(max_queued))
+        self.processes = processes
+
+        self._executor = None
+        self._lock = threading.Lock()
+        self._in_flight = 0
+
+        self.in_flight = metrics.gauge(f"executor_{name}_in_flight", "Calls submitted and not finished")
+        self.queued = metrics.gauge(f"executor_{name}_queued", "Calls waiting for a free worker")
+        self.saturation = metrics.gauge(f"executor_{name}_saturation", "Busy workers / workers (1.0 = every worker busy)")
+        self.rejected = metrics.counter(f"executor_{name}_rejected_total", "Calls refused because the queue was full")
+        self.seconds = metrics.histogram(f"executor_{name}_seconds", SECONDS_BUCKETS, "Submit to result, queueing included")
+
+    # --- PUBLIC API ---
+    def submit(self, fn, *args, **kwargs):
+        """concurrent.futures.Future of fn(*args, **kwargs). Never rejects: for callers with their own limits."""
+        executor = self._ensure_started()
+        self._track(+1)
+        started = time.perf_counter()
+        try:
+            future = executor.submit(fn, *args, **kwargs)
+        except Exception:
+            self._track(-1)
+            raise
+        future.add_done_callback(lambda _: self._done(started))
+        return future
+
+    async def run(self, fn, *args, **kwargs):
+        """Awaits fn(*args, **kwargs) on the pool. Raises ExecutorSaturated when max_queued calls are already waiting."""
+        if self._in_flight - self.workers >= self.max_queued:
+            self.rejected.inc()
+            raise ExecutorSaturated(f"The {self.name} pool is saturated ({self._in_flight} calls in flight)")
+        return await asyncio.wrap_future(self.submit(fn, *args, **kwargs))
+
+    def shutdown(self, wait=True):
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=wait, cancel_futures=not wait)
+
+    def status(self):
+        return {"workers": self.workers, "in_flight": self._in_flight, "max_queued": self.max_queued}
+
+    # --- INTERNALS ---
+    def _ensure_started(self):
+        if self._executor is not None:
+            return self._executor
+        with self._lock:
+            if self._executor is None:
+                if self.processes:
+                    # spawn: the children don't inherit the API's threads, DB connections or model
+                    self._executor = ProcessPoolExecutor(max_workers=self.workers, mp_context=multiprocessing.get_context("spawn"))
+                else:
+                    self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix=self.name)
+            return self._executor
+
+    def _track(self, delta):
+        with self._lock:
+            self._in_flight += delta
+            in_flight = self._in_flight
+        self.in_flight.set(in_flight)
+        self.queued.set(max(0, in_flight - self.workers))
+        self.saturation.set(min(in_flight, self.workers) / self.workers)
+
+    def _done(self, started):
+        self.seconds.observe(time.perf_counter() - started)
+        self._track(-1)
+
+statement = ManagedExecutor("statement", config.EXECUTOR_STATEMENT_PROCESSES, config.EXECUTOR_STATEMENT_MAX_QUEUED, processes=True)
+scoring = ManagedExecutor("scoring", config.EXECUTOR_SCORING_THREADS, config.EXECUTOR_SCORING_MAX_QUEUED)
+analytics = ManagedExecutor("analytics", config.EXECUTOR_ANALYTICS_THREADS, config.EXECUTOR_ANALYTICS_MAX_QUEUED)
+
+POOLS = [statement, scoring, analytics]
+
+def status():
+    return {pool.name: pool.status() for pool in POOLS}
+
+def shutdown():
+    for pool in POOLS:
+        pool.shutdown()
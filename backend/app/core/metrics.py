@@ -0,0 +1,106 @@
+# app/core/metrics.py
+# Tiny in-process metrics registry (counters, gauges, histograms).
+# Everything is exposed as JSON on GET /metrics.
+import bisect
+import threading
+
+_lock = threading.Lock()
+_registry = {}
+
+class Counter:
+    def __init__(self, name, description=""):
+        self.name = name
+        self.description = description
+        self.value = 0
+
+    def inc(self, amount=1):
+        with _lock:
+            self.value += amount
+
+    def snapshot(self):
+        return {"type": "counter", "value": self.value}
+
+class Gauge:
+    def __init__(self, name, description=""):
+        self.name = name
+        self.description = description
+        self.value = 0
+
+    def set(self, value):
+        with _lock:
+            self.value = value
+
+    def inc(self, amount=1):
+        with _lock:
+            self.value += amount
+
+    def dec(self, amount=1):
+        with _lock:
+            self.value -= amount
+
+    def snapshot(self):
+        return {"type": "gauge", "value": self.value}
+
+class Histogram:
+    def __init__(self, name, buckets, description=""):
+        self.name = name
+        self.description = description
+        self.buckets = sorted(buckets)
+        # One slot per bucket upper bound, plus the "+Inf" overflow slot
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value):
+        slot = bisect.bisect_left(self.buckets, value)
+        with _lock:
+            self.counts[slot] += 1
+            self.count += 1
+            self.sum += value
+
+    def quantile(self, q):
+        # Upper bound of the bucket holding the q-th observation (good enough for tuning)
+        if self.count == 0:
+            return 0.0
+        target = q * self.count
+        running = 0
+        for bound, bucket_count in zip(self.buckets + [float("inf")], self.counts):
+            running += bucket_count
+            if running >= target:
+                return bound
+        return float("inf")
+
+    def snapshot(self):
+        bounds = [str(b) for b in self.buckets] + ["+Inf"]
+        return {
+            "type": "histogram",
+            "count": self.count,
+            "sum": self.sum,
+            "mean": self.sum / self.count if self.count else 0.0,
+            "p50": self.quantile(0.5),
+            "p99": self.quantile(0.99),
+            "buckets": dict(zip(bounds, self.counts)),
+        }
+
+def _register(cls, name, *args, **kwargs):
+    # Same name -> same metric object, so modules can declare metrics at import time
+    with _lock:
+        metric = _registry.get(name)
+        if metric is None:
+            metric = cls(name, *args, **kwargs)
+            _registry[name] = metric
+        return metric
+
+def counter(name, description=""):
+    return _register(Counter, name, description)
+
+def gauge(name, description=""):
+    return _register(Gauge, name, description)
+
+def histogram(name, buckets, description=""):
+    return _register(Histogram, name, buckets, description)
+
+def snapshot():
+    with _lock:
+        metrics = dict(_registry)
+    return {name: metric.snapshot() for name, metric in sorted(metrics.items())}
@@ -1,4 +1,8 @@
 # app/crud.py
+import asyncio
+
+from sqlalchemy import insert, select
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 from . import models, schemas
 
@@ -23,6 +27,16 @@ def create_loan_application(db: Session, application: schemas.LoanApplicationCre
     
     return db_application
 
+def bulk_create_loan_applications(db: Session, records: list):
+    """
+    Saves many scored applications with ONE multi-row INSERT ... RETURNING.
+    `records` is a list of column dicts. Returns the ORM rows (with ids) in input order.
+    """
+    if not records:
+        return []
+    result = db.scalars(insert(models.LoanApplication).returning(models.LoanApplication, sort_by_parameter_order=True), records)
+    return result.all()
+
 # --- USER CRUD ---
 from . import auth_utils
 
@@ -62,4 +76,78 @@ def create_history_entry(db: Session, history: schemas.RiskAnalysisHistoryCreate
     return db_history
 
 def get_user_history(db: Session, user_id: int):
-    return db.query(models.RiskAnalysisHistory).filter(models.RiskAnalysisHistory.user_id == user_id).order_by(models.RiskAnalysisHistory.created_at.desc()).all()
\ No newline at end of file
+    return db.query(models.RiskAnalysisHistory).filter(models.RiskAnalysisHistory.user_id == user_id).order_by(models.RiskAnalysisHistory.created_at.desc()).all()
+
+def get_statement_job(db: Session, job_id: str):
+    return db.query(models.StatementJob).filter(models.StatementJob.id == job_id).first()
+
+def get_history_entry(db: Session, history_id: int):
+    return db.query(models.RiskAnalysisHistory).filter(models.RiskAnalysisHistory.id == history_id).first()
+
+# --- ASYNC CRUD (API routes, on the asyncio engine) ---
+# Same behaviour as the sync functions above. Password hashing is CPU-bound,
+# so it runs in a thread rather than on the event loop.
+async def save_loan_application_async(db: AsyncSession, record: dict):
+    """Saves one scored application (a column dict, see bulk_create_loan_applications) and returns the row."""
+    db_application = models.LoanApplication(**record)
+    db.add(db_application)
+    await db.commit()
+    await db.refresh(db_application)
+    return db_application
+
+async def bulk_create_loan_applications_async(db: AsyncSession, records: list):
+    if not records:
+        return []
+    result = await db.scalars(insert(models.LoanApplication).returning(models.LoanApplication, sort_by_parameter_order=True), records)
+    return result.all()
+
+async def get_user_by_email_async(db: AsyncSession, email: str):
+    result = await db.scalars(select(models.User).where(models.User.email == email).limit(1))
+    return result.first()
+
+async def create_user_async(db: AsyncSession, user: schemas.UserCreate):
+    hashed_password = await asyncio.to_thread(auth_utils.get_password_hash, user.password)
+    db_user = models.User(
+        email=user.email,
+        hashed_password=hashed_password,
+        full_name=user.full_name
+    )
+    db.add(db_user)
+    await db.commit()
+    await db.refresh(db_user)
+    return db_user
+
+async def authenticate_user_async(db: AsyncSession, email: str, password: str):
+    user = await get_user_by_email_async(db, email)
+    if not user:
+        return False
+    if not await asyncio.to_thread(auth_utils.verify_password, password, user.hashed_password):
+        return False
+    return user
+
+async def create_history_entry_async(db: AsyncSession, history: schemas.RiskAnalysisHistoryCreate):
+    db_history = models.RiskAnalysisHistory(
+        user_id=history.user_id,
+        filename=history.filename,
+        result=history.result
+    )
+    db.add(db_history)
+    await db.commit()
+    await db.refresh(db_history)
+    return db_history
+
+async def get_statement_job_async(db: AsyncSession, job_id: str):
+    return await db.get(models.StatementJob, job_id)
+
+async def get_history_entry_async(db: AsyncSession, history_id: int):
+    return await db.get(models.RiskAnalysisHistory, history_id)
+
+# --- LISTINGS (newest first, paged by app/pagination.py) ---
+def loan_applications_query(user_id: int = None):
+    stmt = select(models.LoanApplication)
+    if user_id is not None:
+        stmt = stmt.where(models.LoanApplication.user_id == user_id)
+    return stmt
+
+def user_history_query(user_id: int):
+    return select(models.RiskAnalysisHistory).where(models.RiskAnalysisHistory.user_id == user_id)
@@ -1,29 +1,90 @@
 # app/main.py
 import os
 from dotenv import load_dotenv
-from fastapi import FastAPI, Depends, HTTPException, status, UploadFile, File
+from fastapi import FastAPI, Depends, HTTPException, status, UploadFile, File, Query, Header
 from fastapi.middleware.cors import CORSMiddleware
-from sqlalchemy.orm import Session
+from fastapi.responses import JSONResponse
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
 from fastapi.security import OAuth2PasswordBearer, OAuth2PasswordRequestForm
 from typing import List, Optional
-import pandas as pd
-import io
-import json
 import random
-from datetime import timedelta
+import secrets
+from datetime import datetime, timedelta, timezone
+from contextlib import asynccontextmanager
+from functools import partial
 from sqlalchemy import text
+from starlette.concurrency import run_in_threadpool
 
-from . import models, database, schemas, crud, rule_engine, auth_utils
+from . import models, database, schemas, crud, rule_engine, auth_utils, pagination
 from . import ml_service
 from . import mock_bank
-from .services import statement_analyzer
+from .core import config, executors, metrics
+from .services.micro_batcher import MicroBatcher
+from .services import auth_cache, statement_analyzer, statement_ingest, statement_jobs, threshold_sweep
+from .services.write_behind import WriteBehindBuffer, insert_applications
 
 load_dotenv()
 
-# Create the tables in the database (if they don't exist)
-models.Base.metadata.create_all(bind=database.engine)
+# Merges concurrent /apply calls into shared model calls
+scoring_batcher = MicroBatcher(
+    partial(ml_service.predict_loan_risk_batch, with_version=True),
+    max_batch_size=config.MICRO_BATCH_MAX_SIZE,
+    window_ms=config.MICRO_BATCH_WINDOW_MS,
+    name="scoring",
+)
+
+# Scored /apply records, INSERTed in batches off the request path
+application_writer = WriteBehindBuffer(
+    insert_applications,
+    batch_size=config.WRITE_BEHIND_BATCH_SIZE,
+    flush_ms=config.WRITE_BEHIND_FLUSH_MS,
+    max_queued=config.WRITE_BEHIND_MAX_QUEUED,
+    dead_letter_path=config.WRITE_BEHIND_DEAD_LETTER_PATH,
+    name="application_writes",
+)
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Startup (per worker, not at import): bring the schema up to date
+    if config.DB_MIGRATE_ON_STARTUP:
+        await run_in_threadpool(database.upgrade_schema)
+    # The model loads behind the scenes; /ready says when this worker can score
+    if config.MODEL_LOAD_MODE == "background":
+        ml_service.registry.start_background_load()
+    ml_service.registry.watch(config.MODEL_WATCH_INTERVAL_SECONDS)
+    if config.APPLICATION_WRITE_MODE == "write_behind":
+        application_writer.start()
+    yield
+    # Shutdown: score anything still queued, then stop the worker
+    scoring_batcher.stop()
+    # Write every queued application before the database engine goes away
+    await application_writer.stop()
+    # Running statement jobs finish; queued ones are marked FAILED
+    await run_in_threadpool(statement_jobs.jobs.stop)
+    await run_in_threadpool(executors.shutdown)
+    await database.async_engine.dispose()
+
+app = FastAPI(title="Loan Default Prediction API", lifespan=lifespan)
 
-app = FastAPI(title="Loan Default Prediction API")
+@app.exception_handler(executors.ExecutorSaturated)
+async def executor_saturated(request, exc: executors.ExecutorSaturated):
+    # A full pool sheds load instead of queueing without bound
+    return JSONResponse(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, content={"detail": str(exc)}, headers={"Retry-After": "1"})
+
+@app.exception_handler(ml_service.ModelLoading)
+async def model_loading(request, exc: ml_service.ModelLoading):
+    # The background load is still running; /ready says when to come back
+    return JSONResponse(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, content={"detail": "Model is loading, try again"}, headers={"Retry-After": "5"})
+
+@app.exception_handler(pagination.InvalidCursor)
+async def invalid_cursor(request, exc: pagination.InvalidCursor):
+    return JSONResponse(status_code=status.HTTP_400_BAD_REQUEST, content={"detail": str(exc)})
+
+@app.exception_handler(PoolTimeoutError)
+async def db_pool_exhausted(request, exc: PoolTimeoutError):
+    # No database connection freed up within DB_POOL_TIMEOUT_SECONDS
+    return JSONResponse(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, content={"detail": "Database busy, try again"}, headers={"Retry-After": "1"})
 
 # --- CORS CONFIGURATION ---
 origins_str = os.getenv("ALLOWED_ORIGINS", "http://localhost:5173,http://127.0.0.1:5173")
@@ -35,75 +96,99 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    # Listing endpoints return the next page's cursor in a header
+    expose_headers=[pagination.NEXT_CURSOR_HEADER],
 )
 
 # --- AUTH CONFIG ---
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="login")
 oauth2_scheme_optional = OAuth2PasswordBearer(tokenUrl="login", auto_error=False)
 
-def get_db():
-    db = database.SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
+get_db = database.get_async_db
 
 # --- AUTH DEPENDENCIES ---
-def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)):
+async def get_current_user(token: str = Depends(oauth2_scheme), db: AsyncSession = Depends(get_db)):
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
         headers={"WWW-Authenticate": "Bearer"},
     )
+    # Warm tokens and users come from the cache: no JWT decode, no users query
     try:
-        payload = auth_utils.jwt.decode(token, auth_utils.SECRET_KEY, algorithms=[auth_utils.ALGORITHM])
-        email: str = payload.get("sub")
-        if email is None:
-            raise credentials_exception
+        user = await auth_cache.cache.authenticate(db, token)
     except auth_utils.jwt.JWTError:
         raise credentials_exception
-    
-    user = crud.get_user_by_email(db, email=email)
     if user is None:
         raise credentials_exception
     return user
 
-def get_optional_user(token: str = Depends(oauth2_scheme_optional), db: Session = Depends(get_db)):
+async def get_optional_user(token: str = Depends(oauth2_scheme_optional), db: AsyncSession = Depends(get_db)):
     if not token:
         return None
     try:
-        payload = auth_utils.jwt.decode(token, auth_utils.SECRET_KEY, algorithms=[auth_utils.ALGORITHM])
-        email: str = payload.get("sub")
-        if email is None:
-            return None
-        return crud.get_user_by_email(db, email=email)
-    except:
+        return await auth_cache.cache.authenticate(db, token)
+    except auth_utils.jwt.JWTError:
         return None
 
+def require_admin(x_admin_token: Optional[str] = Header(None)):
+    # Operator endpoints: a registered user isn't enough (anyone can /register)
+    if not config.ADMIN_TOKEN:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Admin endpoints are disabled (ADMIN_TOKEN is not set)")
+    if not x_admin_token or not secrets.compare_digest(x_admin_token, config.ADMIN_TOKEN):
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Invalid admin token")
+
 # --- ROUTES ---
 
 @app.get("/")
 def read_root():
     return {"message": "Credit Risk Engine API is running"}
 
+@app.get("/health")
+def health():
+    # Liveness: the process is up, whatever state the model is in
+    return {"status": "ok", "model": ml_service.registry.status()}
+
+@app.get("/ready")
+def ready():
+    # Readiness: only route traffic here once the model is loaded
+    model_status = ml_service.registry.status()
+    if model_status["state"] != "ready":
+        raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail=model_status)
+    return {"status": "ready", "model": model_status}
+
+@app.get("/model")
+def read_model():
+    return ml_service.registry.status()
+
+@app.post("/model/reload", status_code=status.HTTP_202_ACCEPTED)
+def reload_model(_: None = Depends(require_admin)):
+    # Loads + warms the new model in the background; traffic keeps using the old one until the swap
+    if not ml_service.registry.start_reload():
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="A model reload is already running")
+    return {"status": "reloading", "model": ml_service.registry.status()}
+
+@app.get("/metrics")
+def read_metrics():
+    return metrics.snapshot()
+
 @app.get("/db-test")
-def test_db(db: Session = Depends(get_db)):
+async def test_db(db: AsyncSession = Depends(get_db)):
     try:
-        result = db.execute(text("SELECT 1"))
+        result = await db.execute(text("SELECT 1"))
         return {"status": "success", "result": result.scalar()}
     except Exception as e:
         return {"status": "error", "message": str(e)}
 
 @app.post("/register", response_model=schemas.UserResponse)
-def register(user: schemas.UserCreate, db: Session = Depends(get_db)):
-    db_user = crud.get_user_by_email(db, email=user.email)
+async def register(user: schemas.UserCreate, db: AsyncSession = Depends(get_db)):
+    db_user = await crud.get_user_by_email_async(db, email=user.email)
     if db_user:
         raise HTTPException(status_code=400, detail="Email already registered")
-    return crud.create_user(db=db, user=user)
+    return await crud.create_user_async(db=db, user=user)
 
 @app.post("/login", response_model=schemas.Token)
-def login(form_data: OAuth2PasswordRequestForm = Depends(), db: Session = Depends(get_db)):
-    user = crud.authenticate_user(db, form_data.username, form_data.password)
+async def login(form_data: OAuth2PasswordRequestForm = Depends(), db: AsyncSession = Depends(get_db)):
+    user = await crud.authenticate_user_async(db, form_data.username, form_data.password)
     if not user:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
@@ -116,9 +201,20 @@ def login(form_data: OAuth2PasswordRequestForm = Depends(), db: Session = Depend
     )
     return {"access_token": access_token, "token_type": "bearer"}
 
+# --- LISTINGS ---
+# Newest first, `limit` rows per page. Pass the X-Next-Cursor response header
+# back as ?cursor= for the next page; the last page has no X-Next-Cursor.
+PageLimit = Query(config.PAGE_DEFAULT_LIMIT, ge=1, le=config.PAGE_MAX_LIMIT)
+
 @app.get("/history", response_model=List[schemas.RiskAnalysisHistoryResponse])
-def read_history(current_user: models.User = Depends(get_current_user), db: Session = Depends(get_db)):
-    return crud.get_user_history(db, user_id=current_user.id)
+async def read_history(
+    cursor: Optional[str] = None,
+    limit: int = PageLimit,
+    current_user: models.User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db),
+):
+    page = await pagination.paginate(db, crud.user_history_query(current_user.id), models.RiskAnalysisHistory, limit, cursor)
+    return pagination.streaming_response(page, schemas.RiskAnalysisHistoryResponse)
 
 @app.post("/verify-income")
 def verify_income(claimed_salary: float):
@@ -140,117 +236,209 @@ def verify_income(claimed_salary: float):
 async def analyze_statement_file(
     file: UploadFile = File(...), 
     current_user: Optional[models.User] = Depends(get_optional_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     try:
-        contents = await file.read()
-        df = pd.read_csv(io.BytesIO(contents))
-        
-        # --- CLEAN UP HEADERS ---
-        df.columns = [c.strip().lower() for c in df.columns]
-        
-        column_map = {
-            "date": ["date", "txn_date", "transaction_date", "valuedt"],
-            "amount": ["amount", "txn_amount", "transaction_amount"],
-            "type": ["type", "txn_type", "dr_cr", "drcr"],
-            "narration": ["narration", "description", "particulars", "remarks"]
-        }
-
-        for standard, variations in column_map.items():
-            for var in variations:
-                if var in df.columns:
-                    df.rename(columns={var: standard}, inplace=True)
-                    break
-        
-        if "chq/ref.no." in df.columns:
-            df.rename(columns={"chq/ref.no.": "ref_no"}, inplace=True)
-
-        # --- SPECIAL HANDLING: Split Amount Columns ---
-        if "amount" not in df.columns and "withdrawalamt" in df.columns and "depositamt" in df.columns:
-            def merge_amounts(row):
-                w = pd.to_numeric(row['withdrawalamt'], errors='coerce') or 0
-                d = pd.to_numeric(row['depositamt'], errors='coerce') or 0
-                if d > 0: return d, "CREDIT"
-                elif w > 0: return w, "DEBIT"
-                else: return 0, "UNKNOWN"
-
-            df[['amount', 'type']] = df.apply(lambda row: pd.Series(merge_amounts(row)), axis=1)
-
-        required = ["date", "amount", "type", "narration"]
-        if not all(col in df.columns for col in required):
-             missing = [c for c in required if c not in df.columns]
-             raise HTTPException(status_code=400, detail=f"CSV missing columns: {missing}. Found: {list(df.columns)}")
-
-        transactions = df.to_dict(orient="records")
-        analysis_result = statement_analyzer.analyze_statement({"transactions": transactions})
+        # Parsed chunk by chunk (never fully in memory) by a worker process of the statement pool
+        path = await run_in_threadpool(statement_ingest.save_upload, file.file)
+        try:
+            analysis_result = await executors.statement.run(statement_ingest.analyze_csv, path)
+        except statement_ingest.StatementFormatError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        finally:
+            statement_ingest.discard_upload(path)
         
         # --- SAVE HISTORY IF LOGGED IN ---
         if current_user:
-            # Convert result to JSON string
-            result_json = json.dumps(analysis_result)
-            crud.create_history_entry(db, schemas.RiskAnalysisHistoryCreate(
+            await crud.create_history_entry_async(db, schemas.RiskAnalysisHistoryCreate(
                 user_id=current_user.id,
                 filename=file.filename,
-                result=result_json
+                result=analysis_result
             ))
         # ---------------------------------
 
         return analysis_result
         
+    except (executors.ExecutorSaturated, PoolTimeoutError):
+        raise
     except Exception as e:
         print(f"Error: {e}")
         raise HTTPException(status_code=400, detail=f"Error reading file: {str(e)}")
 
+@app.post("/statement-jobs", response_model=schemas.StatementJobResponse, status_code=status.HTTP_202_ACCEPTED)
+async def submit_statement_job(
+    file: UploadFile = File(...),
+    current_user: Optional[models.User] = Depends(get_optional_user)
+):
+    # Returns straight away; the analysis runs in a worker process. Poll GET /statement-jobs/{id}
+    try:
+        job = await run_in_threadpool(
+            statement_jobs.jobs.submit, file.file, file.filename,
+            user_id=current_user.id if current_user else None
+        )
+    except statement_jobs.QueueFull as e:
+        raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail=str(e), headers={"Retry-After": "5"})
+    except statement_ingest.StatementFormatError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return job
+
+@app.get("/statement-jobs/{job_id}", response_model=schemas.StatementJobResponse)
+async def read_statement_job(
+    job_id: str,
+    current_user: Optional[models.User] = Depends(get_optional_user),
+    db: AsyncSession = Depends(get_db)
+):
+    job = await crud.get_statement_job_async(db, job_id)
+    # Someone else's job looks the same as a missing one
+    if job is None or (job.user_id is not None and (current_user is None or current_user.id != job.user_id)):
+        raise HTTPException(status_code=404, detail="Statement job not found")
+
+    response = schemas.StatementJobResponse.model_validate(job)
+    if job.history_id is not None:
+        history = await crud.get_history_entry_async(db, job.history_id)
+        response.result = history.result
+    return response
+
+# --- DECISION HELPERS ---
+RISK_SCORE_CUTOFF = config.RISK_SCORE_CUTOFF
+
+def policy_rejection_factors(policy_reason: str):
+    return [{"feature": "Policy", "shap_score": 1.0, "reason": policy_reason}]
+
+def decide(risk_score: float):
+    if risk_score > RISK_SCORE_CUTOFF:
+        return "REJECTED"
+    return "APPROVED"
+
+def application_record(application: schemas.LoanApplicationCreate, final_status, risk_score, risk_factors, user_id, model_version=None):
+    return dict(
+        full_name=application.full_name,
+        income=application.income,
+        loan_amount=application.loan_amount,
+        credit_score=application.credit_score,
+        age=application.age,
+        years_employed=application.years_employed,
+        gender=application.gender,
+        status=final_status,
+        risk_score=risk_score,
+        user_id=user_id,
+        risk_factors=risk_factors,
+        model_version=model_version,
+        # Stamped at decision time, so a write-behind row matches what the caller was told
+        created_at=datetime.now(timezone.utc)
+    )
+
 @app.post("/apply", response_model=schemas.LoanApplicationResponse)
-def apply_for_loan(
+async def apply_for_loan(
     application: schemas.LoanApplicationCreate, 
+    durable: bool = False,
     current_user: Optional[models.User] = Depends(get_optional_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     # 1. Run Policy Check
     policy_status, policy_reason = rule_engine.run_policy_check(application)
     
     if policy_status == "REJECTED":
         risk_score = 100
-        risk_factors = [{"feature": "Policy", "shap_score": 1.0, "reason": policy_reason}]
+        risk_factors = policy_rejection_factors(policy_reason)
         final_status = "REJECTED"
+        model_version = None
     else:
-        # 2. Run ML Model
-        risk_score, risk_factors = ml_service.predict_loan_risk(application)
+        # 2. Run ML Model (shared with other in-flight requests when micro-batching is on)
+        if config.MICRO_BATCH_ENABLED:
+            risk_score, risk_factors, model_version = await scoring_batcher.predict_async(application)
+        else:
+            risk_score, risk_factors, model_version = await executors.scoring.run(ml_service.predict_loan_risk, application, with_version=True)
         
         # 3. Decision Logic
-        if risk_score > 40:
-            final_status = "REJECTED"
-        else:
-            final_status = "APPROVED"
+        final_status = decide(risk_score)
 
     # 4. Save to Database
-    db_application = models.LoanApplication(
-        full_name=application.full_name,
-        income=application.income,
-        loan_amount=application.loan_amount,
-        credit_score=application.credit_score,
-        age=application.age,
-        years_employed=application.years_employed,
-        gender=application.gender,
-        status=final_status,
-        risk_score=risk_score,
+    record = application_record(
+        application, final_status, risk_score, risk_factors,
         user_id=current_user.id if current_user else None,
-        risk_factors=json.dumps(risk_factors) # Save as JSON string
+        model_version=model_version
     )
-    db.add(db_application)
-    db.commit()
-    db.refresh(db_application)
-    
-    return db_application
+    if config.APPLICATION_WRITE_MODE != "write_behind":
+        return await crud.save_loan_application_async(db, record)
+    if durable:
+        # Waits for the batch commit: the row is on disk and has its id
+        return await application_writer.save(record, durable=True)
+    await application_writer.save(record)
+    return schemas.LoanApplicationResponse.model_validate(record)
+
+@app.post("/apply/batch", response_model=List[schemas.LoanApplicationResponse])
+async def apply_for_loan_batch(
+    batch: schemas.LoanApplicationBatchCreate,
+    current_user: Optional[models.User] = Depends(get_optional_user),
+    db: AsyncSession = Depends(get_db)
+):
+    applications = batch.applications
+    if len(applications) > config.APPLY_BATCH_MAX_SIZE:
+        raise HTTPException(status_code=413, detail=f"Batch too large. Max allowed: {config.APPLY_BATCH_MAX_SIZE}")
+
+    # 1-3. Policy + model + decisions on the scoring pool
+    records = await executors.scoring.run(score_application_batch, applications, current_user.id if current_user else None)
+
+    # 4. Save everything with a single bulk insert
+    db_applications = await crud.bulk_create_loan_applications_async(db, records)
+    response = [schemas.LoanApplicationResponse.model_validate(row) for row in db_applications]
+    await db.commit()
+
+    return response
+
+def score_application_batch(applications, user_id):
+    # 1. Run Policy Check over the whole batch
+    policy_results = rule_engine.run_policy_check_batch(applications)
+
+    # 2. Only the survivors go through the model (one predict_proba + one SHAP call)
+    survivors = [i for i, (policy_status, _) in enumerate(policy_results) if policy_status != "REJECTED"]
+    scores = ml_service.predict_loan_risk_batch([applications[i] for i in survivors], with_version=True)
+    scored = dict(zip(survivors, scores))
+
+    # 3. Decision Logic per row
+    records = []
+    for i, application in enumerate(applications):
+        if i in scored:
+            risk_score, risk_factors, model_version = scored[i]
+            final_status = decide(risk_score)
+        else:
+            risk_score = 100
+            risk_factors = policy_rejection_factors(policy_results[i][1])
+            final_status = "REJECTED"
+            model_version = None
+        records.append(application_record(application, final_status, risk_score, risk_factors, user_id, model_version))
+    return records
 
 @app.get("/applications", response_model=List[schemas.LoanApplicationResponse])
-def read_applications(skip: int = 0, limit: int = 100, db: Session = Depends(get_db)):
-    applications = db.query(models.LoanApplication).offset(skip).limit(limit).all()
-    return applications
+async def read_applications(cursor: Optional[str] = None, limit: int = PageLimit, db: AsyncSession = Depends(get_db)):
+    page = await pagination.paginate(db, crud.loan_applications_query(), models.LoanApplication, limit, cursor)
+    return pagination.streaming_response(page, schemas.LoanApplicationResponse)
 
 @app.get("/loan-history", response_model=List[schemas.LoanApplicationResponse])
-def read_loan_history(current_user: models.User = Depends(get_current_user), db: Session = Depends(get_db)):
+async def read_loan_history(
+    cursor: Optional[str] = None,
+    limit: int = PageLimit,
+    current_user: models.User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db),
+):
     # Fetch user's loan applications
-    applications = db.query(models.LoanApplication).filter(models.LoanApplication.user_id == current_user.id).order_by(models.LoanApplication.created_at.desc()).all()
-    return applications
\ No newline at end of file
+    page = await pagination.paginate(db, crud.loan_applications_query(current_user.id), models.LoanApplication, limit, cursor)
+    return pagination.streaming_response(page, schemas.LoanApplicationResponse)
+
+# --- ANALYTICS ---
+@app.post("/analytics/threshold-sweep", response_model=schemas.ThresholdSweepResponse)
+async def sweep_thresholds(request: schemas.ThresholdSweepRequest, _: None = Depends(require_admin)):
+    # Every combination of the grid in one pass over loan_applications (see services/threshold_sweep.py).
+    # Portfolio-wide numbers, so operators only.
+    sweep = threshold_sweep.ThresholdSweep(
+        request.credit_score_cutoffs,
+        request.income_multiples,
+        request.risk_thresholds,
+        score_bins=request.score_bins,
+        rescore=request.rescore,
+    )
+    # Its own single-slot pool: a full scan (with rescoring) must not hold a /apply scoring thread
+    return await executors.analytics.run(
+        threshold_sweep.sweep_stored_applications, sweep, request.created_after, request.created_before
+    )
@@ -1,30 +1,88 @@
 # app/ml_service.py
-import joblib
+import numpy as np
 import pandas as pd
 import os
-from catboost import Pool
 
-MODEL_PATH = os.path.join(os.path.dirname(__file__), "ml_model.joblib")
+from .core import config
+from . import mock_bank
+from .services.model_registry import ModelRegistry
+from .services.prediction_cache import PredictionCache
 
 try:
-    model = joblib.load(MODEL_PATH)
-    print("✅ ML Model Loaded Successfully")
-except Exception as e:
-    print(f"❌ Failed to load model: {e}")
-    model = None
+    from catboost import Pool
+except ImportError:
+    # Workers can serve from ml_model.npz alone, without the CatBoost runtime
+    Pool = None
 
-def predict_loan_risk(input_data):
-    if model is None:
-        return 0, []
+MODEL_PATH = os.path.join(os.path.dirname(__file__), "ml_model.joblib")
+COMPILED_MODEL_PATH = os.path.join(os.path.dirname(__file__), "ml_model.npz")
+
+# The exact column order the model was trained with (Crucial!)
+EXPECTED_ORDER = [
+    "NAME_CONTRACT_TYPE", "CODE_GENDER", "AMT_INCOME_TOTAL",
+    "AMT_CREDIT", "AMT_ANNUITY", "AGE_YEARS", "YEARS_EMPLOYED"
+]
+CAT_FEATURES = ["NAME_CONTRACT_TYPE", "CODE_GENDER"]
+CAT_FEATURE_INDICES = [EXPECTED_ORDER.index(name) for name in CAT_FEATURES]
+# Category values seen in training (anything else is scored as an unseen category)
+CATEGORY_VALUES = {
+    "NAME_CONTRACT_TYPE": ["Cash loans", "Revolving loans"],
+    "CODE_GENDER": ["F", "M", "XNA"],
+}
+
+class ModelLoading(Exception):
+    """The model didn't finish loading within MODEL_LOAD_TIMEOUT_SECONDS; the client should retry."""
+
+# The model is no longer unpickled at import: the registry loads it lazily, in a
+# background thread started by main.py, or right here for pre-fork servers
+registry = ModelRegistry(
+    MODEL_PATH,
+    COMPILED_MODEL_PATH,
+    mmap_dir=config.MODEL_MMAP_DIR,
+    use_compiled=config.USE_COMPILED_MODEL,
+    tree_shap=config.TREE_SHAP,
+    warm_up=lambda bundle: _warm_up(bundle),
+)
+
+prediction_cache = PredictionCache(
+    max_size=config.PREDICTION_CACHE_SIZE,
+    ttl_seconds=config.PREDICTION_CACHE_TTL_SECONDS,
+    url=config.PREDICTION_CACHE_URL,
+    watch_path=MODEL_PATH,
+) if config.PREDICTION_CACHE_ENABLED else None
+
+# Old module attributes (ml_service.model, .explainer, ...) now come from the registry
+_BUNDLE_ATTRIBUTES = {"model": "model", "compiled_model": "compiled", "explainer": "explainer", "MODEL_VERSION": "version"}
 
+def __getattr__(name):
+    if name in _BUNDLE_ATTRIBUTES:
+        bundle = _bundle()
+        return getattr(bundle, _BUNDLE_ATTRIBUTES[name]) if bundle is not None else None
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+def _bundle():
+    # None = the model failed to load (scored as 0, like a missing model file always was)
+    try:
+        return registry.get(timeout=config.MODEL_LOAD_TIMEOUT_SECONDS)
+    except TimeoutError as e:
+        # Still loading in the background: not a failure, nothing to score with yet
+        raise ModelLoading(str(e)) from e
+    except RuntimeError:
+        return None
+
+def _cache_key(bundle, input_data):
+    return PredictionCache.make_key(bundle.version, _feature_vector(input_data))
+
+def _to_dict(input_data):
     # Handle Pydantic model input
     if hasattr(input_data, "model_dump"):
-        input_data = input_data.model_dump()
+        return input_data.model_dump()
     elif hasattr(input_data, "dict"):
-        input_data = input_data.dict()
+        return input_data.dict()
+    return input_data
 
-    # 1. Prepare Data
-    df = pd.DataFrame([{
+def _feature_row(input_data):
+    return {
         "AMT_INCOME_TOTAL": input_data["income"],
         "AMT_CREDIT": input_data["loan_amount"],
         "AMT_ANNUITY": input_data["loan_amount"] / 12,
@@ -32,42 +90,248 @@ def predict_loan_risk(input_data):
         "YEARS_EMPLOYED": input_data["years_employed"],
         "NAME_CONTRACT_TYPE": "Cash loans",
         "CODE_GENDER": input_data["gender"]
-    }])
-    
-    # 2. Reorder Columns (Crucial!)
-    expected_order = [
-        "NAME_CONTRACT_TYPE", "CODE_GENDER", "AMT_INCOME_TOTAL", 
-        "AMT_CREDIT", "AMT_ANNUITY", "AGE_YEARS", "YEARS_EMPLOYED"
-    ]
-    df = df[expected_order]
-
-    # 3. Get Probability
-    probability = model.predict_proba(df)[0][1]
-    risk_score = float(probability * 100)
-    print(f"🔍 Calculated Risk Score: {risk_score}")
+    }
 
-    # 4. EXPLAINABILITY (The Magic) 
-    # specific_feature_indices tells CatBoost we want SHAP values
-    pool = Pool(df, cat_features=["NAME_CONTRACT_TYPE", "CODE_GENDER"])
-    shap_values = model.get_feature_importance(pool, type='ShapValues')
-    
-    # shap_values returns a matrix. We want the first row (our user).
-    # The last value in the array is the "Bias", we ignore it.
-    user_shap = shap_values[0][:-1]
-    
-    # 5. Map values to Feature Names
+def _feature_vector(input_data):
+    # Same values as _feature_row, laid out directly in EXPECTED_ORDER (no pandas)
+    if hasattr(input_data, "income"):
+        income, loan_amount = input_data.income, input_data.loan_amount
+        age, years_employed, gender = input_data.age, input_data.years_employed, input_data.gender
+    else:
+        income, loan_amount = input_data["income"], input_data["loan_amount"]
+        age, years_employed, gender = input_data["age"], input_data["years_employed"], input_data["gender"]
+    return ["Cash loans", gender, income, loan_amount, loan_amount / 12, age, years_employed]
+
+def _build_frame(rows):
+    df = pd.DataFrame([_feature_row(_to_dict(row)) for row in rows])
+    return df[EXPECTED_ORDER]
+
+def _top_reasons(user_shap, top_k=5):
+    # Map values to Feature Names
     feature_importance = []
-    for name, score in zip(expected_order, user_shap):
+    for name, score in zip(EXPECTED_ORDER, user_shap):
         feature_importance.append({
             "feature": name,
             "shap_score": float(score)
         })
-    
-    # 6. Sort by "Impact" (Magnitude of impact - Absolute Value)
+
+    # Sort by "Impact" (Magnitude of impact - Absolute Value)
     # We want to show the biggest drivers, whether they are positive (Risk) or negative (Safety)
     feature_importance.sort(key=lambda x: abs(x["shap_score"]), reverse=True)
-    
-    # Take top 5 reasons
-    top_5_reasons = feature_importance[:5]
 
-    return risk_score, top_5_reasons
\ No newline at end of file
+    return feature_importance[:top_k]
+
+def _top_reasons_from_arrays(indices, values):
+    return [{"feature": EXPECTED_ORDER[i], "shap_score": float(score)} for i, score in zip(indices, values)]
+
+def _warm_up(bundle):
+    # First calls pay for lazy allocations and code paths; pay them before real traffic does
+    applicants = mock_bank.generate_applicants(config.MODEL_WARMUP_ROWS)
+    if not applicants:
+        return
+    _score_batch(bundle, applicants)
+    _score_batch(bundle, applicants[:1])
+
+def _with_version(result, bundle, with_version):
+    return (*result, bundle.version if bundle is not None else None) if with_version else result
+
+def predict_loan_risk(input_data, with_version=False):
+    """
+    (risk_score, top_5_reasons), or with_version=True:
+    (risk_score, top_5_reasons, model_version) of the model that produced them.
+    """
+    bundle = _bundle()
+    if bundle is None:
+        return _with_version((0, []), bundle, with_version)
+
+    # Retries / double-submits of the same applicant are answered from the cache
+    key = _cache_key(bundle, input_data) if prediction_cache is not None else None
+    if key is not None:
+        cached = prediction_cache.get(key)
+        if cached is not None:
+            return _with_version(cached, bundle, with_version)
+
+    if bundle.explainer is not None:
+        risk_score, top_5_reasons = predict_loan_risk_compiled([input_data], bundle=bundle)[0]
+    elif config.FAST_INFERENCE:
+        risk_score, top_5_reasons = predict_loan_risk_fast(input_data, bundle=bundle)
+    else:
+        risk_score, top_5_reasons = predict_loan_risk_pandas(input_data, bundle=bundle)
+    print(f"🔍 Calculated Risk Score: {risk_score}")
+
+    if key is not None:
+        prediction_cache.set(key, (risk_score, top_5_reasons))
+    return _with_version((risk_score, top_5_reasons), bundle, with_version)
+
+def predict_loan_risk_compiled(applications, top_k=5, bundle=None):
+    """
+    Scores and explains a batch with the compiled trees only (no pandas, no CatBoost).
+    Same output as predict_loan_risk_batch, up to float rounding (~1e-15).
+    """
+    bundle = bundle or _bundle()
+    compiled_model, explainer = bundle.compiled, bundle.explainer
+    floats, codes = compiled_model.encode([_feature_vector(a) for a in applications])
+    probabilities = compiled_model.predict_proba_encoded(floats, codes)[:, 1]
+    indices, values = explainer.top_k(floats, codes, k=top_k)
+
+    results = []
+    for probability, row_indices, row_values in zip(probabilities, indices, values):
+        results.append((float(probability * 100), _top_reasons_from_arrays(row_indices, row_values)))
+    return results
+
+def predict_loan_risk_columns(columns, top_k=0, bundle=None):
+    """
+    Columnar scoring for bulk jobs: {income, loan_amount, age, years_employed, gender: array}
+    -> (risk scores, top_k SHAP feature indices into EXPECTED_ORDER, their SHAP values),
+    the last two (n_rows, top_k) arrays, or None when top_k=0.
+    """
+    bundle = bundle or registry.get(timeout=config.MODEL_LOAD_TIMEOUT_SECONDS)
+    features = _feature_columns(columns)
+    compiled_model = bundle.compiled
+
+    if compiled_model is not None:
+        floats, codes = compiled_model.encode_columns(
+            [features[compiled_model.feature_names[i]] for i in compiled_model.float_feature_indices],
+            [features[compiled_model.feature_names[i]] for i in compiled_model.cat_feature_indices],
+        )
+        risk_scores = compiled_model.predict_proba_encoded(floats, codes)[:, 1] * 100
+        if not top_k:
+            return risk_scores, None, None
+        if bundle.explainer is not None:
+            indices, values = bundle.explainer.top_k(floats, codes, k=top_k)
+            return risk_scores, indices, values
+
+    df = pd.DataFrame(features)[EXPECTED_ORDER]
+    if compiled_model is None:
+        risk_scores = bundle.model.predict_proba(df)[:, 1] * 100
+    if not top_k:
+        return risk_scores, None, None
+    shap_values = bundle.model.get_feature_importance(Pool(df, cat_features=CAT_FEATURES), type='ShapValues')[:, :-1]
+    # Same order as _top_reasons: |SHAP| desc, ties in feature order
+    indices = np.argsort(-np.abs(shap_values), axis=1, kind="stable")[:, :top_k]
+    return risk_scores, indices, np.take_along_axis(shap_values, indices, axis=1)
+
+def _feature_columns(columns):
+    # _feature_row for whole columns
+    loan_amount = np.asarray(columns["loan_amount"], dtype=np.float64)
+    return {
+        "AMT_INCOME_TOTAL": np.asarray(columns["income"], dtype=np.float64),
+        "AMT_CREDIT": loan_amount,
+        "AMT_ANNUITY": loan_amount / 12,
+        "AGE_YEARS": np.asarray(columns["age"], dtype=np.float64),
+        "YEARS_EMPLOYED": np.asarray(columns["years_employed"], dtype=np.float64),
+        "NAME_CONTRACT_TYPE": np.full(len(loan_amount), "Cash loans", dtype=object),
+        "CODE_GENDER": np.asarray(columns["gender"], dtype=object),
+    }
+
+def predict_loan_risk_fast(input_data, bundle=None):
+    """
+    Single-row path without pandas: the feature vector is built straight from
+    the request in EXPECTED_ORDER and handed to CatBoost as a plain list.
+    Returns exactly what predict_loan_risk_pandas returns.
+    """
+    bundle = bundle or _bundle()
+    model = bundle.model if bundle is not None else None
+    if model is None:
+        return 0, []
+
+    row = [_feature_vector(input_data)]
+
+    # 1. Get Probability
+    probability = model.predict_proba(row)[0][1]
+    risk_score = float(probability * 100)
+
+    # 2. SHAP values (last column is the "Bias", we ignore it)
+    pool = Pool(row, cat_features=CAT_FEATURE_INDICES)
+    user_shap = model.get_feature_importance(pool, type='ShapValues')[0][:-1]
+
+    return risk_score, _top_reasons(user_shap)
+
+def predict_loan_risk_pandas(input_data, bundle=None):
+    bundle = bundle or _bundle()
+    model = bundle.model if bundle is not None else None
+    if model is None:
+        return 0, []
+
+    # 1. Prepare Data (already in EXPECTED_ORDER)
+    df = _build_frame([input_data])
+
+    # 2. Get Probability
+    probability = model.predict_proba(df)[0][1]
+    risk_score = float(probability * 100)
+
+    # 3. EXPLAINABILITY (The Magic)
+    # specific_feature_indices tells CatBoost we want SHAP values
+    pool = Pool(df, cat_features=CAT_FEATURES)
+    shap_values = model.get_feature_importance(pool, type='ShapValues')
+
+    # shap_values returns a matrix. We want the first row (our user).
+    # The last value in the array is the "Bias", we ignore it.
+    user_shap = shap_values[0][:-1]
+
+    # 4. Take top 5 reasons
+    top_5_reasons = _top_reasons(user_shap)
+
+    return risk_score, top_5_reasons
+
+def predict_loan_risk_batch(applications, with_version=False):
+    """
+    Scores many applications at once.
+    Returns a list of (risk_score, top_5_reasons) in the same order as the input
+    (with_version=True appends the model version to every tuple).
+    """
+    if not applications:
+        return []
+    # One bundle for the whole batch, so every row is scored by the same model version
+    bundle = _bundle()
+    if bundle is None:
+        results = [(0, []) for _ in applications]
+    elif prediction_cache is None:
+        results = _score_batch(bundle, applications)
+    else:
+        results = _cached_score_batch(bundle, applications)
+    return [_with_version(result, bundle, with_version) for result in results]
+
+def _cached_score_batch(bundle, applications):
+    # Only the rows the cache hasn't seen go to the model
+    keys = [_cache_key(bundle, a) for a in applications]
+    results = [prediction_cache.get(key) for key in keys]
+    missing = [i for i, result in enumerate(results) if result is None]
+    if missing:
+        computed = _score_batch(bundle, [applications[i] for i in missing])
+        for i, result in zip(missing, computed):
+            results[i] = result
+            prediction_cache.set(keys[i], result)
+    return results
+
+def _score_batch(bundle, applications):
+    if bundle.explainer is not None:
+        return predict_loan_risk_compiled(applications, bundle=bundle)
+    model = bundle.model
+    if model is None:
+        return [(0, []) for _ in applications]
+    if len(applications) == 1 and config.FAST_INFERENCE:
+        # A lone request (e.g. a quiet micro-batch window) skips pandas entirely
+        return [predict_loan_risk_fast(applications[0], bundle=bundle)]
+
+    # 1. One DataFrame for the whole batch
+    df = _build_frame(applications)
+
+    # 2. One predict_proba call for every row (NumPy tree evaluator when available)
+    if bundle.compiled is not None:
+        probabilities = bundle.compiled.predict_proba([_feature_vector(a) for a in applications])[:, 1]
+    else:
+        probabilities = model.predict_proba(df)[:, 1]
+
+    # 3. One SHAP matrix for every row (last column is the "Bias")
+    pool = Pool(df, cat_features=CAT_FEATURES)
+    shap_values = model.get_feature_importance(pool, type='ShapValues')
+
+    results = []
+    for probability, row_shap in zip(probabilities, shap_values):
+        results.append((float(probability * 100), _top_reasons(row_shap[:-1])))
+    return results
+
+# Pre-fork servers (gunicorn --preload) load once in the parent; workers inherit the pages
+if config.MODEL_LOAD_MODE == "eager":
+    registry.get()
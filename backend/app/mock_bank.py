@@ -49,4 +49,23 @@ def generate_bank_statement(salary: float, bounce_count: int, gambling_flag: boo
             "narration": "UPI-DREAM11-GAMING"
         })
 
-    return {"transactions": transactions}
\ No newline at end of file
+    return {"transactions": transactions}
+
+def generate_applicant(rng=random):
+    """
+    Generates a fake loan applicant (same fields as LoanApplicationCreate).
+    Used to warm up freshly loaded models before they serve real traffic.
+    """
+    return {
+        "full_name": "Warmup Applicant",
+        "income": rng.uniform(20000, 400000),
+        "loan_amount": rng.uniform(50000, 2000000),
+        "credit_score": rng.randint(650, 900),
+        "age": rng.randint(21, 65),
+        "years_employed": rng.randint(0, 40),
+        "gender": rng.choice(["M", "F"]),
+    }
+
+def generate_applicants(count: int, seed: int = 0):
+    rng = random.Random(seed)
+    return [generate_applicant(rng) for _ in range(count)]
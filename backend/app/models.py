@@ -1,8 +1,13 @@
 # app/models.py
-from sqlalchemy import Column, Integer, String, Float, Boolean, DateTime
+from sqlalchemy import Column, Integer, String, Float, Boolean, DateTime, Index, JSON
+from sqlalchemy.dialects.postgresql import JSONB
 from sqlalchemy.sql import func
 from .database import Base
 
+# JSONB on Postgres (binary, queryable server-side); JSON text on SQLite (tests, local dev).
+# Either way the ORM reads and writes plain Python lists/dicts.
+JSONDocument = JSON().with_variant(JSONB(), "postgresql")
+
 class LoanApplication(Base):
     __tablename__ = "loan_applications"
 
@@ -21,14 +26,23 @@ class LoanApplication(Base):
     status = Column(String, default="PENDING") 
     risk_score = Column(Float, default=0.0)
     
-    # Link to User
-    user_id = Column(Integer, index=True, nullable=True)
+    # Link to User (indexed by ix_loan_applications_user_created below)
+    user_id = Column(Integer, nullable=True)
     
-    # Store the JSON explanation
-    risk_factors = Column(String, nullable=True)
+    # The explanation: a list of {"feature", "shap_score"} dicts
+    risk_factors = Column(JSONDocument, nullable=True)
+
+    # Which model produced risk_score (sha256 of the model file; NULL = policy rejection)
+    model_version = Column(String, nullable=True)
     
     created_at = Column(DateTime(timezone=True), server_default=func.now())
 
+    # Keyset pagination, newest first: /loan-history (per user) and /applications (everyone)
+    __table_args__ = (
+        Index("ix_loan_applications_user_created", "user_id", "created_at", "id"),
+        Index("ix_loan_applications_created", "created_at", "id"),
+    )
+
 class User(Base):
     __tablename__ = "users"
 
@@ -43,7 +57,28 @@ class RiskAnalysisHistory(Base):
     __tablename__ = "risk_analysis_history"
 
     id = Column(Integer, primary_key=True, index=True)
-    user_id = Column(Integer, index=True)
+    user_id = Column(Integer)
     filename = Column(String)
-    result = Column(String) # We'll store the JSON result as a string
-    created_at = Column(DateTime(timezone=True), server_default=func.now())
\ No newline at end of file
+    result = Column(JSONDocument) # The analysis, as returned by /analyze-statement-file
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+
+    # Keyset pagination of /history, newest first
+    __table_args__ = (
+        Index("ix_risk_analysis_history_user_created", "user_id", "created_at", "id"),
+    )
+
+class StatementJob(Base):
+    __tablename__ = "statement_jobs"
+
+    id = Column(String, primary_key=True)  # uuid4 hex, handed to the client for polling
+    user_id = Column(Integer, index=True, nullable=True)
+    filename = Column(String)
+    status = Column(String, default="QUEUED")  # QUEUED -> RUNNING -> DONE / FAILED
+    error = Column(String, nullable=True)
+
+    # The finished analysis
+    history_id = Column(Integer, nullable=True)
+
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    started_at = Column(DateTime(timezone=True), nullable=True)
+    finished_at = Column(DateTime(timezone=True), nullable=True)
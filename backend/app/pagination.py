@@ -0,0 +1,80 @@
+# app/pagination.py
+# Keyset (cursor) pagination for the listing endpoints.
+#
+# Pages are newest first, ordered by (created_at, id), and each page starts
+# strictly after the last row of the previous one:
+#   WHERE (created_at, id) < (:created_at, :id) ORDER BY created_at DESC, id DESC
+# With a matching (..., created_at, id) index (see models.py) that's an index
+# range scan however deep the client pages, where OFFSET reads and throws away
+# every skipped row.
+#
+# The body stays a plain JSON array, streamed row by row from a server-side
+# cursor. The next page's cursor (opaque to clients) comes back in the
+# X-Next-Cursor header, absent on the last page.
+import base64
+import json
+from collections import namedtuple
+from datetime import datetime
+
+from fastapi.responses import StreamingResponse
+from sqlalchemy import tuple_
+
+from . import database
+
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+# Rows fetched from the database per round trip while streaming
+STREAM_CHUNK_ROWS = 200
+
+Page = namedtuple("Page", ["stmt", "next_cursor"])
+
+class InvalidCursor(ValueError):
+    """The cursor wasn't one we handed out."""
+
+def encode_cursor(created_at, row_id):
+    raw = json.dumps([created_at.isoformat(), row_id]).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+def decode_cursor(cursor):
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        created_at, row_id = json.loads(raw)
+        return datetime.fromisoformat(created_at), int(row_id)
+    except Exception as e:
+        raise InvalidCursor("Invalid cursor") from e
+
+async def paginate(db, stmt, model, limit, cursor=None):
+    """
+    One page of `stmt` (a select of `model`, newest first) after `cursor`.
+    Returns the statement to stream and the cursor of the page after it.
+    """
+    # 1. Newest first, after the previous page
+    key = tuple_(model.created_at, model.id)
+    if cursor:
+        stmt = stmt.where(key < decode_cursor(cursor))
+    stmt = stmt.order_by(model.created_at.desc(), model.id.desc())
+
+    # 2. The page's last key, and whether anything comes after it (index only, no row data)
+    keys = (await db.execute(stmt.with_only_columns(model.created_at, model.id).offset(limit - 1).limit(2))).all()
+    if len(keys) < 2:
+        # Last page: everything that's left (fewer than limit + 1 rows just now)
+        return Page(stmt, None)
+
+    # 3. Bounded by its last key rather than LIMIT, so rows inserted meanwhile can't shift a row past the cursor
+    last_created_at, last_id = keys[0]
+    return Page(stmt.where(key >= (last_created_at, last_id)), encode_cursor(last_created_at, last_id))
+
+def streaming_response(page, schema):
+    """A JSON array of `schema` objects, written as the rows arrive."""
+    headers = {NEXT_CURSOR_HEADER: page.next_cursor} if page.next_cursor else {}
+    return StreamingResponse(_stream_json_array(page.stmt, schema), media_type="application/json", headers=headers)
+
+async def _stream_json_array(stmt, schema):
+    # Its own session: the request's one is released once the route has returned
+    async with database.AsyncSessionLocal() as db:
+        rows = await db.stream_scalars(stmt.execution_options(yield_per=STREAM_CHUNK_ROWS))
+        separator = b"["
+        async for row in rows:
+            yield separator + schema.model_validate(row).model_dump_json().encode()
+            separator = b","
+        yield b"]" if separator == b"," else b"[]"
@@ -1,22 +1,27 @@
 # app/rule_engine.py
+# Policy checks that run before the model. The rules themselves are declarative
+# (services/policy_rules.py: built-ins + POLICY_RULES_FILE) and are evaluated
+# over whole columns, for one application or a million.
 from . import schemas
+from .services.policy_rules import policy
 
 def run_policy_check(application: schemas.LoanApplicationCreate):
     """
     Returns a tuple (status, reason).
     Status: "APPROVED" or "REJECTED"
     """
-    
-    # Rule 1: The "CIBIL" Cutoff
-    # In India, < 650 is usually considered sub-prime.
-    if application.credit_score < 650:
-        return "REJECTED", "Credit Score below policy threshold (650)."
+    return policy.check_application(application)
 
-    # Rule 2: Loan-to-Income Ratio
-    # We shouldn't lend more than 10x monthly income (simplified rule)
-    max_loan_limit = application.income * 10
-    if application.loan_amount > max_loan_limit:
-        return "REJECTED", f"Loan amount exceeds 10x monthly income limit. Max allowed: {max_loan_limit}"
+def run_policy_check_batch(applications):
+    """
+    Runs the policy check over a whole batch.
+    Returns a list of (status, reason) in the same order as the input.
+    """
+    return policy.check_applications(applications)
 
-    # If they pass all rules
-    return "APPROVED", "Passed all preliminary policy checks."
\ No newline at end of file
+def run_policy_check_frame(frame, with_reasons=True):
+    """
+    Runs the policy check over a table of applications (e.g. historical loan_applications).
+    Returns a DataFrame of status, rule (the first one failed, None if passed) and reason.
+    """
+    return policy.check_frame(frame, with_reasons)
@@ -1,5 +1,5 @@
 # app/schemas.py
-from pydantic import BaseModel, Field, field_validator
+from pydantic import BaseModel, Field
 from typing import Optional, Literal, List, Any
 from datetime import datetime
 
@@ -13,25 +13,21 @@ class LoanApplicationCreate(BaseModel):
     years_employed: int
     gender: Literal["M", "F"]
 
+# 1b. Batch Input (Nightly pre-approval campaigns)
+class LoanApplicationBatchCreate(BaseModel):
+    applications: List[LoanApplicationCreate]
+
 # 2. The Output Schema (What we send back)
 class LoanApplicationResponse(LoanApplicationCreate):
-    id: int
+    # None when the row is still queued for a write-behind INSERT (see /apply?durable=true)
+    id: Optional[int] = None
     status: str
     created_at: datetime
     risk_score: float
+    # A JSON column: the ORM already hands back a list, nothing to parse
     risk_factors: Optional[List[Any]] = None 
     user_id: Optional[int] = None
-
-    @field_validator('risk_factors', mode='before')
-    @classmethod
-    def parse_risk_factors(cls, v):
-        if isinstance(v, str):
-            import json
-            try:
-                return json.loads(v)
-            except:
-                return []
-        return v
+    model_version: Optional[str] = None
 
     class Config:
         from_attributes = True
@@ -62,13 +58,57 @@ class TokenData(BaseModel):
 class RiskAnalysisHistoryCreate(BaseModel):
     user_id: int
     filename: str
-    result: str # JSON string
+    result: dict
 
 class RiskAnalysisHistoryResponse(BaseModel):
     id: int
     filename: str
-    result: str
+    result: dict
     created_at: datetime
     
     class Config:
-        from_attributes = True
\ No newline at end of file
+        from_attributes = True
+
+# --- STATEMENT JOB SCHEMAS ---
+class StatementJobResponse(BaseModel):
+    id: str
+    status: str
+    filename: Optional[str] = None
+    error: Optional[str] = None
+    created_at: Optional[datetime] = None
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+    # The analysis, once status is DONE
+    result: Optional[dict] = None
+
+    class Config:
+        from_attributes = True
+
+# --- ANALYTICS SCHEMAS ---
+class ThresholdSweepRequest(BaseModel):
+    # Grid axes; the current policy (650, 10x) and RISK_SCORE_CUTOFF are in the defaults
+    credit_score_cutoffs: List[float] = Field(default_factory=lambda: list(range(550, 751, 25)), min_length=1, max_length=50)
+    income_multiples: List[float] = Field(default_factory=lambda: [4, 6, 8, 10, 12, 15, 20], min_length=1, max_length=50)
+    risk_thresholds: List[float] = Field(default_factory=lambda: list(range(10, 91, 5)), min_length=1, max_length=50)
+    score_bins: int = Field(20, ge=1, le=100)
+    # Only applications created in [created_after, created_before)
+    created_after: Optional[datetime] = None
+    created_before: Optional[datetime] = None
+    # Score policy-rejected applications with the current model (False: they stay at 100)
+    rescore: bool = True
+
+class ThresholdSweepResponse(BaseModel):
+    rows: int
+    rescored_rows: int
+    credit_score_cutoffs: List[float]
+    income_multiples: List[float]
+    risk_thresholds: List[float]
+    # [credit cutoff][income multiple][risk threshold]
+    approved: List[List[List[int]]]
+    approval_rate: List[List[List[Optional[float]]]]
+    # Mean probability of default of the approved applications (None where nothing is approved)
+    expected_default_rate: List[List[List[Optional[float]]]]
+    # [credit cutoff][income multiple][score bin]: scores of the applications the policy lets through
+    score_bin_edges: List[float]
+    score_distribution: List[List[List[int]]]
+    seconds: float
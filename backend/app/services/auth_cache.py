@@ -0,0 +1,116 @@
+# app/services/auth_cache.py
+# Per-process cache behind get_current_user / get_optional_user, so a warm
+# authenticated request costs two dict lookups instead of a JWT decode and a
+# users query:
+#   tokens  token -> subject (email)   kept until the token's own `exp`
+#   users   subject -> User snapshot   kept AUTH_CACHE_TTL_SECONDS
+# An expired token drops out of `tokens` and is decoded again, which rejects it.
+# A user changed through the ORM (UPDATE/DELETE of a users row) is invalidated
+# at once in this process; other workers see the change within the users TTL.
+# Failed lookups are not cached, so a new registration works straight away.
+import time
+
+from sqlalchemy import event, inspect
+
+from .. import auth_utils, crud, models
+from ..core import config, metrics
+from .prediction_cache import LocalBackend
+
+class AuthCache:
+    def __init__(self, max_size=10000, ttl_seconds=60, enabled=True):
+        self.enabled = enabled
+        self.tokens = LocalBackend(max_size, ttl_seconds, on_evict=self._evicted)
+        self.users = LocalBackend(max_size, ttl_seconds, on_evict=self._evicted)
+
+        self.hits = metrics.counter("auth_cache_hits_total", "Authenticated requests served without a database round trip")
+        self.misses = metrics.counter("auth_cache_misses_total", "Authenticated requests that had to decode the token or load the user")
+        self.hit_ratio = metrics.gauge("auth_cache_hit_ratio", "hits / (hits + misses) since startup")
+        self.evictions = metrics.counter("auth_cache_evictions_total", "Entries dropped by the LRU bound")
+        self.invalidations = metrics.counter("auth_cache_invalidations_total", "Users dropped because their row changed")
+
+    # --- LOOKUPS ---
+    async def authenticate(self, db, token):
+        """The User the token belongs to, or None. Raises jwt.JWTError for a bad or expired token."""
+        email, token_hit = self._subject(token)
+        if email is None:
+            return None
+        user = self.users.get(email) if self.enabled else None
+        if user is not None and token_hit:
+            self._count(self.hits)
+            return user
+        self._count(self.misses)
+        if user is not None:
+            return user
+
+        user = await crud.get_user_by_email_async(db, email=email)
+        if user is None:
+            return None
+        # A detached copy: shared by concurrent requests, and no password hash kept around
+        snapshot = models.User(id=user.id, email=user.email, full_name=user.full_name, created_at=user.created_at)
+        if self.enabled:
+            self.users.set(email, snapshot)
+        return snapshot
+
+    def _subject(self, token):
+        """(the token's `sub` or None, whether it came from the cache)"""
+        if self.enabled:
+            email = self.tokens.get(token)
+            if email is not None:
+                return email, True
+        payload = auth_utils.jwt.decode(token, auth_utils.SECRET_KEY, algorithms=[auth_utils.ALGORITHM])
+        email = payload.get("sub")
+        if email is not None and self.enabled:
+            # Never past the token's expiry: after that it has to fail decoding again
+            remaining = payload["exp"] - time.time() if "exp" in payload else None
+            if remaining is None or remaining > 0:
+                self.tokens.set(token, email, ttl=remaining)
+        return email, False
+
+    # --- INVALIDATION ---
+    def invalidate_user(self, email):
+        """Call when a user's row changes outside the ORM (raw SQL, another service)."""
+        if email is not None and self.users.delete(email):
+            self.invalidations.inc()
+
+    def clear(self):
+        self.tokens.clear()
+        self.users.clear()
+
+    def watch_user_changes(self):
+        """Invalidates users updated or deleted through the ORM, in any session of this process."""
+        event.listen(models.User, "after_update", self._user_changed)
+        event.listen(models.User, "after_delete", self._user_changed)
+
+    def _user_changed(self, mapper, connection, target):
+        self.invalidate_user(target.email)
+        # An email change: the old address must stop resolving too
+        for old_email in inspect(target).attrs.email.history.deleted:
+            self.invalidate_user(old_email)
+
+    # --- METRICS ---
+    def _count(self, counter):
+        counter.inc()
+        total = self.hits.value + self.misses.value
+        self.hit_ratio.set(self.hits.value / total if total else 0.0)
+
+    def _evicted(self, count):
+        self.evictions.inc(count)
+
+    def stats(self):
+        total = self.hits.value + self.misses.value
+        return {
+            "tokens": len(self.tokens),
+            "users": len(self.users),
+            "hits": self.hits.value,
+            "misses": self.misses.value,
+            "evictions": self.evictions.value,
+            "invalidations": self.invalidations.value,
+            "hit_rate": self.hits.value / total if total else 0.0,
+        }
+
+cache = AuthCache(
+    max_size=config.AUTH_CACHE_SIZE,
+    ttl_seconds=config.AUTH_CACHE_TTL_SECONDS,
+    enabled=config.AUTH_CACHE_ENABLED,
+)
+cache.watch_user_changes()
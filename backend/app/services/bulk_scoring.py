@@ -0,0 +1,351 @@
+# app/services/bulk_scoring.py
+# Offline rescoring of a whole applicant file (CSV or Parquet) with the policy
+# rules and the current model, e.g. every historical application after a model
+# change, without going through HTTP:
+#   python -m app.services.bulk_scoring applications.parquet scored/ --top-k 5
+#
+# The input needs the LoanApplicationCreate columns the rules and the model use
+# (income, loan_amount, credit_score, age, years_employed, gender). Rows /apply
+# would refuse with a 422 (blank or unknown gender, missing or non-finite
+# numbers, fractional ages...) are not scored: they come out with status
+# INVALID and the reason in `error`. It is read
+# CHUNK_ROWS at a time and every chunk goes to a spawned worker process (policy
+# check over whole columns, compiled trees, optionally TreeSHAP), which writes
+# its own part file. At most two chunks per worker are in flight, so memory is
+# bounded by the chunk size, not the file size.
+#
+# Output is a directory of part-000000.<format> files, one per chunk, plus
+# _manifest.json. CSV parts carry the header in the first part only, so
+# `cat part-*.csv` is one valid file; the Parquet parts read back as one table
+# with pd.read_parquet(<directory>). A part only appears (written aside, then
+# renamed) once its chunk is done, so running the same command again after an
+# interruption skips the finished chunks. The manifest refuses to mix parts of
+# a different input, model, rule set or chunk size (--overwrite starts over).
+import argparse
+import hashlib
+import json
+import multiprocessing
+import os
+import time
+import typing
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+import numpy as np
+import pandas as pd
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    # CSV in and out works without it
+    pa = pq = None
+
+from .. import ml_service, schemas
+from ..core import config
+from .policy_rules import policy
+
+FORMATS = ("parquet", "csv")
+MANIFEST = "_manifest.json"  # leading underscore: pyarrow datasets skip it
+SCORING_COLUMNS = ["income", "loan_amount", "age", "years_employed", "gender"]
+IN_FLIGHT_PER_WORKER = 2
+# Bump when the part file columns change, so a resumed run never mixes layouts
+OUTPUT_VERSION = 2
+APPLICATION_FIELDS = schemas.LoanApplicationCreate.model_fields
+
+class BulkScoringError(Exception):
+    """Bad input, or an output directory written with different settings."""
+
+# --- PUBLIC API ---
+def score_file(source, output_dir, output_format="parquet", chunk_rows=None, workers=None, top_k=0, keep=(),
+               overwrite=False, progress_seconds=5.0):
+    """
+    Scores every row of `source` into `output_dir` (see the module header).
+    `keep` names input columns copied to the output next to `row`, the 0-based input row number.
+    Returns a summary dict (rows scored in this run, rows/s, chunks skipped as already done).
+    """
+    if output_format not in FORMATS:
+        raise BulkScoringError(f"Unknown output format {output_format!r}; use one of {FORMATS}")
+    if output_format == "parquet" and pq is None:
+        raise BulkScoringError("Parquet output needs pyarrow (pip install pyarrow), or use --format csv")
+    chunk_rows = chunk_rows or config.BULK_SCORING_CHUNK_ROWS
+    workers = workers or config.BULK_SCORING_WORKERS or os.cpu_count() or 1
+    keep = list(keep)
+
+    # 1. Input columns, model version and the manifest this run must agree with
+    available = input_columns(source)
+    columns = list(dict.fromkeys(keep + policy.columns + SCORING_COLUMNS))
+    missing = [column for column in columns if column not in available]
+    if missing:
+        raise BulkScoringError(f"{source} has no column(s) {missing}")
+    version = ml_service.registry.get(timeout=config.MODEL_LOAD_TIMEOUT_SECONDS).version
+    manifest = {
+        "input": os.path.abspath(source),
+        "input_size": os.path.getsize(source),
+        "input_mtime_ns": os.stat(source).st_mtime_ns,
+        "format": output_format,
+        "output_version": OUTPUT_VERSION,
+        "chunk_rows": chunk_rows,
+        "top_k": top_k,
+        "keep": keep,
+        "model_version": version,
+        "policy": policy_fingerprint(),
+        "risk_score_cutoff": config.RISK_SCORE_CUTOFF,
+    }
+    done = _prepare_output(output_dir, manifest, overwrite)
+    if done:
+        print(f"⚠️ Resuming: {len(done)} chunk(s) already in {output_dir}")
+
+    # 2. Stream the chunks to the pool, never more than IN_FLIGHT_PER_WORKER each
+    task = dict(output_dir=output_dir, output_format=output_format, top_k=top_k, keep=keep, version=version)
+    started = last_report = time.perf_counter()
+    totals = {"rows": 0, "rejected": 0, "invalid": 0}
+    pending = set()
+    executor = _executor(workers)
+    try:
+        first_row = 0
+        for index, chunk in enumerate(read_chunks(source, columns, chunk_rows)):
+            n = len(chunk)
+            if index in done:
+                pass  # written by an earlier run
+            elif executor is None:
+                _add(totals, score_part(index, first_row, chunk, **task))
+            else:
+                pending.add(executor.submit(score_part, index, first_row, chunk, **task))
+            first_row += n
+            del chunk
+
+            while len(pending) >= workers * IN_FLIGHT_PER_WORKER:
+                finished, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    _add(totals, future.result())
+            if time.perf_counter() - last_report >= progress_seconds:
+                last_report = time.perf_counter()
+                print(f"   {totals['rows']:,} rows scored, {totals['rows'] / (last_report - started):,.0f} rows/s")
+
+        for future in pending:
+            _add(totals, future.result())
+    except BaseException:
+        print(f"❌ Stopped after {totals['rows']:,} rows; run the same command again to resume")
+        raise
+    finally:
+        if executor is not None:
+            executor.shutdown(wait=True, cancel_futures=True)
+
+    # 3. Done: the manifest says so, with this run's throughput
+    seconds = time.perf_counter() - started
+    summary = {
+        **totals,
+        "chunks_skipped": len(done),
+        "total_rows": first_row,
+        "seconds": round(seconds, 3),
+        "rows_per_second": round(totals["rows"] / seconds) if seconds else None,
+    }
+    _write_json(os.path.join(output_dir, MANIFEST), {**manifest, "completed": True, "last_run": summary})
+    print(f"✅ Scored {totals['rows']:,} rows in {seconds:.1f}s ({summary['rows_per_second'] or 0:,} rows/s, "
+          f"{totals['rejected']:,} rejected, {totals['invalid']:,} invalid) with {workers} worker(s) -> {output_dir}")
+    if totals["invalid"]:
+        print(f"⚠️ {totals['invalid']:,} row(s) failed validation and were not scored (status INVALID, see `error`)")
+    return summary
+
+def input_columns(source):
+    if _is_parquet(source):
+        return _parquet_file(source).schema_arrow.names
+    return list(pd.read_csv(source, nrows=0).columns)
+
+def read_chunks(source, columns, chunk_rows):
+    """DataFrames of `columns`, chunk_rows rows each (a Parquet row group boundary may cut one short)."""
+    if _is_parquet(source):
+        for batch in _parquet_file(source).iter_batches(batch_size=chunk_rows, columns=columns):
+            yield batch.to_pandas()
+        return
+    dtypes = {"gender": str} if "gender" in columns else None
+    with pd.read_csv(source, usecols=columns, dtype=dtypes, chunksize=chunk_rows) as reader:
+        yield from reader
+
+def policy_fingerprint():
+    """Changes whenever a rule, its order or a derived value changes."""
+    definition = {
+        "derived": {name: expression.source for name, expression in policy.derived.items()},
+        "rules": [[rule.name, rule.when.source, rule.reason] for rule in policy.rules],
+    }
+    return hashlib.sha256(json.dumps(definition, sort_keys=True).encode()).hexdigest()
+
+# --- ONE CHUNK (runs in a worker) ---
+def score_part(index, first_row, chunk, output_dir, output_format, top_k, keep, version):
+    bundle = ml_service.registry.get(timeout=config.MODEL_LOAD_TIMEOUT_SECONDS)
+    if bundle.version != version:
+        raise BulkScoringError(f"Model changed during the run ({version[:12]} -> {bundle.version[:12]}); run again with --overwrite")
+    frame = score_chunk(chunk, first_row, top_k, keep, bundle)
+
+    path = part_path(output_dir, index, output_format)
+    staging = f"{path}.tmp"
+    if output_format == "parquet":
+        pq.write_table(pa.Table.from_pandas(frame, preserve_index=False), staging)
+    else:
+        frame.to_csv(staging, index=False, header=index == 0)
+    os.replace(staging, path)
+    return {
+        "index": index,
+        "rows": len(frame),
+        "rejected": int((frame["status"] == "REJECTED").sum()),
+        "invalid": int((frame["status"] == "INVALID").sum()),
+    }
+
+def score_chunk(chunk, first_row=0, top_k=0, keep=(), bundle=None):
+    """
+    The /apply decision for every row of a DataFrame, as columns: error (why /apply would
+    refuse the row, else empty), policy_status, policy_rule, policy_reason, risk_score (100
+    when the policy rejects, like /apply), status (APPROVED / REJECTED / INVALID), and
+    shap_feature_i / shap_value_i for i in 1..top_k (empty for policy rejections).
+    Invalid rows get no policy columns, no risk score and no SHAP values.
+    """
+    n = len(chunk)
+    out = pd.DataFrame({"row": np.arange(first_row, first_row + n, dtype=np.int64)})
+    for column in keep:
+        out[column] = chunk[column].to_numpy()
+
+    # 1. The LoanApplicationCreate constraints: invalid rows go no further
+    errors = validate_chunk(chunk)
+    invalid = pd.notna(errors)
+    valid = np.flatnonzero(~invalid)
+    out["error"] = pd.array(errors, dtype="string")
+
+    # 2. Policy rules, whole columns at once
+    policy_statuses = np.full(n, None, dtype=object)
+    policy_rules = np.full(n, None, dtype=object)
+    policy_reasons = np.full(n, None, dtype=object)
+    if len(valid):
+        statuses, rules, reasons = policy.check_columns({name: chunk[name].to_numpy()[valid] for name in policy.columns}, len(valid))
+        policy_statuses[valid], policy_rules[valid], policy_reasons[valid] = statuses, rules, reasons
+    out["policy_status"] = pd.array(policy_statuses, dtype="string")
+    out["policy_rule"] = pd.array(policy_rules, dtype="string")
+    out["policy_reason"] = pd.array(policy_reasons, dtype="string")
+
+    # 3. The model, for the rows the policy let through
+    policy_rejected = policy_statuses == "REJECTED"
+    survivors = np.flatnonzero(~invalid & ~policy_rejected)
+    risk_scores = np.where(invalid, np.nan, 100.0)
+    shap_features = np.full((n, top_k), None, dtype=object)
+    shap_values = np.full((n, top_k), np.nan)
+    if len(survivors):
+        columns = {name: chunk[name].to_numpy()[survivors] for name in SCORING_COLUMNS}
+        scores, indices, values = ml_service.predict_loan_risk_columns(columns, top_k, bundle)
+        risk_scores[survivors] = scores
+        if top_k:
+            shap_features[survivors, :indices.shape[1]] = np.array(ml_service.EXPECTED_ORDER, dtype=object)[indices]
+            shap_values[survivors, :values.shape[1]] = values
+    out["risk_score"] = risk_scores
+    decisions = np.where(policy_rejected | (risk_scores > config.RISK_SCORE_CUTOFF), "REJECTED", "APPROVED")
+    out["status"] = pd.array(np.where(invalid, "INVALID", decisions), dtype="string")
+
+    for k in range(top_k):
+        out[f"shap_feature_{k + 1}"] = pd.array(shap_features[:, k], dtype="string")
+        out[f"shap_value_{k + 1}"] = shap_values[:, k]
+    return out
+
+def validate_chunk(chunk):
+    """
+    Per row, why /apply would answer 422 (the first failing field, in schema order), or None.
+    Checks the LoanApplicationCreate fields the chunk carries: finite numbers, whole
+    numbers for int fields, one of the allowed values for Literal fields.
+    """
+    errors = np.full(len(chunk), None, dtype=object)
+    fields = [name for name in APPLICATION_FIELDS if name in chunk.columns]
+    for name in reversed(fields):
+        annotation = APPLICATION_FIELDS[name].annotation
+        values = chunk[name]
+        if typing.get_origin(annotation) is typing.Literal:
+            allowed = typing.get_args(annotation)
+            bad = ~values.isin(allowed).to_numpy()
+            message = f"{name}: must be one of {', '.join(map(str, allowed))}"
+        else:
+            numbers = pd.to_numeric(values, errors="coerce").to_numpy(np.float64)
+            bad = ~np.isfinite(numbers)
+            message = f"{name}: must be a number"
+            if annotation is int:
+                with np.errstate(invalid="ignore"):
+                    bad |= numbers != np.floor(numbers)
+                message = f"{name}: must be a whole number"
+        errors[bad] = message
+    return errors
+
+def part_path(output_dir, index, output_format):
+    return os.path.join(output_dir, f"part-{index:06d}.{output_format}")
+
+# --- INTERNALS ---
+def _add(totals, part):
+    for key in totals:
+        totals[key] += part[key]
+
+def _executor(workers):
+    if workers <= 1:
+        return None  # score in this process, one chunk at a time
+    # spawn: children load their own (memory-mapped) model instead of inheriting this process
+    return ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"))
+
+def _prepare_output(output_dir, manifest, overwrite):
+    """Indexes of the chunks already written by an earlier run with the same settings."""
+    os.makedirs(output_dir, exist_ok=True)
+    path = os.path.join(output_dir, MANIFEST)
+    previous = _read_json(path)
+    if previous is not None and not overwrite:
+        changed = [key for key in manifest if previous.get(key) != manifest[key]]
+        if changed:
+            raise BulkScoringError(
+                f"{output_dir} holds a run with different {', '.join(changed)}; use --overwrite or another directory"
+            )
+
+    done = set()
+    for name in os.listdir(output_dir):
+        if not name.startswith("part-"):
+            continue
+        if overwrite or name.endswith(".tmp"):
+            os.remove(os.path.join(output_dir, name))
+        else:
+            done.add(int(name[len("part-"):].split(".")[0]))
+    _write_json(path, {**manifest, "completed": False})
+    return done
+
+def _is_parquet(source):
+    return str(source).lower().endswith((".parquet", ".pq"))
+
+def _parquet_file(source):
+    if pq is None:
+        raise BulkScoringError("Reading Parquet needs pyarrow (pip install pyarrow)")
+    return pq.ParquetFile(source)
+
+def _read_json(path):
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+
+def _write_json(path, document):
+    with open(f"{path}.tmp", "w") as f:
+        json.dump(document, f, indent=2)
+    os.replace(f"{path}.tmp", path)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog="python -m app.services.bulk_scoring",
+        description="Score an applicant file (CSV or Parquet) with the policy rules and the current model.",
+    )
+    parser.add_argument("input", help="applicant file (.csv, .parquet)")
+    parser.add_argument("output", help="output directory (created; reused to resume)")
+    parser.add_argument("--format", choices=FORMATS, default="parquet", help="part file format (default: parquet)")
+    parser.add_argument("--chunk-rows", type=int, default=config.BULK_SCORING_CHUNK_ROWS)
+    parser.add_argument("--workers", type=int, default=config.BULK_SCORING_WORKERS, help="processes (0 = one per core)")
+    parser.add_argument("--top-k", type=int, default=0, help="also write the top K SHAP features per row")
+    parser.add_argument("--keep", default="", help="comma-separated input columns to copy to the output, e.g. id")
+    parser.add_argument("--overwrite", action="store_true", help="discard the parts of an earlier run")
+    args = parser.parse_args(argv)
+
+    keep = [column.strip() for column in args.keep.split(",") if column.strip()]
+    try:
+        score_file(args.input, args.output, args.format, args.chunk_rows, args.workers, args.top_k, keep, args.overwrite)
+    except BulkScoringError as e:
+        parser.exit(2, f"❌ {e}\n")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,155 @@
+# app/services/keyword_matcher.py
+# Tags narrations with keyword categories ("salary", "gambling", ...) in one pass.
+#
+# All keywords of all categories are compiled into one Aho-Corasick automaton,
+# flattened into a dense DFA table: next_state = delta[state, symbol].
+# Instead of walking one narration at a time in Python, we walk ALL narrations
+# of a chunk together, one character position per NumPy step:
+#   state = delta[state, chars[:, j]];  tags |= output[state]
+# So the cost is (rows x narration length) table lookups, whatever the number
+# of keywords; more keywords only make the (small) table bigger.
+#
+# Matching is the same as `keyword in narration.upper()` for every keyword.
+from collections import deque
+
+import numpy as np
+import pandas as pd
+
+CHUNK_ROWS = 65536
+DEDUPE_SAMPLE_ROWS = 10000
+MAX_CATEGORIES = 63  # one bit per category in an int64
+
+class KeywordMatcher:
+    def __init__(self, categories: dict):
+        """categories: {category name: [keywords]}, keywords are case-insensitive."""
+        if len(categories) > MAX_CATEGORIES:
+            raise ValueError(f"At most {MAX_CATEGORIES} keyword categories are supported, got {len(categories)}")
+        self.categories = list(categories)
+        self.bits = {category: 1 << i for i, category in enumerate(self.categories)}
+
+        keywords = {}  # upper-cased keyword -> category bits
+        for category, words in categories.items():
+            for word in words:
+                word = word.upper()
+                if not word:
+                    raise ValueError(f"Empty keyword in category {category!r}")
+                keywords[word] = keywords.get(word, 0) | self.bits[category]
+        self.keywords = keywords
+
+        # Symbol 0 = any character that appears in no keyword (also used as padding)
+        alphabet = sorted({ch for word in keywords for ch in word})
+        self._symbols = {ch: i + 1 for i, ch in enumerate(alphabet)}
+        # codepoint -> symbol, as a lookup table (sized to the largest keyword codepoint)
+        self._symbol_table = np.zeros(max((ord(ch) for ch in alphabet), default=0) + 1, dtype=np.int32)
+        for ch, symbol in self._symbols.items():
+            self._symbol_table[ord(ch)] = symbol
+        self.delta, self.output = self._build_automaton()
+
+    # --- PUBLIC API ---
+    def tag(self, narrations):
+        """int64 category bitmask per narration (see `bits`); TypeError on non-strings, like .upper()."""
+        narrations = pd.Series(narrations, dtype=object) if not isinstance(narrations, pd.Series) else narrations
+        if narrations.empty or not self.keywords:
+            return np.zeros(len(narrations), dtype=np.int64)
+
+        # Statements often repeat narrations (same merchant, same employer): then tag each distinct one once
+        sample = narrations.iloc[:DEDUPE_SAMPLE_ROWS]
+        if sample.nunique(dropna=False) <= len(sample) // 2:
+            inverse, distinct = pd.factorize(narrations, use_na_sentinel=False)
+            distinct = list(distinct)
+        else:
+            inverse, distinct = None, list(narrations)
+
+        codes, starts, lengths = self._encode(distinct)
+        # Similar lengths together => little padding per chunk
+        order = np.argsort(lengths, kind="stable")
+        tags = np.zeros(len(distinct), dtype=np.int64)
+        for begin in range(0, len(order), CHUNK_ROWS):
+            rows = order[begin:begin + CHUNK_ROWS]
+            tags[rows] = self._run(codes, starts[rows], lengths[rows])
+        return tags[inverse] if inverse is not None else tags
+
+    def has(self, tags, category):
+        """Boolean mask of the rows tagged with `category`."""
+        return (tags & self.bits[category]) != 0
+
+    def counts(self, tags):
+        """{category: number of rows tagged with it}"""
+        return {category: int(np.count_nonzero(tags & bit)) for category, bit in self.bits.items()}
+
+    def categories_of(self, narration: str):
+        tags = int(self.tag([narration])[0])
+        return [category for category, bit in self.bits.items() if tags & bit]
+
+    # --- MATCHING ---
+    def _encode(self, narrations):
+        """Upper-cased narrations as one flat array of symbols + each row's start/length."""
+        joined = "".join(narrations)
+        text = joined.upper()
+        if len(text) == len(joined):
+            lengths = np.fromiter(map(len, narrations), dtype=np.int64, count=len(narrations))
+        else:
+            # Some character upper-cases to several ("ß" -> "SS"): measure every row after upper()
+            lengths = np.fromiter((len(n.upper()) for n in narrations), dtype=np.int64, count=len(narrations))
+        starts = np.concatenate(([0], np.cumsum(lengths)[:-1]))
+
+        codepoints = np.frombuffer(text.encode("utf-32-le"), dtype=np.uint32)
+        # Anything beyond the table can't be in a keyword -> symbol 0
+        codepoints = np.minimum(codepoints, len(self._symbol_table))
+        table = np.append(self._symbol_table, np.int32(0))
+        return table[codepoints], starts, lengths
+
+    def _run(self, codes, starts, lengths):
+        """Walks the DFA over rows sorted by ascending length; finished rows drop off the front."""
+        n_symbols = self.delta.shape[1]
+        delta = self.delta.reshape(-1)
+        width = int(lengths[-1]) if len(lengths) else 0
+        # (position, row) matrix of symbols, so every step reads one contiguous line
+        positions = np.minimum(starts[None, :] + np.arange(width)[:, None], max(len(codes) - 1, 0))
+        columns = codes[positions] if len(codes) else np.zeros((width, len(starts)), dtype=codes.dtype)
+
+        state = np.zeros(len(starts), dtype=delta.dtype)
+        tags = np.zeros(len(starts), dtype=np.int64)
+        first_live = 0
+        for j in range(width):
+            while lengths[first_live] <= j:
+                first_live += 1
+            live = slice(first_live, None)
+            state[live] = delta[state[live] * n_symbols + columns[j, live]]
+            tags[live] |= self.output[state[live]]
+        return tags
+
+    # --- COMPILATION ---
+    def _build_automaton(self):
+        # 1. Trie of all keywords
+        goto = [{}]
+        output = [0]
+        for word, bits in self.keywords.items():
+            node = 0
+            for ch in word:
+                symbol = self._symbols[ch]
+                if symbol not in goto[node]:
+                    goto[node][symbol] = len(goto)
+                    goto.append({})
+                    output.append(0)
+                node = goto[node][symbol]
+            output[node] |= bits
+
+        # 2. Failure links (BFS), folded straight into a complete DFA table
+        n_symbols = len(self._symbols) + 1
+        delta = np.zeros((len(goto), n_symbols), dtype=np.int32)
+        fail = [0] * len(goto)
+        queue = deque()
+        for symbol, child in goto[0].items():
+            delta[0, symbol] = child
+            queue.append(child)
+        while queue:
+            node = queue.popleft()
+            # A node also reports everything its longest proper suffix reports
+            output[node] |= output[fail[node]]
+            delta[node] = delta[fail[node]]
+            for symbol, child in goto[node].items():
+                delta[node, symbol] = child
+                fail[child] = delta[fail[node], symbol]
+                queue.append(child)
+        return delta, np.array(output, dtype=np.int64)
@@ -0,0 +1,145 @@
+# app/services/micro_batcher.py
+import queue
+import threading
+import time
+import asyncio
+from concurrent.futures import Future
+
+from ..core import metrics
+
+_STOP = object()
+
+BATCH_SIZE_BUCKETS = [1, 2, 4, 8, 16, 32, 64, 128, 256, 512, 1024]
+QUEUE_DELAY_MS_BUCKETS = [0.5, 1, 2, 5, 10, 20, 50, 100, 250, 500, 1000]
+
+class MicroBatcher:
+    """
+    Merges concurrent single-item requests into one call of `batch_fn`.
+
+    The first request to arrive opens a window of `window_ms`. Everything that
+    arrives before the window closes (or until `max_batch_size` is reached) is
+    scored together, and each caller gets back its own result.
+    `batch_fn` takes a list of items and returns a list of results in the same order.
+    """
+
+    def __init__(self, batch_fn, max_batch_size=64, window_ms=5.0, name="batcher"):
+        self.batch_fn = batch_fn
+        self.max_batch_size = max(1, int(max_batch_size))
+        self.window = max(0.0, float(window_ms)) / 1000
+        self.name = name
+
+        self._queue = queue.Queue()
+        self._thread = None
+        self._start_lock = threading.Lock()
+
+        self.batch_size = metrics.histogram(f"{name}_batch_size", BATCH_SIZE_BUCKETS, "Items per model call")
+        self.queue_delay_ms = metrics.histogram(f"{name}_queue_delay_ms", QUEUE_DELAY_MS_BUCKETS, "Time an item waited before its batch ran")
+        self.batches = metrics.counter(f"{name}_batches_total", "Model calls made")
+        self.errors = metrics.counter(f"{name}_errors_total", "Model calls that raised")
+        self.queue_depth = metrics.gauge(f"{name}_queue_depth", "Items waiting for a batch")
+
+    # --- PUBLIC API ---
+    def submit(self, item) -> Future:
+        self._ensure_started()
+        future = Future()
+        self.queue_depth.inc()
+        self._queue.put((item, future, time.perf_counter()))
+        return future
+
+    def predict(self, item, timeout=None):
+        # For sync routes (they already run in a worker thread)
+        return self.submit(item).result(timeout=timeout)
+
+    async def predict_async(self, item):
+        # For async routes: wait without blocking the event loop
+        return await asyncio.wrap_future(self.submit(item))
+
+    def stop(self, timeout=5.0):
+        with self._start_lock:
+            thread = self._thread
+            self._thread = None
+        if thread is not None:
+            self._queue.put(_STOP)
+            thread.join(timeout=timeout)
+
+    # --- WORKER ---
+    def _ensure_started(self):
+        thread = self._thread
+        if thread is not None and thread.is_alive():
+            return
+        with self._start_lock:
+            # Also restarts a worker that died, so callers never queue behind a dead thread
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name=self.name, daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        stopping = False
+        while not stopping:
+            first = self._queue.get()
+            if first is _STOP:
+                break
+
+            # 1. Collect until the window (opened by the first item) closes or the batch is full
+            batch = [first]
+            deadline = first[2] + self.window
+            while len(batch) < self.max_batch_size:
+                remaining = deadline - time.perf_counter()
+                try:
+                    entry = self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if entry is _STOP:
+                    stopping = True
+                    break
+                batch.append(entry)
+
+            # 2. One model call for the whole batch
+            self._flush(batch)
+
+        # Anything still queued after stop() is scored before the thread exits
+        leftovers = []
+        while True:
+            try:
+                entry = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if entry is not _STOP:
+                leftovers.append(entry)
+        for start in range(0, len(leftovers), self.max_batch_size):
+            self._flush(leftovers[start:start + self.max_batch_size])
+
+    def _flush(self, batch):
+        started = time.perf_counter()
+        self.queue_depth.dec(len(batch))
+        self.batch_size.observe(len(batch))
+        self.batches.inc()
+        for _, _, enqueued in batch:
+            self.queue_delay_ms.observe((started - enqueued) * 1000)
+
+        # Callers that gave up (disconnect, timeout) cancelled their future: don't score them
+        batch = [entry for entry in batch if entry[1].set_running_or_notify_cancel()]
+        if not batch:
+            return
+
+        try:
+            results = self.batch_fn([item for item, _, _ in batch])
+        except Exception as e:
+            self.errors.inc()
+            for _, future, _ in batch:
+                _resolve(future, exception=e)
+            return
+
+        # 3. Hand each waiting caller its own result
+        for (_, future, _), result in zip(batch, results):
+            _resolve(future, result=result)
+
+def _resolve(future, result=None, exception=None):
+    # One future in a bad state must never take the worker thread down with it
+    try:
+        if exception is not None:
+            future.set_exception(exception)
+        else:
+            future.set_result(result)
+    except Exception as e:
+        print(f"⚠️ Dropped a batch result: {e}")
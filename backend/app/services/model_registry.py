@@ -0,0 +1,300 @@
+# app/services/model_registry.py
+# Owns the loaded model and loads it lazily or in the background instead of at import.
+#
+# Loading order:
+#   1. ml_model.npz (compiled trees, NumPy only) if it matches ml_model.joblib,
+#      copied once into MODEL_MMAP_DIR as plain .npy files and memory-mapped,
+#      so every worker on the box shares the same physical pages.
+#   2. The CatBoost joblib model, only when something actually needs it
+#      (no compiled copy, or a CatBoost-only code path).
+#
+# Hot reload: `reload()` builds and warms a complete new bundle off to the side,
+# then swaps one reference. Requests grab the bundle once, so in-flight work
+# finishes on the version it started with. Replace the model file with an
+# atomic rename (write ml_model.joblib.tmp, then mv) so a reload never reads
+# half a file.
+import os
+import shutil
+import tempfile
+import threading
+import time
+from collections import deque
+
+import joblib
+
+from ..core import metrics
+from .tree_model import CompiledTreeModel, file_sha256
+from .tree_shap import TreeShapExplainer
+
+class ModelBundle:
+    """Everything one model version needs to score. Never mutated after loading."""
+
+    def __init__(self, model_path, version, compiled=None, explainer=None, model=None):
+        self.model_path = model_path
+        self.version = version
+        self.compiled = compiled
+        self.explainer = explainer
+        self._model = model
+        self._model_loaded = model is not None
+        self._model_lock = threading.Lock()
+
+    @property
+    def model(self):
+        # The CatBoost object (or None); unpickled on first use only
+        if not self._model_loaded:
+            with self._model_lock:
+                if not self._model_loaded:
+                    self._model = _load_catboost(self.model_path)
+                    self._model_loaded = True
+        return self._model
+
+class ModelRegistry:
+    def __init__(self, model_path, compiled_path, mmap_dir=None, use_compiled=True, tree_shap=True,
+                 warm_up=None, history_size=10):
+        self.model_path = model_path
+        self.compiled_path = compiled_path
+        self.mmap_dir = mmap_dir
+        self.use_compiled = use_compiled
+        self.tree_shap = tree_shap
+        # warm_up(bundle) runs a few synthetic rows through a new bundle before it goes live
+        self.warm_up = warm_up
+        self.history = deque(maxlen=history_size)  # most recent versions that went live
+
+        self.state = "not_loaded"  # not_loaded -> loading -> ready | failed
+        self.error = None
+        self._bundle = None
+        self._lock = threading.Lock()
+        self._ready = threading.Event()
+        self._thread = None
+        self._reload_lock = threading.Lock()
+        self._watch_thread = None
+
+        self.load_seconds = metrics.gauge("model_load_seconds", "Wall time of the last model load")
+        self.reload_seconds = metrics.histogram(
+            "model_reload_seconds", [0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30], "Load + warm-up + swap of a new model version"
+        )
+        self.warmup_seconds = metrics.histogram(
+            "model_warmup_seconds", [0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5], "Synthetic warm-up of a freshly loaded model"
+        )
+        self.reloads = metrics.counter("model_reloads_total", "Model versions swapped in at runtime")
+        self.reload_failures = metrics.counter("model_reload_failures_total", "Reloads that kept the old model")
+
+    # --- PUBLIC API ---
+    def get(self, timeout=None) -> ModelBundle:
+        """The current bundle. Loads it in this thread if nobody has started yet."""
+        if self._bundle is not None:
+            return self._bundle
+        if self._start():
+            self._load()
+        if not self._ready.wait(timeout):
+            raise TimeoutError("Model is still loading")
+        if self._bundle is None:
+            raise RuntimeError(f"Model failed to load: {self.error}")
+        return self._bundle
+
+    def start_background_load(self):
+        if self._start():
+            self._thread = threading.Thread(target=self._load, name="model-loader", daemon=True)
+            self._thread.start()
+
+    def is_ready(self):
+        return self.state == "ready"
+
+    def status(self):
+        bundle = self._bundle
+        return {
+            "state": self.state,
+            "error": self.error,
+            "version": bundle.version if bundle else None,
+            "compiled": bool(bundle and bundle.compiled is not None),
+            "shared_memory": bool(bundle and bundle.compiled is not None and _is_memmap(bundle.compiled.leaf_values)),
+            "load_seconds": self.load_seconds.value,
+            "reloading": self._reload_lock.locked(),
+            "history": list(self.history),
+        }
+
+    # --- HOT RELOAD ---
+    def reload(self):
+        """
+        Loads the model files again, warms the new bundle up and swaps it in.
+        On any failure the current bundle keeps serving. Returns the new status.
+        """
+        with self._reload_lock:
+            started = time.perf_counter()
+            previous = self._bundle
+            try:
+                bundle = self.load_bundle()
+                if previous is not None and bundle.version == previous.version:
+                    print(f"✅ Model {bundle.version[:12]} is already live, nothing to reload")
+                    return self.status()
+                warmup = self._warm(bundle)
+            except Exception as e:
+                self.reload_failures.inc()
+                print(f"❌ Model reload failed, keeping the current model: {e}")
+                raise
+
+            # The swap: one reference assignment, requests already running keep `previous`
+            self._bundle = bundle
+            self.state, self.error = "ready", None
+            self._ready.set()
+
+            elapsed = time.perf_counter() - started
+            self.reload_seconds.observe(elapsed)
+            self.reloads.inc()
+            self._record(bundle, elapsed, warmup)
+            print(f"✅ Model {previous.version[:12] if previous else None} -> {bundle.version[:12]} in {elapsed:.2f}s")
+            return self.status()
+
+    def start_reload(self):
+        """reload() in a background thread. False if a reload is already running."""
+        if self._reload_lock.locked():
+            return False
+        threading.Thread(target=self._reload_quietly, name="model-reloader", daemon=True).start()
+        return True
+
+    def watch(self, interval_seconds):
+        """Reloads whenever the model file changes (polls its mtime/size)."""
+        if interval_seconds <= 0 or self._watch_thread is not None:
+            return
+        self._watch_thread = threading.Thread(
+            target=self._watch_loop, args=(interval_seconds,), name="model-watcher", daemon=True
+        )
+        self._watch_thread.start()
+
+    def _reload_quietly(self):
+        try:
+            self.reload()
+        except Exception:
+            pass  # already counted and logged by reload()
+
+    def _watch_loop(self, interval_seconds):
+        last = _file_state(self.model_path)
+        while True:
+            time.sleep(interval_seconds)
+            state = _file_state(self.model_path)
+            if state != last and state is not None:
+                last = state
+                self._reload_quietly()
+
+    def _warm(self, bundle):
+        if self.warm_up is None:
+            return 0.0
+        started = time.perf_counter()
+        self.warm_up(bundle)
+        elapsed = time.perf_counter() - started
+        self.warmup_seconds.observe(elapsed)
+        return elapsed
+
+    def _record(self, bundle, load_seconds, warmup_seconds):
+        self.history.append({
+            "version": bundle.version,
+            "compiled": bundle.compiled is not None,
+            "loaded_at": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+            "load_seconds": round(load_seconds, 4),
+            "warmup_seconds": round(warmup_seconds, 4),
+        })
+
+    # --- LOADING ---
+    def _start(self):
+        # True for exactly one caller: the one that should run _load
+        with self._lock:
+            if self.state != "not_loaded":
+                return False
+            self.state = "loading"
+            return True
+
+    def _load(self):
+        started = time.perf_counter()
+        try:
+            bundle = self.load_bundle()
+            warmup = self._warm(bundle)
+            self._bundle = bundle
+            self.state = "ready"
+            self._record(bundle, time.perf_counter() - started, warmup)
+            print(f"✅ Model {self._bundle.version and self._bundle.version[:12]} ready")
+        except Exception as e:
+            self.error = str(e)
+            self.state = "failed"
+            print(f"❌ Failed to load model: {e}")
+        finally:
+            self.load_seconds.set(time.perf_counter() - started)
+            self._ready.set()
+
+    def load_bundle(self) -> ModelBundle:
+        version = file_sha256(self.model_path) if os.path.exists(self.model_path) else None
+
+        compiled, explainer = None, None
+        if self.use_compiled and os.path.exists(self.compiled_path):
+            compiled, explainer = self._load_compiled(version)
+            if compiled is not None and version is None:
+                version = compiled.source_sha256
+
+        bundle = ModelBundle(self.model_path, version, compiled=compiled, explainer=explainer)
+        if explainer is None:
+            # CatBoost is the scorer, so load it now rather than on the first request
+            if bundle.model is None:
+                raise RuntimeError(f"No usable model at {self.model_path}")
+        return bundle
+
+    def _load_compiled(self, version):
+        try:
+            packed = CompiledTreeModel.load(self.compiled_path)
+        except Exception as e:
+            print(f"❌ Failed to load compiled model: {e}")
+            return None, None
+        if version is not None and packed.source_sha256 != version:
+            print("⚠️ Compiled model is stale, re-run: python -m app.services.tree_model")
+            return None, None
+
+        if self.mmap_dir:
+            try:
+                return self._map_shared(packed)
+            except OSError as e:
+                print(f"⚠️ Could not share model pages via {self.mmap_dir}: {e}")
+
+        explainer = TreeShapExplainer(packed) if self.tree_shap else None
+        return packed, explainer
+
+    def _map_shared(self, packed):
+        # The first worker writes plain .npy files; everyone (including itself) maps them read-only
+        target = os.path.join(self.mmap_dir, (packed.source_sha256 or "unversioned")[:16])
+        if not os.path.exists(os.path.join(target, "meta.json")):
+            os.makedirs(self.mmap_dir, exist_ok=True)
+            staging = tempfile.mkdtemp(dir=self.mmap_dir, prefix=".staging-")
+            try:
+                packed.save_dir(staging)
+                TreeShapExplainer(packed).save_dir(staging)
+                os.rename(staging, target)
+            except OSError:
+                # Another worker won the race; use its copy
+                shutil.rmtree(staging, ignore_errors=True)
+                if not os.path.exists(os.path.join(target, "meta.json")):
+                    raise
+
+        compiled = CompiledTreeModel.load_dir(target, mmap=True)
+        explainer = TreeShapExplainer.load_dir(compiled, target, mmap=True) if self.tree_shap else None
+        return compiled, explainer
+
+def _load_catboost(model_path):
+    try:
+        model = joblib.load(model_path)
+        print("✅ ML Model Loaded Successfully")
+        return model
+    except Exception as e:
+        print(f"❌ Failed to load model: {e}")
+        return None
+
+def _file_state(path):
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return st.st_mtime_ns, st.st_size
+
+def _is_memmap(array):
+    import numpy as np
+    while array is not None:
+        if isinstance(array, np.memmap):
+            return True
+        array = getattr(array, "base", None)
+    return False
@@ -0,0 +1,338 @@
+# app/services/policy_rules.py
+# Declarative policy rules, compiled once into vectorized NumPy expressions.
+#
+# A rule rejects the rows its `when` expression is true for:
+#   {"name": "min_credit_score",
+#    "when": "credit_score < 650",
+#    "reason": "Credit Score below policy threshold (650)."}
+# `when` is a small expression language over the application's columns:
+# numbers and strings, + - * / // % **, comparisons (chained too: 21 <= age < 60),
+# and / or / not, `x in [...]`, abs(), min(a, b), max(a, b). Named sub-expressions
+# can be declared once under "derived" ({"loan_to_income": "loan_amount / income"})
+# and used by any rule. `{expression}` placeholders in the reason are filled in
+# per rejected row ("Max allowed: {income * 10}").
+#
+# Rules run in order over whole columns at once; each row gets the FIRST rule it
+# fails (or passes them all). Rows already rejected are dropped from the working
+# set as it shrinks, so later rules only look at the rows still undecided.
+# Missing values (NaN) compare false, i.e. don't trigger a rule.
+import ast
+import json
+import string
+
+import numpy as np
+import pandas as pd
+
+from .. import schemas
+from ..core import config
+
+APPLICATION_COLUMNS = list(schemas.LoanApplicationCreate.model_fields)
+
+BUILTIN_RULES = [
+    # The "CIBIL" cutoff: in India, < 650 is usually considered sub-prime
+    {
+        "name": "min_credit_score",
+        "when": "credit_score < 650",
+        "reason": "Credit Score below policy threshold (650).",
+    },
+    # Loan-to-income: no more than 10x monthly income (simplified rule)
+    {
+        "name": "max_loan_to_income",
+        "when": "loan_amount > income * 10",
+        "reason": "Loan amount exceeds 10x monthly income limit. Max allowed: {income * 10}",
+    },
+]
+
+PASS_REASON = "Passed all preliminary policy checks."
+
+class PolicyRuleError(ValueError):
+    """A rule definition that can't be compiled."""
+
+# --- EXPRESSIONS ---
+_COMPARISONS = (ast.Lt, ast.LtE, ast.Gt, ast.GtE, ast.Eq, ast.NotEq)
+_ARITHMETIC = (ast.Add, ast.Sub, ast.Mult, ast.Div, ast.FloorDiv, ast.Mod, ast.Pow)
+_FUNCTIONS = {"abs": "_abs", "min": "_minimum", "max": "_maximum"}
+
+_NAMESPACE = {
+    "__builtins__": {},
+    "_and": np.logical_and,
+    "_or": np.logical_or,
+    "_not": np.logical_not,
+    "_isin": np.isin,
+    "_abs": np.abs,
+    "_minimum": np.minimum,
+    "_maximum": np.maximum,
+}
+
+class _Vectorize(ast.NodeTransformer):
+    """Python boolean syntax -> elementwise NumPy calls. Anything outside the language is rejected."""
+
+    def __init__(self, source):
+        self.source = source
+        self.names = set()
+
+    def fail(self, node, what):
+        raise PolicyRuleError(f"{self.source!r}: {what} is not supported")
+
+    def generic_visit(self, node):
+        self.fail(node, type(node).__name__)
+
+    def call(self, fn, *args):
+        return ast.Call(func=ast.Name(id=fn, ctx=ast.Load()), args=list(args), keywords=[])
+
+    def visit_Expression(self, node):
+        node.body = self.visit(node.body)
+        return node
+
+    def visit_Name(self, node):
+        if node.id.startswith("_"):
+            self.fail(node, f"name {node.id!r}")
+        self.names.add(node.id)
+        return node
+
+    def visit_Constant(self, node):
+        if isinstance(node.value, bool) or not isinstance(node.value, (int, float, str)):
+            self.fail(node, f"constant {node.value!r}")
+        return node
+
+    def visit_List(self, node):
+        for element in node.elts:
+            if not isinstance(element, ast.Constant):
+                self.fail(element, "a non-constant list element")
+            self.visit_Constant(element)
+        return node
+
+    visit_Tuple = visit_List
+
+    def visit_BinOp(self, node):
+        if not isinstance(node.op, _ARITHMETIC):
+            self.fail(node, type(node.op).__name__)
+        return ast.BinOp(left=self.visit(node.left), op=node.op, right=self.visit(node.right))
+
+    def visit_UnaryOp(self, node):
+        if isinstance(node.op, ast.Not):
+            return self.call("_not", self.visit(node.operand))
+        if isinstance(node.op, (ast.USub, ast.UAdd)):
+            return ast.UnaryOp(op=node.op, operand=self.visit(node.operand))
+        self.fail(node, type(node.op).__name__)
+
+    def visit_BoolOp(self, node):
+        fn = "_and" if isinstance(node.op, ast.And) else "_or"
+        values = [self.visit(value) for value in node.values]
+        result = values[0]
+        for value in values[1:]:
+            result = self.call(fn, result, value)
+        return result
+
+    def visit_Compare(self, node):
+        left = self.visit(node.left)
+        if len(node.ops) == 1 and isinstance(node.ops[0], (ast.In, ast.NotIn)):
+            choices = node.comparators[0]
+            if not isinstance(choices, (ast.List, ast.Tuple)):
+                self.fail(choices, "`in` with anything but a literal list")
+            result = self.call("_isin", left, ast.List(elts=self.visit(choices).elts, ctx=ast.Load()))
+            return self.call("_not", result) if isinstance(node.ops[0], ast.NotIn) else result
+
+        # a < b <= c  ->  _and(a < b, b <= c)
+        parts = []
+        for op, right in zip(node.ops, node.comparators):
+            if not isinstance(op, _COMPARISONS):
+                self.fail(node, f"{type(op).__name__} in a chained comparison")
+            right = self.visit(right)
+            parts.append(ast.Compare(left=left, ops=[op], comparators=[right]))
+            left = right
+        result = parts[0]
+        for part in parts[1:]:
+            result = self.call("_and", result, part)
+        return result
+
+    def visit_Call(self, node):
+        if not isinstance(node.func, ast.Name) or node.func.id not in _FUNCTIONS or node.keywords:
+            self.fail(node, f"calling {ast.unparse(node.func)!r}")
+        expected = 1 if node.func.id == "abs" else 2
+        if len(node.args) != expected:
+            raise PolicyRuleError(f"{self.source!r}: {node.func.id}() takes {expected} argument(s)")
+        return self.call(_FUNCTIONS[node.func.id], *[self.visit(arg) for arg in node.args])
+
+class Expression:
+    """One compiled expression; evaluate(columns) works on whole NumPy columns at once."""
+
+    def __init__(self, source):
+        self.source = source
+        try:
+            tree = ast.parse(str(source).strip(), mode="eval")
+        except SyntaxError as e:
+            raise PolicyRuleError(f"{source!r}: {e.msg}") from None
+        vectorize = _Vectorize(source)
+        tree = ast.fix_missing_locations(vectorize.visit(tree))
+        self.names = vectorize.names
+        self.code = compile(tree, f"<policy {source}>", "eval")
+
+    def evaluate(self, columns):
+        return eval(self.code, _NAMESPACE, columns)
+
+class Rule:
+    def __init__(self, name, when, reason=None, enabled=True):
+        self.name = name
+        self.when = Expression(when)
+        self.reason = reason or f"Failed policy rule {name}."
+        self.enabled = enabled
+        # "Max allowed: {income * 10}" -> "Max allowed: {0}" + the compiled placeholder expressions
+        try:
+            parsed = list(string.Formatter().parse(self.reason))
+        except ValueError as e:
+            raise PolicyRuleError(f"Rule {name!r}: bad reason template: {e}") from None
+        self.fields = []
+        self.template = ""
+        for text, field, spec, _ in parsed:
+            self.template += text.replace("{", "{{").replace("}", "}}")
+            if field is not None:
+                self.template += f"{{{len(self.fields)}:{spec or ''}}}"
+                self.fields.append(Expression(field))
+        self.names = set(self.when.names)
+        for field in self.fields:
+            self.names |= field.names
+
+    def reasons(self, columns, n):
+        """The reason for each of the n rows in `columns` (all of which failed this rule)."""
+        if not self.fields:
+            return [self.reason] * n
+        values = [np.broadcast_to(field.evaluate(columns), (n,)).tolist() for field in self.fields]
+        return [self.template.format(*row) for row in zip(*values)]
+
+class RuleSet:
+    def __init__(self, rules, derived=None, columns=APPLICATION_COLUMNS):
+        self.derived = {name: Expression(source) for name, source in (derived or {}).items()}
+        self.rules = [rule for rule in rules if rule.enabled]
+        names = [rule.name for rule in self.rules]
+        if len(set(names)) != len(names):
+            raise PolicyRuleError(f"Duplicate rule names in {names}")
+
+        # Every name must be a column or a derived value (derived ones may use earlier derived ones)
+        known = set(columns)
+        for name, expression in self.derived.items():
+            self._check_names(f"derived {name!r}", expression.names, known)
+            known.add(name)
+        for rule in self.rules:
+            self._check_names(f"rule {rule.name!r}", rule.names, known)
+        used = set().union(*(rule.names for rule in self.rules)) if self.rules else set()
+        for expression in self.derived.values():
+            used |= expression.names
+        self.columns = [column for column in columns if column in used]
+
+    @staticmethod
+    def _check_names(what, names, known):
+        unknown = sorted(names - known)
+        if unknown:
+            raise PolicyRuleError(f"{what} uses unknown names {unknown}; columns are {sorted(known)}")
+
+    # --- EVALUATION ---
+    def first_failures(self, columns, n):
+        """Index into self.rules of the first rule each of the n rows fails, -1 where it passes them all."""
+        failed = np.full(n, -1, dtype=np.int32)
+        rows = np.arange(n)  # original positions of the working set
+        undecided = None  # over the working set; None = all of it
+        working = self._with_derived(columns, n)
+        with np.errstate(divide="ignore", invalid="ignore", over="ignore"):
+            for i, rule in enumerate(self.rules):
+                mask = np.broadcast_to(np.asarray(rule.when.evaluate(working), dtype=bool), rows.shape)
+                if undecided is not None:
+                    mask = mask & undecided
+                hits = rows[mask]
+                if not len(hits):
+                    continue
+                failed[hits] = i
+                undecided = ~mask if undecided is None else undecided & ~mask
+                remaining = np.count_nonzero(undecided)
+                if not remaining:
+                    break
+                # Once at most half the working set is undecided, later rules only get those rows
+                if remaining * 2 <= len(rows):
+                    rows = rows[undecided]
+                    working = {name: values[undecided] for name, values in working.items()}
+                    undecided = None
+        return failed
+
+    def check_columns(self, columns, n, with_reasons=True):
+        """
+        (statuses, rule names, reasons) lists for n rows given as {column: array}.
+        Formatting a reason per rejected row is most of the cost; with_reasons=False leaves them None.
+        """
+        columns = {name: np.asarray(columns[name]) for name in self.columns}
+        failed = self.first_failures(columns, n)
+        statuses = np.where(failed >= 0, "REJECTED", "APPROVED").tolist()
+        names = np.full(n, None, dtype=object)
+        reasons = np.full(n, PASS_REASON if with_reasons else None, dtype=object)
+        with np.errstate(divide="ignore", invalid="ignore", over="ignore"):
+            for i in np.unique(failed[failed >= 0]):
+                rule = self.rules[i]
+                rows = np.flatnonzero(failed == i)
+                names[rows] = rule.name
+                if with_reasons:
+                    subset = self._with_derived({name: values[rows] for name, values in columns.items()}, len(rows))
+                    reasons[rows] = rule.reasons(subset, len(rows))
+        return statuses, names.tolist(), reasons.tolist()
+
+    def check_frame(self, frame, with_reasons=True):
+        """A historical table (one row per application) -> DataFrame of status, rule, reason."""
+        missing = [column for column in self.columns if column not in frame.columns]
+        if missing:
+            raise PolicyRuleError(f"Columns {missing} are needed by the policy rules")
+        statuses, names, reasons = self.check_columns({name: frame[name].to_numpy() for name in self.columns}, len(frame), with_reasons)
+        return pd.DataFrame({"status": statuses, "rule": names, "reason": reasons}, index=frame.index)
+
+    def check_application(self, application):
+        """(status, reason) for one LoanApplicationCreate: the same expressions on NumPy scalars, no arrays."""
+        row = {name: _scalar(getattr(application, name)) for name in self.columns}
+        with np.errstate(divide="ignore", invalid="ignore", over="ignore"):
+            for name, expression in self.derived.items():
+                row[name] = expression.evaluate(row)
+            for rule in self.rules:
+                if rule.when.evaluate(row):
+                    return "REJECTED", rule.reasons(row, 1)[0]
+        return "APPROVED", PASS_REASON
+
+    def check_applications(self, applications):
+        """[(status, reason)] for a list of LoanApplicationCreate, in order."""
+        columns = {name: np.array([getattr(application, name) for application in applications]) for name in self.columns}
+        statuses, _, reasons = self.check_columns(columns, len(applications))
+        return list(zip(statuses, reasons))
+
+    def _with_derived(self, columns, n):
+        working = dict(columns)
+        with np.errstate(divide="ignore", invalid="ignore", over="ignore"):
+            for name, expression in self.derived.items():
+                working[name] = np.broadcast_to(expression.evaluate(working), (n,))
+        return working
+
+def _scalar(value):
+    # Same dtypes as np.array() gives a column of these values
+    if isinstance(value, bool):
+        return np.bool_(value)
+    if isinstance(value, int):
+        return np.int64(value)
+    if isinstance(value, float):
+        return np.float64(value)
+    return value
+
+def load_rules(path=None):
+    """
+    Built-in rules plus a JSON file of {"derived": {name: expression}, "rules": [rule, ...]}.
+    A file rule replaces the built-in of the same name in place ("enabled": false drops it);
+    new rules run after the built-ins, in file order.
+    """
+    definitions = [dict(rule) for rule in BUILTIN_RULES]
+    derived = {}
+    if path:
+        with open(path) as f:
+            document = json.load(f)
+        derived = document.get("derived", {})
+        by_name = {rule["name"]: i for i, rule in enumerate(definitions)}
+        for rule in document.get("rules", []):
+            if rule.get("name") in by_name:
+                definitions[by_name[rule["name"]]] = rule
+            else:
+                definitions.append(rule)
+    return RuleSet([Rule(**definition) for definition in definitions], derived=derived)
+
+policy = load_rules(config.POLICY_RULES_FILE)
@@ -0,0 +1,173 @@
+# app/services/prediction_cache.py
+# Bounded cache of (risk_score, risk_factors) keyed by the model's feature vector.
+#
+# Retries and double-submits send the exact same applicant again, so we key on
+# what the model actually sees (category strings + float32 numbers) plus the
+# model version. A new model => new keys, and the old entries are dropped.
+import hashlib
+import json
+import os
+import struct
+import threading
+import time
+from collections import OrderedDict
+
+from ..core import metrics
+
+class LocalBackend:
+    """In-process LRU with a TTL. Thread-safe."""
+
+    def __init__(self, max_size, ttl_seconds, on_evict=None):
+        self.max_size = max(1, int(max_size))
+        self.ttl = float(ttl_seconds)
+        self.on_evict = on_evict
+        self._data = OrderedDict()  # key -> (expires_at, value)
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at < time.monotonic():
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value, ttl=None):
+        """ttl overrides the default for this entry (seconds)."""
+        with self._lock:
+            self._data[key] = (time.monotonic() + (self.ttl if ttl is None else ttl), value)
+            self._data.move_to_end(key)
+            evicted = 0
+            while len(self._data) > self.max_size:
+                self._data.popitem(last=False)
+                evicted += 1
+        if evicted and self.on_evict:
+            self.on_evict(evicted)
+
+    def delete(self, key):
+        with self._lock:
+            return self._data.pop(key, None) is not None
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+class RedisBackend:
+    """
+    Shared cache for several uvicorn workers. Needs the `redis` package.
+    TTL is enforced with SETEX; size/LRU eviction is Redis's own
+    `maxmemory-policy allkeys-lru`.
+    """
+
+    def __init__(self, url, ttl_seconds, namespace="prediction"):
+        try:
+            import redis
+        except ImportError as e:
+            raise RuntimeError("PREDICTION_CACHE_URL is set but the 'redis' package is not installed") from e
+        self.client = redis.Redis.from_url(url)
+        self.ttl = max(1, int(ttl_seconds))
+        self.namespace = namespace
+
+    def get(self, key):
+        raw = self.client.get(f"{self.namespace}:{key}")
+        if raw is None:
+            return None
+        risk_score, risk_factors = json.loads(raw)
+        return risk_score, risk_factors
+
+    def set(self, key, value):
+        self.client.setex(f"{self.namespace}:{key}", self.ttl, json.dumps(value))
+
+    def clear(self):
+        # Keys carry the model version, so old entries simply stop being read and expire
+        pass
+
+    def __len__(self):
+        return 0
+
+class PredictionCache:
+    def __init__(self, max_size=10000, ttl_seconds=300, url=None, watch_path=None, check_interval=5.0):
+        self.hits = metrics.counter("prediction_cache_hits_total", "Cached scores returned")
+        self.misses = metrics.counter("prediction_cache_misses_total", "Scores that had to be computed")
+        self.evictions = metrics.counter("prediction_cache_evictions_total", "Entries dropped by the LRU bound")
+        self.invalidations = metrics.counter("prediction_cache_invalidations_total", "Full clears because the model file changed")
+
+        if url:
+            self.backend = RedisBackend(url, ttl_seconds)
+        else:
+            self.backend = LocalBackend(max_size, ttl_seconds, on_evict=self.evictions.inc)
+
+        # Model-file watch: cheap stat() at most every `check_interval` seconds
+        self.watch_path = watch_path
+        self.check_interval = check_interval
+        self._last_check = 0.0
+        self._file_state = self._stat()
+
+    # --- KEYS ---
+    @staticmethod
+    def make_key(model_version, feature_vector):
+        """
+        feature_vector is in the model's column order (see ml_service._feature_vector).
+        Numbers are packed as float32, which is exactly the precision the trees compare at.
+        """
+        strings, numbers = [], []
+        for value in feature_vector:
+            if isinstance(value, str):
+                strings.append(value)
+            else:
+                numbers.append(float(value))
+        packed = "\x1f".join(strings).encode() + b"\x1e" + struct.pack(f"<{len(numbers)}f", *numbers)
+        return f"{model_version}:{hashlib.sha1(packed).hexdigest()}"
+
+    # --- LOOKUPS ---
+    def get(self, key):
+        self._check_model_file()
+        value = self.backend.get(key)
+        if value is None:
+            self.misses.inc()
+            return None
+        self.hits.inc()
+        risk_score, risk_factors = value
+        # Hand out copies so callers can't mutate what's cached
+        return risk_score, [dict(factor) for factor in risk_factors]
+
+    def set(self, key, value):
+        self.backend.set(key, value)
+
+    def clear(self):
+        self.backend.clear()
+
+    def stats(self):
+        total = self.hits.value + self.misses.value
+        return {
+            "size": len(self.backend),
+            "hits": self.hits.value,
+            "misses": self.misses.value,
+            "evictions": self.evictions.value,
+            "hit_rate": self.hits.value / total if total else 0.0,
+        }
+
+    # --- INVALIDATION ---
+    def _stat(self):
+        if not self.watch_path or not os.path.exists(self.watch_path):
+            return None
+        st = os.stat(self.watch_path)
+        return st.st_mtime_ns, st.st_size
+
+    def _check_model_file(self):
+        now = time.monotonic()
+        if not self.watch_path or now - self._last_check < self.check_interval:
+            return
+        self._last_check = now
+        state = self._stat()
+        if state != self._file_state:
+            self._file_state = state
+            self.invalidations.inc()
+            self.clear()
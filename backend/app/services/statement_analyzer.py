@@ -1,56 +1,166 @@
 # app/services/statement_analyzer.py
+# Salary / bounce / gambling / balance signals from a bank statement.
+#
+# Works on whole columns instead of one transaction dict at a time:
+#   - narrations are tagged with keyword categories by one multi-pattern
+#     automaton (see keyword_matcher.py); the categories come from
+#     DEFAULT_KEYWORD_CATEGORIES plus an optional JSON file (STATEMENT_KEYWORDS_FILE),
+#   - amounts, types and balances are NumPy masks and cumulative sums.
+# Sums use np.cumsum (strict left-to-right adds, like the old Python loop)
+# rather than np.sum (pairwise), so the results are bit-for-bit identical.
+import json
+
+import numpy as np
+import pandas as pd
+
+from ..core import config
+from .keyword_matcher import KeywordMatcher
+
+SALARY_MIN_CREDIT = 10000
+# The analyzer's own signals; a keywords file can extend these and add new categories
+DEFAULT_KEYWORD_CATEGORIES = {
+    "salary": ["SALARY", "ACH"],
+    "bounce": ["BOUNCE", "RETURN"],
+    "gambling": ["DREAM11", "RUMMY", "BET365"],
+}
+
+def load_keyword_categories(path=None):
+    """
+    DEFAULT_KEYWORD_CATEGORIES merged with a JSON file of {category: [keywords]}.
+    A category in the file replaces the default one of the same name.
+    """
+    categories = {category: list(words) for category, words in DEFAULT_KEYWORD_CATEGORIES.items()}
+    if path:
+        with open(path) as f:
+            extra = json.load(f)
+        for category, words in extra.items():
+            if not isinstance(words, list) or not all(isinstance(word, str) for word in words):
+                raise ValueError(f"Keywords for {category!r} must be a list of strings")
+            categories[category] = words
+    return categories
+
+matcher = KeywordMatcher(load_keyword_categories(config.STATEMENT_KEYWORDS_FILE))
 
 def analyze_statement(statement_json: dict):
     transactions = statement_json.get("transactions", [])
-    
-    total_salary_credits = 0
-    salary_count = 0
-    bounces = 0
-    gambling_flags = 0
-    
-    # Calculate Average Closing Balance (if available)
-    total_balance = 0
-    balance_count = 0
-
-    for txn in transactions:
-        narration = txn["narration"].upper()
-        amount = txn["amount"]
-        txn_type = txn["type"]
-        
-        # 1. Detect Salary
+    return analyze_columns(
+        narrations=[txn["narration"] for txn in transactions],
+        amounts=[txn["amount"] for txn in transactions],
+        types=[txn["type"] for txn in transactions],
+        # Only transactions that carry a closing balance count towards the average
+        balances=[txn["closingbalance"] for txn in transactions if "closingbalance" in txn],
+    )
+
+def analyze_frame(df: pd.DataFrame):
+    """Same result as analyze_statement(df.to_dict(orient="records")), without the dicts."""
+    accumulator = StatementAccumulator()
+    accumulator.add_frame(df)
+    return accumulator.result()
+
+def analyze_columns(narrations, amounts, types, balances=None):
+    """
+    Columnar core. Every argument is array-like (list, NumPy array, pandas Series)
+    and narrations/amounts/types are aligned row by row.
+    """
+    accumulator = StatementAccumulator()
+    accumulator.add_columns(narrations, amounts, types, balances)
+    return accumulator.result()
+
+class StatementAccumulator:
+    """
+    Running totals for a statement fed in pieces (e.g. CSV chunks).
+    Feeding the rows in order gives exactly the result of analyzing them all at once.
+    """
+
+    def __init__(self):
+        self.total_salary_credits = 0
+        self.salary_count = 0
+        self.total_balance = 0
+        self.balance_count = 0
+        self.category_counts = dict.fromkeys(matcher.categories, 0)
+
+    def add_frame(self, df: pd.DataFrame):
+        self.add_columns(
+            narrations=df["narration"],
+            amounts=df["amount"],
+            types=df["type"],
+            balances=df["closingbalance"] if "closingbalance" in df.columns else None,
+        )
+
+    def add_columns(self, narrations, amounts, types, balances=None):
+        # 1. Keyword categories of every narration (one scan for all keywords)
+        tags = matcher.tag(_as_object_array(narrations))
+        for category, count in matcher.counts(tags).items():
+            self.category_counts[category] += count
+
+        # 2. Detect Salary
         # Logic: Credit > 10000 AND contains "SALARY" or "ACH"
-        if txn_type == "CREDIT" and amount > 10000 and ("SALARY" in narration or "ACH" in narration):
-            total_salary_credits += amount
-            salary_count += 1
-            
-        # 2. Detect Bounces
-        if "BOUNCE" in narration or "RETURN" in narration:
-            bounces += 1
-            
-        # 3. Detect Gambling
-        if "DREAM11" in narration or "RUMMY" in narration or "BET365" in narration:
-            gambling_flags += 1
-
-        # 4. Closing Balance Accumulation
-        if "closingbalance" in txn:
-            try:
-                # Handle potential string/float issues
-                bal = float(txn["closingbalance"])
-                total_balance += bal
-                balance_count += 1
-            except:
-                pass
-
-    # Calculate Average Salary
-    estimated_salary = total_salary_credits / salary_count if salary_count > 0 else 0
-    
-    # Calculate Average Balance
-    avg_balance = total_balance / balance_count if balance_count > 0 else 0
-    
-    return {
-        "estimated_salary": estimated_salary,
-        "cheque_bounces": bounces,
-        "gambling_count": gambling_flags,
-        "average_balance": avg_balance,
-        "is_verified": True
-    }
\ No newline at end of file
+        amount_values = _numeric(amounts)
+        is_credit = _as_object_array(types) == "CREDIT"
+        is_salary = is_credit & (amount_values > SALARY_MIN_CREDIT) & matcher.has(tags, "salary")
+        self.salary_count += int(is_salary.sum())
+        self.total_salary_credits = _sequential_sum(amount_values[is_salary], self.total_salary_credits)
+
+        # 3. Closing Balance (values that float() can't parse are skipped)
+        if balances is not None:
+            balance_values = _balances(balances)
+            self.balance_count += len(balance_values)
+            self.total_balance = _sequential_sum(balance_values, self.total_balance)
+
+    def result(self):
+        # Calculate Average Salary
+        estimated_salary = self.total_salary_credits / self.salary_count if self.salary_count > 0 else 0
+
+        # Calculate Average Balance
+        avg_balance = self.total_balance / self.balance_count if self.balance_count > 0 else 0
+
+        return {
+            "estimated_salary": estimated_salary,
+            "cheque_bounces": self.category_counts["bounce"],
+            "gambling_count": self.category_counts["gambling"],
+            "average_balance": avg_balance,
+            "category_counts": dict(self.category_counts),
+            "is_verified": True
+        }
+
+# --- COLUMN HELPERS ---
+def _as_object_array(values):
+    if isinstance(values, pd.Series):
+        return values.to_numpy(dtype=object)
+    return np.asarray(values, dtype=object)
+
+def _numeric(values):
+    if isinstance(values, pd.Series) and pd.api.types.is_numeric_dtype(values.dtype) and not pd.api.types.is_bool_dtype(values.dtype):
+        return values.to_numpy()
+    array = np.asarray(values)
+    if array.dtype.kind in "iuf":
+        return array
+    # Mixed / text amounts: anything non-numeric can never pass the salary test
+    return pd.to_numeric(pd.Series(array, dtype=object), errors="coerce").to_numpy(dtype=np.float64)
+
+def _balances(values):
+    array = values.to_numpy() if isinstance(values, pd.Series) else np.asarray(values)
+    if array.dtype.kind in "biuf":
+        # Numbers already: float() of every value, in one C loop
+        return array.astype(np.float64)
+    if array.dtype == object:
+        # astype turns None into NaN where float(None) raises: drop those first
+        array = array[np.fromiter((value is not None for value in array), dtype=bool, count=len(array))]
+    try:
+        return array.astype(np.float64)
+    except (TypeError, ValueError):
+        # Some values float() can't parse: keep only the ones it accepts, like the old try/except
+        parsed = [_to_float(value) for value in array]
+        return np.array([value for value in parsed if value is not None], dtype=np.float64)
+
+def _to_float(value):
+    try:
+        return float(value)
+    except Exception:
+        return None
+
+def _sequential_sum(values, start=0):
+    if len(values) == 0:
+        return start
+    # np.cumsum adds strictly left to right, exactly like `total += x` in a loop
+    return np.cumsum(np.concatenate(([start], values)))[-1].item()
@@ -0,0 +1,283 @@
+# app/services/statement_formats.py
+# Registry of bank-statement CSV formats ("profiles"), matched on the header line.
+#
+# A profile names the header of every column the analyzer reads (date, narration,
+# amount + type or debit + credit, closing balance) and how they are parsed.
+# Headers are compared in a compact form, lower case letters/digits only
+# ("Withdrawal Amt." -> "withdrawalamt"). The headers of all profiles are
+# compiled once into an index {compact header: profiles using it}, so detecting
+# the format of an upload is one pass over its header line, however many
+# profiles are registered.
+#
+# The detected profile becomes a ReadPlan for pandas: the usecols subset (wide
+# exports carry many columns we never look at), explicit dtypes (no type
+# inference) and the date format. Headers no profile matches fall back to the
+# generic COLUMN_ALIASES mapping, as before.
+import json
+import re
+
+from ..core import config
+
+REQUIRED_COLUMNS = ["date", "amount", "type", "narration"]
+
+# Standard name -> header variations seen in bank exports (first match wins)
+COLUMN_ALIASES = {
+    "date": ["date", "txn_date", "transaction_date", "valuedt"],
+    "amount": ["amount", "txn_amount", "transaction_amount"],
+    "type": ["type", "txn_type", "dr_cr", "drcr"],
+    "narration": ["narration", "description", "particulars", "remarks"]
+}
+
+# Generic split amount columns, matched on the compact header
+DEBIT_COLUMNS = ["withdrawalamt", "withdrawalamount", "withdrawal", "withdrawals", "debitamt", "debitamount", "debit", "dr", "dramount"]
+CREDIT_COLUMNS = ["depositamt", "depositamount", "deposit", "deposits", "creditamt", "creditamount", "credit", "cr", "cramount"]
+# Outside the named bank profiles, only a column called exactly this (trimmed, any case)
+# feeds average_balance, as it always has: "Balance" / "Closing Balance" stay unread
+GENERIC_BALANCE_COLUMN = "closingbalance"
+
+# Column roles a profile can map; the analyzer reads all but the date
+ROLES = ["date", "narration", "amount", "type", "debit", "credit", "closingbalance"]
+NUMERIC_ROLES = ["amount", "debit", "credit", "closingbalance"]
+TEXT_ROLES = ["narration", "type"]
+
+# Built-in profiles. Same shape as a STATEMENT_FORMATS_FILE entry:
+#   columns      role -> header as exported (compared compactly)
+#   optional     roles used when present but not part of the fingerprint
+#   exact        optional roles whose header must match as written (trimmed, any
+#                case) rather than in compact form
+#   numeric      dtype of the amount/balance columns: "float64", or "str" when
+#                the export decorates numbers ("₹ 1,200.00 Dr") beyond what
+#                `thousands` covers
+#   thousands    thousands separator inside numbers, if any
+#   date_format  strptime format of the date column
+BUILTIN_FORMATS = {
+    "canonical": {
+        "columns": {"date": "date", "narration": "narration", "amount": "amount", "type": "type", "closingbalance": "closingbalance"},
+        "optional": ["closingbalance"],
+        "exact": ["closingbalance"],
+        "numeric": "float64",
+        "date_format": "%Y-%m-%d",
+    },
+    "hdfc": {
+        "columns": {"date": "Date", "narration": "Narration", "debit": "Withdrawal Amt.", "credit": "Deposit Amt.", "closingbalance": "Closing Balance"},
+        "numeric": "float64",
+        "date_format": "%d/%m/%y",
+    },
+    "icici": {
+        "columns": {"date": "Transaction Date", "narration": "Transaction Remarks", "debit": "Withdrawal Amount (INR )", "credit": "Deposit Amount (INR )", "closingbalance": "Balance (INR )"},
+        "numeric": "float64",
+        "thousands": ",",
+        "date_format": "%d/%m/%Y",
+    },
+    "sbi": {
+        "columns": {"date": "Txn Date", "narration": "Description", "debit": "Debit", "credit": "Credit", "closingbalance": "Balance"},
+        "numeric": "float64",
+        "thousands": ",",
+        "date_format": "%d %b %Y",
+    },
+    "axis": {
+        "columns": {"date": "Tran Date", "narration": "PARTICULARS", "debit": "DR", "credit": "CR", "closingbalance": "BAL"},
+        "numeric": "float64",
+        "thousands": ",",
+        "date_format": "%d-%m-%Y",
+    },
+}
+
+class StatementFormatError(ValueError):
+    """The CSV can't be analyzed (e.g. required columns are missing)."""
+
+def compact_header(name):
+    return re.sub(r"[^a-z0-9]", "", str(name).lower())
+
+class StatementFormat:
+    def __init__(self, name, columns: dict, optional=(), exact=(), numeric="float64", thousands=None, date_format=None):
+        unknown = [role for role in columns if role not in ROLES]
+        if unknown:
+            raise ValueError(f"Format {name!r}: unknown column roles {unknown}, expected some of {ROLES}")
+        has_amount = "amount" in columns
+        has_split = "debit" in columns and "credit" in columns
+        if "narration" not in columns or "date" not in columns or has_amount == has_split:
+            raise ValueError(f"Format {name!r} needs date, narration and either amount (+ type) or debit + credit columns")
+        if not set(exact) <= set(optional):
+            raise ValueError(f"Format {name!r}: exact columns must be optional, got {sorted(set(exact) - set(optional))}")
+        if numeric not in ("float64", "str"):
+            raise ValueError(f"Format {name!r}: numeric must be 'float64' or 'str', got {numeric!r}")
+
+        self.name = name
+        self.columns = {role: compact_header(header) for role, header in columns.items()}
+        self.optional = set(optional)
+        self.exact = {role: str(columns[role]).strip().lower() for role in exact}
+        self.numeric = numeric
+        self.thousands = thousands
+        self.date_format = date_format
+        # Headers that must all be present for this format to match
+        self.fingerprint = frozenset(header for role, header in self.columns.items() if role not in self.optional)
+
+        if has_amount:
+            self.layout = {"kind": "amount", "type": "type" in columns}
+        else:
+            self.layout = {"kind": "split", "debit": "debit", "credit": "credit"}
+
+    def plan(self, raw_columns, positions):
+        """ReadPlan for a header whose compact names are at `positions` ({compact: index})."""
+        roles = {role: positions[header] for role, header in self.columns.items() if header in positions and role not in self.exact}
+        for role, header in self.exact.items():
+            position = next((i for i, name in enumerate(raw_columns) if str(name).strip().lower() == header), None)
+            if position is not None:
+                roles[role] = position
+        dtypes = {role: self.numeric for role in NUMERIC_ROLES if role in roles}
+        dtypes.update({role: "str" for role in TEXT_ROLES if role in roles})
+        return ReadPlan(self.name, raw_columns, roles, self.layout, dtypes, self.thousands, self.date_format)
+
+class ReadPlan:
+    """What pandas needs to read the body of one statement: which columns, under which names, as which dtypes."""
+
+    def __init__(self, format_name, raw_columns, roles: dict, layout, dtypes: dict, thousands=None, date_format=None):
+        self.format_name = format_name
+        self.raw_columns = list(raw_columns)
+        self.roles = roles  # role -> column position in the file
+        self.layout = layout
+        self.dtypes = dtypes  # role -> dtype; roles left out are inferred by pandas
+        self.thousands = thousands
+        self.date_format = date_format
+
+    @property
+    def strict(self):
+        """True if a stray value (e.g. "abc" in an amount column) makes pandas raise instead of inferring object."""
+        return any(dtype != "str" for dtype in self.dtypes.values())
+
+    def relaxed(self):
+        """Same columns, numeric dtypes left to pandas inference (for exports that break the profile)."""
+        text_only = {role: dtype for role, dtype in self.dtypes.items() if dtype == "str"}
+        return ReadPlan(self.format_name, self.raw_columns, self.roles, self.layout, text_only, None, self.date_format)
+
+    def selected(self, parse_dates=False):
+        # pandas returns usecols in file order, whatever order they are given in
+        return sorted(
+            (position, role) for role, position in self.roles.items()
+            if role != "date" or parse_dates
+        )
+
+    def names(self, parse_dates=False):
+        """Column names of the frames read with read_options(parse_dates)."""
+        return [role for _, role in self.selected(parse_dates)]
+
+    def read_options(self, parse_dates=False):
+        """Keyword arguments for pd.read_csv. The date column is only read (and parsed) if asked for."""
+        selected = self.selected(parse_dates)
+        options = {
+            "usecols": [position for position, _ in selected],
+            "dtype": {self.raw_columns[position]: self.dtypes[role] for position, role in selected if role in self.dtypes},
+        }
+        if self.thousands:
+            options["thousands"] = self.thousands
+        if parse_dates:
+            options["parse_dates"] = [self.raw_columns[self.roles["date"]]]
+            if self.date_format:
+                options["date_format"] = self.date_format
+        return options
+
+class FormatRegistry:
+    def __init__(self, formats=()):
+        self.formats = []
+        self._index = {}  # compact header -> numbers of the formats whose fingerprint contains it
+        for statement_format in formats:
+            self.register(statement_format)
+
+    def register(self, statement_format: StatementFormat):
+        number = len(self.formats)
+        self.formats.append(statement_format)
+        for header in statement_format.fingerprint:
+            self._index.setdefault(header, []).append(number)
+
+    def detect(self, raw_columns):
+        """
+        Raw CSV header -> ReadPlan. The most specific matching profile wins (most
+        fingerprint headers, then registration order); otherwise generic aliasing.
+        Raises StatementFormatError if neither can find the required columns.
+        """
+        positions = {}
+        hits = [0] * len(self.formats)
+        for position, name in enumerate(raw_columns):
+            header = compact_header(name)
+            if header in positions:
+                continue
+            positions[header] = position
+            for number in self._index.get(header, ()):
+                hits[number] += 1
+
+        best = None
+        for number, statement_format in enumerate(self.formats):
+            if hits[number] == len(statement_format.fingerprint):
+                if best is None or len(statement_format.fingerprint) > len(best.fingerprint):
+                    best = statement_format
+        if best is not None:
+            return best.plan(raw_columns, positions)
+        return generic_plan(raw_columns)
+
+def normalized_header(raw_columns):
+    """
+    Raw CSV header -> (column names after cleanup + aliasing, amount layout).
+    The layout says how normalize_amounts builds the amount/type columns:
+      {"kind": "amount", "type": True/False}  amount column, with or without a type column
+      {"kind": "split", "debit": name, "credit": name}  separate debit/credit columns
+    """
+    # --- CLEAN UP HEADERS ---
+    columns = [str(c).strip().lower() for c in raw_columns]
+
+    # Compared compactly, so "Txn Date" / "TXN-DATE" match "txn_date" too
+    for standard, variations in COLUMN_ALIASES.items():
+        compact = [compact_header(c) for c in columns]
+        for var in variations:
+            if compact_header(var) in compact:
+                columns = [standard if key == compact_header(var) else c for c, key in zip(columns, compact)]
+                break
+
+    columns = ["ref_no" if c == "chq/ref.no." else c for c in columns]
+
+    # --- AMOUNT LAYOUT ---
+    layout = None
+    if "amount" in columns:
+        layout = {"kind": "amount", "type": "type" in columns}
+    else:
+        compact = {compact_header(c): c for c in reversed(columns)}
+        debit = next((compact[name] for name in DEBIT_COLUMNS if name in compact), None)
+        credit = next((compact[name] for name in CREDIT_COLUMNS if name in compact), None)
+        if debit is not None and credit is not None:
+            layout = {"kind": "split", "debit": debit, "credit": credit}
+
+    present = set(columns) | ({"amount", "type"} if layout else set())
+    missing = [c for c in REQUIRED_COLUMNS if c not in present]
+    if missing:
+        found = columns + [c for c in ("amount", "type") if layout and c not in columns]
+        raise StatementFormatError(f"CSV missing columns: {missing}. Found: {found}")
+    return columns, layout
+
+def generic_plan(raw_columns):
+    """ReadPlan from COLUMN_ALIASES / split-column names, for headers no profile knows."""
+    columns, layout = normalized_header(raw_columns)
+
+    roles = {}
+    for role in ("date", "narration", "amount", "type"):
+        if role in columns:
+            roles[role] = columns.index(role)
+    if layout["kind"] == "split":
+        roles["debit"] = columns.index(layout["debit"])
+        roles["credit"] = columns.index(layout["credit"])
+        layout = {"kind": "split", "debit": "debit", "credit": "credit"}
+    if GENERIC_BALANCE_COLUMN in columns:
+        roles["closingbalance"] = columns.index(GENERIC_BALANCE_COLUMN)
+
+    # Numbers are left to pandas inference: nothing is known about how this export writes them
+    dtypes = {role: "str" for role in TEXT_ROLES if role in roles}
+    return ReadPlan("generic", raw_columns, roles, layout, dtypes)
+
+def load_formats(path=None):
+    """Built-in formats plus a JSON file of {name: profile}; a file entry replaces the built-in of the same name."""
+    definitions = dict(BUILTIN_FORMATS)
+    if path:
+        with open(path) as f:
+            definitions.update(json.load(f))
+    return [StatementFormat(name, **definition) for name, definition in definitions.items()]
+
+registry = FormatRegistry(load_formats(config.STATEMENT_FORMATS_FILE))
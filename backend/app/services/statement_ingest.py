@@ -0,0 +1,184 @@
+# app/services/statement_ingest.py
+# Streams an uploaded bank-statement CSV through the analyzer chunk by chunk.
+#
+# The upload is never read into memory as a whole: pandas parses the spooled
+# upload file CHUNK_ROWS at a time, each chunk is normalized and fed to a
+# StatementAccumulator. Peak memory is one chunk, whatever the file size.
+# The header line picks a format profile (statement_formats.py) that decides,
+# before the body is parsed, which columns are read and with which dtypes.
+#
+# Amount layouts (all normalized with whole-column operations):
+#   - amount + type columns ("CREDIT"/"DEBIT", or "Cr"/"Dr"/"C"/"D"),
+#   - split debit/credit columns (HDFC "Withdrawal Amt."/"Deposit Amt.", "Dr"/"Cr", ...),
+#   - one signed amount column (negative = debit) or "1,234.00 Dr" style suffixes,
+#   - Indian / currency formatting: "1,23,456.78", "₹ 5,000", "(1,200.00)".
+import os
+import shutil
+import tempfile
+import uuid
+
+import numpy as np
+import pandas as pd
+
+from ..core import config
+from .statement_analyzer import StatementAccumulator
+from .statement_formats import StatementFormatError, registry
+
+TYPE_VALUES = {
+    "CREDIT": "CREDIT", "CR": "CREDIT", "C": "CREDIT", "DEPOSIT": "CREDIT",
+    "DEBIT": "DEBIT", "DR": "DEBIT", "D": "DEBIT", "WITHDRAWAL": "DEBIT",
+}
+
+# Removed (in this order) from amounts plain to_numeric can't read: currency,
+# Dr/Cr suffixes, thousands separators, parentheses/signs. Anything else left
+# over (e.g. "12X34") still fails to parse and becomes NaN.
+AMOUNT_DECORATIONS = ["RS.", "RS", "INR", "₹", "CR.", "DR.", "CR", "DR", ",", "(", ")", "+", "-", " ", "\t"]
+PROBE_ROWS = 100
+
+def normalize_amounts(df: pd.DataFrame, layout):
+    """Fills numeric `amount` and CREDIT/DEBIT `type` columns according to the layout."""
+    if layout["kind"] == "split":
+        # A deposit wins, then a withdrawal, else the row is UNKNOWN with amount 0
+        withdrawal, _ = parse_amounts(df[layout["debit"]])
+        deposit, _ = parse_amounts(df[layout["credit"]])
+        is_credit = deposit > 0
+        is_debit = ~is_credit & (withdrawal > 0)
+        df["amount"] = np.where(is_credit, deposit, np.where(is_debit, withdrawal, 0.0))
+        df["type"] = np.select([is_credit, is_debit], ["CREDIT", "DEBIT"], "UNKNOWN")
+        return df
+
+    amounts, suffix_types = parse_amounts(df["amount"])
+    if layout["type"]:
+        df["type"] = normalize_types(df["type"])
+        if df["amount"].dtype.kind not in "iuf":
+            df["amount"] = amounts
+    else:
+        # No type column: "Dr"/"Cr" suffix if there is one, otherwise the sign
+        from_sign = np.select([amounts > 0, amounts < 0], ["CREDIT", "DEBIT"], "UNKNOWN")
+        df["type"] = np.where(pd.notna(suffix_types), suffix_types, from_sign)
+        df["amount"] = np.abs(amounts)
+    return df
+
+def normalize_types(types: pd.Series):
+    """"Cr"/"DR"/"c"/... -> "CREDIT"/"DEBIT"; anything unrecognized is kept as is."""
+    if types.dtype.kind != "O":
+        return types
+    canonical = types.str.strip().str.upper().map(TYPE_VALUES)
+    return canonical.where(canonical.notna(), types)
+
+def parse_amounts(values: pd.Series):
+    """
+    Column -> (float64 amounts, object array of "CREDIT"/"DEBIT"/None from a Dr/Cr suffix).
+    Unparseable cells become NaN, like pd.to_numeric(errors="coerce").
+    """
+    suffix_types = np.full(len(values), None, dtype=object)
+    if values.dtype.kind in "iufb":
+        return values.to_numpy(dtype=np.float64), suffix_types
+
+    amounts = np.full(len(values), np.nan)
+    pending = np.flatnonzero(values.notna().to_numpy())
+    if not len(pending):
+        return amounts, suffix_types
+
+    # 1. Plain numbers straight through the C parser. Failed parses are slow,
+    #    so a sample decides whether the column is plain enough to try
+    if pd.to_numeric(values.iloc[pending[:PROBE_ROWS]], errors="coerce").notna().all():
+        amounts[pending] = pd.to_numeric(values.iloc[pending], errors="coerce")
+        pending = pending[np.isnan(amounts[pending])]
+        if not len(pending):
+            return amounts, suffix_types
+
+    # 2. Formatted amounts: strip the decorations, remember sign and Dr/Cr suffix
+    number, negative, suffix = _strip_decorations(values.iloc[pending].astype(str))
+    amounts[pending] = np.where(negative, -number, number)
+    suffix_types[pending] = suffix
+    return amounts, suffix_types
+
+def _strip_decorations(text: pd.Series):
+    # One upper() over all rows joined together, split back afterwards (C speed, no per-row calls)
+    joined = "\n".join(text)
+    if joined.count("\n") != len(text) - 1:
+        joined = "\n".join(text.str.replace("\n", " ", regex=False))
+    joined = joined.upper()
+
+    # Per-row sign and suffix checks with NumPy's vectorized string functions
+    rows = np.array(joined.split("\n"), dtype=np.dtypes.StringDType())
+    negative = (np.strings.find(rows, "-") >= 0) | (np.strings.find(rows, "(") >= 0)
+    ending = np.strings.rstrip(rows, ". ")
+    suffix = np.select([np.strings.endswith(ending, "CR"), np.strings.endswith(ending, "DR")], ["CREDIT", "DEBIT"], None)
+
+    for decoration in AMOUNT_DECORATIONS:
+        joined = joined.replace(decoration, "")
+    digits = np.strings.rstrip(np.array(joined.split("\n"), dtype=np.dtypes.StringDType()), ".")
+    try:
+        number = digits.astype(np.float64)
+    except ValueError:
+        # Some value isn't a number even without decorations: NaN for those, like errors="coerce"
+        number = pd.to_numeric(pd.Series(digits, dtype=object), errors="coerce").to_numpy(dtype=np.float64)
+    return number, negative, suffix
+
+def analyze_csv(source, chunk_rows=None):
+    """
+    Analyzes a statement CSV from a path or a seekable binary file object.
+    Raises StatementFormatError before parsing any rows if required columns are missing.
+    """
+    chunk_rows = chunk_rows or config.STATEMENT_CHUNK_ROWS
+
+    # 1. Header only: pick the format profile once, fail fast if it can't work
+    plan = registry.detect(list(pd.read_csv(source, nrows=0).columns))
+    rewind(source)
+
+    # 2. Body, with the profile's columns and dtypes
+    try:
+        return _analyze_body(source, plan, chunk_rows)
+    except StatementFormatError:
+        raise
+    except ValueError as e:
+        # A value the profile's dtypes can't hold (e.g. text in an amount column):
+        # read it again letting pandas infer the numeric columns
+        if not plan.strict or not rewind(source):
+            raise
+        print(f"⚠️ Statement doesn't fit the {plan.format_name!r} format dtypes ({e}), re-reading with inference")
+        return _analyze_body(source, plan.relaxed(), chunk_rows)
+
+def read_chunks(source, plan, chunk_rows=None, parse_dates=False):
+    """Normalized chunks (narration/amount/type/closingbalance[/date]) of a statement read with `plan`."""
+    names = plan.names(parse_dates)
+    with pd.read_csv(source, chunksize=chunk_rows or config.STATEMENT_CHUNK_ROWS, **plan.read_options(parse_dates)) as reader:
+        for chunk in reader:
+            chunk.columns = names
+            yield normalize_amounts(chunk, plan.layout)
+
+def rewind(source):
+    """Back to the start of a file object; paths are simply reopened. False if neither works."""
+    if isinstance(source, (str, os.PathLike)):
+        return True
+    if hasattr(source, "seek"):
+        source.seek(0)
+        return True
+    return False
+
+def _analyze_body(source, plan, chunk_rows):
+    accumulator = StatementAccumulator()
+    for chunk in read_chunks(source, plan, chunk_rows):
+        accumulator.add_frame(chunk)
+    return accumulator.result()
+
+# --- UPLOADS ---
+def save_upload(upload, name=None):
+    """
+    Copies an upload's (spooled) file object to STATEMENT_UPLOAD_DIR so a worker
+    process can read it; returns the path. Remove it with discard_upload.
+    """
+    directory = config.STATEMENT_UPLOAD_DIR or os.path.join(tempfile.gettempdir(), "credit-risk-engine-uploads")
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.join(directory, f"{name or uuid.uuid4().hex}.csv")
+    with open(path, "wb") as f:
+        shutil.copyfileobj(upload, f)
+    return path
+
+def discard_upload(path):
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
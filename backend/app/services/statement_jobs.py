@@ -0,0 +1,199 @@
+# app/services/statement_jobs.py
+# Background analysis of uploaded statements, off the event loop and out of the API process.
+#
+# submit() saves the upload under STATEMENT_UPLOAD_DIR, checks its header,
+# records a statement_jobs row (QUEUED) and returns at once. A dispatcher thread
+# hands queued jobs to the statement process pool (core/executors.py), at most
+# STATEMENT_JOB_WORKERS at a time (RUNNING). The analysis is saved in
+# risk_analysis_history and the job becomes DONE, or FAILED with the error.
+# Clients poll GET /statement-jobs/{id}.
+import queue
+import threading
+import time
+import uuid
+from datetime import datetime, timezone
+
+import pandas as pd
+
+from .. import database, models
+from ..core import config, executors, metrics
+from . import statement_ingest
+from .statement_formats import registry
+
+_STOP = object()
+
+JOB_SECONDS_BUCKETS = [0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600]
+
+class QueueFull(Exception):
+    """Too many jobs are already waiting; the client should retry later."""
+
+class StatementJobQueue:
+    def __init__(self, workers=2, max_queued=100):
+        self.workers = max(1, int(workers))
+        self.max_queued = max(1, int(max_queued))
+
+        self._queue = queue.Queue()
+        self._slots = threading.BoundedSemaphore(self.workers)
+        self._stopping = threading.Event()
+        self._thread = None
+        self._start_lock = threading.Lock()
+
+        self.queued = metrics.gauge("statement_jobs_queued", "Jobs waiting for a worker process")
+        self.running = metrics.gauge("statement_jobs_running", "Jobs being analyzed right now")
+        self.submitted = metrics.counter("statement_jobs_submitted_total", "Jobs accepted")
+        self.rejected = metrics.counter("statement_jobs_rejected_total", "Submissions refused because the queue was full")
+        self.completed = metrics.counter("statement_jobs_completed_total", "Jobs that finished with a result")
+        self.failed = metrics.counter("statement_jobs_failed_total", "Jobs that finished with an error")
+        self.wait_seconds = metrics.histogram("statement_job_wait_seconds", JOB_SECONDS_BUCKETS, "Time from submission to start")
+        self.run_seconds = metrics.histogram("statement_job_run_seconds", JOB_SECONDS_BUCKETS, "Analysis time per job")
+
+    # --- PUBLIC API ---
+    def submit(self, upload, filename, user_id=None):
+        """
+        Queues a binary file object for analysis and returns its StatementJob row.
+        Raises QueueFull, or StatementFormatError if the header can't be analyzed.
+        """
+        if self._queue.qsize() >= self.max_queued:
+            self.rejected.inc()
+            raise QueueFull(f"{self.max_queued} statement jobs are already waiting")
+        self._ensure_started()
+
+        # 1. The upload only lives as long as the request: keep our own copy
+        job_id = uuid.uuid4().hex
+        path = statement_ingest.save_upload(upload, job_id)
+
+        # 2. Reject unusable files now rather than as a FAILED job later
+        try:
+            registry.detect(list(pd.read_csv(path, nrows=0).columns))
+        except Exception:
+            statement_ingest.discard_upload(path)
+            raise
+
+        # 3. Record it, then queue it
+        with database.SessionLocal() as db:
+            job = models.StatementJob(id=job_id, user_id=user_id, filename=filename, status="QUEUED")
+            db.add(job)
+            db.commit()
+            db.refresh(job)
+        self.submitted.inc()
+        self.queued.inc()
+        self._queue.put((job_id, path, time.perf_counter()))
+        return job
+
+    def stop(self, timeout=30.0):
+        """Jobs already running finish and are recorded; jobs still queued are marked FAILED."""
+        with self._start_lock:
+            thread, self._thread = self._thread, None
+        if thread is None:
+            return
+        self._stopping.set()
+        self._queue.put(_STOP)
+        thread.join(timeout=timeout)
+        # Every slot back = every running job recorded
+        deadline = time.monotonic() + timeout
+        for _ in range(self.workers):
+            self._slots.acquire(timeout=max(0.0, deadline - time.monotonic()))
+        for _ in range(self.workers):
+            self._slots.release()
+
+    # --- DISPATCHER ---
+    def _ensure_started(self):
+        if self._thread is not None:
+            return
+        with self._start_lock:
+            if self._thread is None:
+                self._stopping.clear()
+                self._thread = threading.Thread(target=self._run, name="statement-jobs", daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            if item is _STOP:
+                break
+            # Wait for a free worker process (the concurrency limit)
+            self._slots.acquire()
+            job_id, path, submitted_at = item
+            self.queued.dec()
+            if self._stopping.is_set():
+                self._slots.release()
+                self._record(job_id, path, error="Server shut down before the job started")
+                continue
+
+            self.wait_seconds.observe(time.perf_counter() - submitted_at)
+            self.running.inc()
+            self._mark_running(job_id)
+            started = time.perf_counter()
+            try:
+                future = executors.statement.submit(statement_ingest.analyze_csv, path)
+            except Exception as e:
+                self._finished(None, job_id, path, started, error=e)
+                continue
+            future.add_done_callback(lambda f, job_id=job_id, path=path, started=started: self._finished(f, job_id, path, started))
+
+        # Shutting down: whatever is still queued won't run
+        while True:
+            try:
+                item = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is not _STOP:
+                self.queued.dec()
+                self._record(item[0], item[1], error="Server shut down before the job started")
+
+    def _finished(self, future, job_id, path, started, error=None):
+        self.run_seconds.observe(time.perf_counter() - started)
+        try:
+            if future is not None:
+                error = future.exception()
+            if error is None:
+                self._record(job_id, path, result=future.result())
+            else:
+                self._record(job_id, path, error=error)
+        finally:
+            self.running.dec()
+            self._slots.release()
+
+    # --- BOOKKEEPING ---
+    def _mark_running(self, job_id):
+        try:
+            with database.SessionLocal() as db:
+                job = db.get(models.StatementJob, job_id)
+                job.status = "RUNNING"
+                job.started_at = _now()
+                db.commit()
+        except Exception as e:
+            print(f"⚠️ Could not mark statement job {job_id} as running: {e}")
+
+    def _record(self, job_id, path, result=None, error=None):
+        try:
+            with database.SessionLocal() as db:
+                job = db.get(models.StatementJob, job_id)
+                if error is None:
+                    history = models.RiskAnalysisHistory(user_id=job.user_id, filename=job.filename, result=result)
+                    db.add(history)
+                    db.flush()
+                    job.history_id = history.id
+                    job.status = "DONE"
+                else:
+                    job.status = "FAILED"
+                    job.error = str(error)
+                job.finished_at = _now()
+                db.commit()
+            if error is None:
+                self.completed.inc()
+            else:
+                self.failed.inc()
+                print(f"❌ Statement job {job_id} failed: {error}")
+        except Exception as e:
+            print(f"❌ Could not record statement job {job_id}: {e}")
+        finally:
+            statement_ingest.discard_upload(path)
+
+def _now():
+    return datetime.now(timezone.utc)
+
+jobs = StatementJobQueue(
+    workers=config.STATEMENT_JOB_WORKERS,
+    max_queued=config.STATEMENT_JOB_MAX_QUEUED,
+)
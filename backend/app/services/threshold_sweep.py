@@ -0,0 +1,161 @@
+# app/services/threshold_sweep.py
+# What-if analysis of the decision thresholds over stored applications: for
+# every (credit-score cutoff, income multiple, risk threshold) combination of a
+# grid, the approval rate, the expected default rate of the approved
+# applications and, per policy combination, the risk score distribution of the
+# applications the policy lets through.
+#
+# No combination is replayed. Per row, three searchsorted calls give the
+# position of its credit score, loan-to-income ratio and risk score among the
+# grid values, and one bincount over those positions turns a chunk into a small
+# (cutoffs+1, multiples+1, thresholds+1) histogram. Cumulative sums of the
+# summed histograms give every combination's counts at the end. Cost is
+# O(rows + grid cells), whatever the size of the grid.
+#
+# The swept policy rules are the built-ins (min_credit_score: credit_score < cutoff,
+# max_loan_to_income: loan_amount > income * multiple); any other active rule
+# (POLICY_RULES_FILE) still applies, unchanged. Rows the policy rejected were
+# never scored by the model (risk_score 100, no model_version), so they get a
+# score from the current model: a looser policy would let some of them through.
+import time
+
+import numpy as np
+from sqlalchemy import select
+
+from .. import database, ml_service, models
+from ..core import config
+from .policy_rules import RuleSet, policy
+
+SWEPT_RULES = {"min_credit_score", "max_loan_to_income"}
+SCORING_COLUMNS = ["income", "loan_amount", "age", "years_employed", "gender"]
+
+class ThresholdSweep:
+    def __init__(self, credit_score_cutoffs, income_multiples, risk_thresholds, score_bins=20, rescore=True):
+        # Sorted, distinct grid values: searchsorted needs them ascending
+        self.credit_score_cutoffs = np.unique(np.asarray(credit_score_cutoffs, dtype=np.float64))
+        self.income_multiples = np.unique(np.asarray(income_multiples, dtype=np.float64))
+        self.risk_thresholds = np.unique(np.asarray(risk_thresholds, dtype=np.float64))
+        self.score_bins = int(score_bins)
+        self.rescore = rescore
+
+        other_rules = [rule for rule in policy.rules if rule.name not in SWEPT_RULES]
+        derived = {name: expression.source for name, expression in policy.derived.items()}
+        self.fixed_policy = RuleSet(other_rules, derived=derived) if other_rules else None
+
+        shape = (len(self.credit_score_cutoffs) + 1, len(self.income_multiples) + 1)
+        self.counts = np.zeros(shape + (len(self.risk_thresholds) + 1,), dtype=np.int64)
+        self.default_sums = np.zeros(self.counts.shape, dtype=np.float64)
+        self.score_counts = np.zeros(shape + (self.score_bins,), dtype=np.int64)
+        self.rows = 0
+        self.rescored = 0
+
+    # --- ACCUMULATION ---
+    def add_columns(self, columns, risk_scores, scored):
+        """
+        One chunk: {column: array} of the application columns, the stored risk scores,
+        and whether the model produced each of them (False = policy rejection, rescored here).
+        """
+        risk_scores = np.asarray(risk_scores, dtype=np.float64)
+        n = len(risk_scores)
+        self.rows += n
+
+        # 1. Rows any other (fixed) rule rejects are rejected everywhere on the grid
+        keep = np.ones(n, dtype=bool)
+        if self.fixed_policy is not None:
+            keep = self.fixed_policy.first_failures({name: np.asarray(columns[name]) for name in self.fixed_policy.columns}, n) < 0
+        columns = {name: np.asarray(values)[keep] for name, values in columns.items()}
+        risk_scores, scored = risk_scores[keep], np.asarray(scored, dtype=bool)[keep]
+
+        # 2. Model scores for the rows the policy never let through
+        unscored = np.flatnonzero(~scored)
+        if self.rescore and len(unscored):
+            scores, _, _ = ml_service.predict_loan_risk_columns({name: columns[name][unscored] for name in SCORING_COLUMNS})
+            risk_scores = risk_scores.copy()
+            risk_scores[unscored] = scores
+            self.rescored += len(unscored)
+
+        # 3. Each row's position on every axis of the grid
+        credit = self._credit_positions(columns["credit_score"])
+        ratio = self._ratio_positions(columns["income"], columns["loan_amount"])
+        risk = np.searchsorted(self.risk_thresholds, risk_scores, side="left")  # passes thresholds[risk:]
+        cells = (credit * self.counts.shape[1] + ratio) * self.counts.shape[2] + risk
+        self.counts += np.bincount(cells, minlength=self.counts.size).reshape(self.counts.shape)
+        self.default_sums += np.bincount(cells, weights=risk_scores / 100, minlength=self.counts.size).reshape(self.counts.shape)
+
+        bins = np.clip((risk_scores * self.score_bins / 100).astype(np.int64), 0, self.score_bins - 1)
+        cells = (credit * self.score_counts.shape[1] + ratio) * self.score_bins + bins
+        self.score_counts += np.bincount(cells, minlength=self.score_counts.size).reshape(self.score_counts.shape)
+
+    def _credit_positions(self, credit_scores):
+        # min_credit_score rejects credit_score < cutoff: a row passes cutoffs[:position]
+        credit_scores = np.asarray(credit_scores, dtype=np.float64)
+        positions = np.searchsorted(self.credit_score_cutoffs, credit_scores, side="right")
+        positions[np.isnan(credit_scores)] = len(self.credit_score_cutoffs)  # NaN never triggers a rule
+        return positions
+
+    def _ratio_positions(self, incomes, loan_amounts):
+        # max_loan_to_income rejects loan_amount > income * multiple: a row passes multiples[position:]
+        incomes = np.asarray(incomes, dtype=np.float64)
+        loan_amounts = np.asarray(loan_amounts, dtype=np.float64)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            ratios = np.where(incomes > 0, loan_amounts / incomes, np.where(loan_amounts > 0, np.inf, -np.inf))
+        ratios[np.isnan(incomes) | np.isnan(loan_amounts)] = -np.inf
+        return np.searchsorted(self.income_multiples, ratios, side="left")
+
+    # --- RESULT ---
+    def result(self):
+        """Matrices indexed [credit cutoff][income multiple][risk threshold] (score distribution: [cutoff][multiple][bin])."""
+        def combine(histogram):
+            # Passing cutoff c = positions > c; multiple m = positions <= m; threshold t = positions <= t
+            passing = np.flip(np.cumsum(np.flip(histogram, 0), 0), 0)[1:]
+            passing = np.cumsum(passing, 1)[:, :-1]
+            return passing
+
+        approved = np.cumsum(combine(self.counts), 2)[:, :, :-1]
+        default_sums = np.cumsum(combine(self.default_sums), 2)[:, :, :-1]
+        with np.errstate(divide="ignore", invalid="ignore"):
+            approval_rate = approved / self.rows if self.rows else np.full(approved.shape, np.nan)
+            expected_default = np.where(approved > 0, default_sums / approved, np.nan)
+        return {
+            "rows": self.rows,
+            "rescored_rows": self.rescored,
+            "credit_score_cutoffs": self.credit_score_cutoffs.tolist(),
+            "income_multiples": self.income_multiples.tolist(),
+            "risk_thresholds": self.risk_thresholds.tolist(),
+            "approved": approved.tolist(),
+            "approval_rate": _nullable(approval_rate),
+            "expected_default_rate": _nullable(expected_default),
+            "score_bin_edges": np.linspace(0, 100, self.score_bins + 1).tolist(),
+            "score_distribution": combine(self.score_counts).tolist(),
+        }
+
+def _nullable(matrix):
+    # NaN (nothing approved) -> None, so the result is valid JSON
+    return np.where(np.isnan(matrix), None, np.round(matrix, 6)).tolist()
+
+# --- STORED APPLICATIONS ---
+def sweep_stored_applications(sweep, created_after=None, created_before=None, chunk_rows=None):
+    """Streams loan_applications through `sweep`, chunk_rows at a time (sync engine: run it off the event loop)."""
+    started = time.perf_counter()
+    application = models.LoanApplication
+    names = list(dict.fromkeys(["credit_score"] + SCORING_COLUMNS + (sweep.fixed_policy.columns if sweep.fixed_policy else [])))
+    stmt = select(*[getattr(application, name) for name in names], application.risk_score, application.model_version)
+    if created_after is not None:
+        stmt = stmt.where(application.created_at >= created_after)
+    if created_before is not None:
+        stmt = stmt.where(application.created_at < created_before)
+
+    chunk_rows = chunk_rows or config.SWEEP_CHUNK_ROWS
+    with database.engine.connect() as conn:
+        result = conn.execution_options(yield_per=chunk_rows).execute(stmt)
+        for partition in result.partitions():
+            values = list(zip(*partition))
+            columns = {name: np.array(values[i]) for i, name in enumerate(names)}
+            risk_scores = np.array(values[-2], dtype=np.float64)
+            # The model never saw a policy rejection: no version recorded, score pinned at 100
+            scored = np.array([version is not None for version in values[-1]]) | (risk_scores < 100)
+            sweep.add_columns(columns, risk_scores, scored)
+
+    report = sweep.result()
+    report["seconds"] = round(time.perf_counter() - started, 3)
+    return report
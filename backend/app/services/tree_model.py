@@ -0,0 +1,442 @@
+# app/services/tree_model.py
+# Compiles a trained CatBoost model into flat NumPy arrays and scores it without CatBoost.
+#
+# CatBoost models are "oblivious" trees: every level of a tree asks the same
+# question, so a row's leaf is just the bit-pattern of its split answers.
+#   leaf = bit0 | bit1 << 1 | ... | bit5 << 5
+#
+# Every split depends on exactly one "input":
+#   - a float feature (`x > border`), or
+#   - a categorical projection: the category code(s) plus, for CTR
+#     combinations, a few `x > border` bits of float features.
+# For each input we precompute a table of shape (input values, n_trees) whose
+# cell holds the leaf-index bits that value switches on in every tree.
+# Float features are first binned against their sorted borders, categorical
+# projections are turned into a small integer key ("categorical hash map").
+# Scoring is then one row-gather per input, OR-ed together, plus a leaf lookup.
+#
+# Usage (from backend/):  python -m app.services.tree_model
+import hashlib
+import itertools
+import json
+import os
+import tempfile
+
+import numpy as np
+
+FORMAT_VERSION = 1
+CHUNK_ROWS = 2048  # keeps the (rows, trees) working set in cache
+DEFAULT_TOLERANCE = 1e-6
+UNSEEN_CATEGORY = "__unseen_category__"
+
+ARRAY_FIELDS = [
+    "float_borders", "float_border_offsets", "float_leaf_bits", "float_row_offsets",
+    "proj_cat_features", "proj_float_features", "proj_float_borders", "proj_leaf_bits", "proj_row_offsets",
+    "leaf_values", "leaf_weights", "tree_depths", "level_groups",
+]
+
+class CompiledTreeModel:
+    """
+    Pure-NumPy evaluator for a compiled oblivious-tree model.
+
+    Inputs are rows in the model's feature order (strings for categorical
+    features, numbers for the rest), or the already-encoded
+    (float matrix, category code matrix) pair from `encode`.
+    """
+
+    def __init__(self, arrays: dict, meta: dict):
+        self.meta = meta
+        self.feature_names = meta["feature_names"]
+        self.cat_feature_indices = meta["cat_feature_indices"]
+        self.float_feature_indices = meta["float_feature_indices"]
+        self.cat_values = meta["cat_values"]
+        self.split_groups = [tuple(group) for group in meta["split_groups"]]
+        self.source_sha256 = meta.get("source_sha256")
+        self.depth = int(meta["depth"])
+        self.n_trees = int(meta["n_trees"])
+        self.bias = float(meta["bias"])
+        self.scale = float(meta["scale"])
+
+        for name in ARRAY_FIELDS:
+            setattr(self, name, arrays[name])
+
+        # category string -> code, one dict per categorical feature (unseen = len(values))
+        self._cat_codes = [{value: code for code, value in enumerate(values)} for values in self.cat_values]
+        self._cat_radix = np.array([len(values) + 1 for values in self.cat_values], dtype=np.int64)
+        self._leaf_flat = self.leaf_values.reshape(-1)
+        self._leaf_offsets = np.arange(self.n_trees, dtype=np.int64) * (1 << self.depth)
+
+    # --- INPUT ENCODING ---
+    def encode(self, rows):
+        """Rows in model feature order -> (float32 matrix, int64 category codes)."""
+        floats = np.array([[row[i] for i in self.float_feature_indices] for row in rows], dtype=np.float32).reshape(len(rows), -1)
+        codes = np.array(
+            [[self._cat_codes[k].get(row[i], len(self.cat_values[k])) for k, i in enumerate(self.cat_feature_indices)] for row in rows],
+            dtype=np.int64,
+        ).reshape(len(rows), -1)
+        return floats, codes
+
+    def encode_columns(self, float_columns, cat_columns):
+        """Columnar input: numeric arrays and string arrays, each in model order."""
+        floats = np.column_stack([np.asarray(col, dtype=np.float32) for col in float_columns])
+        codes = np.column_stack([self.category_codes(k, col) for k, col in enumerate(cat_columns)])
+        return floats, codes
+
+    def category_codes(self, k, values):
+        # Map the (few) distinct strings once instead of every row
+        uniques, inverse = np.unique(np.asarray(values, dtype=object).astype(str), return_inverse=True)
+        lookup = np.array([self._cat_codes[k].get(v, len(self.cat_values[k])) for v in uniques], dtype=np.int64)
+        return lookup[inverse.reshape(-1)]
+
+    # --- EVALUATION ---
+    def leaf_indexes(self, floats, codes):
+        """(n_rows, n_trees) uint8 leaf index of every row in every tree."""
+        n = floats.shape[0]
+        leaves = np.zeros((n, self.n_trees), dtype=np.uint8)
+
+        # 1. Float features: bin once, then OR in the bits each bin switches on
+        for f in range(len(self.float_feature_indices)):
+            borders = self.float_borders[self.float_border_offsets[f]:self.float_border_offsets[f + 1]]
+            x = floats[:, f]
+            bins = np.searchsorted(borders, x, side="left")  # number of borders strictly below x
+            bins[np.isnan(x)] = 0  # NaN never passes `x > border`
+            leaves |= self.float_leaf_bits[self.float_row_offsets[f] + bins]
+
+        # 2. Categorical projections: integer key -> bits
+        for p in range(len(self.proj_row_offsets) - 1):
+            leaves |= self.proj_leaf_bits[self.proj_row_offsets[p] + self._projection_key(p, floats, codes)]
+
+        return leaves
+
+    def predict_raw(self, floats, codes):
+        raw = np.empty(floats.shape[0], dtype=np.float64)
+        for start in range(0, floats.shape[0], CHUNK_ROWS):
+            stop = start + CHUNK_ROWS
+            leaves = self.leaf_indexes(floats[start:stop], codes[start:stop])
+            raw[start:stop] = self._leaf_flat[leaves + self._leaf_offsets].sum(axis=1)
+        return raw * self.scale + self.bias
+
+    def predict_proba(self, rows):
+        """Same shape as CatBoost's predict_proba: (n_rows, 2)."""
+        floats, codes = self.encode(rows)
+        return self.predict_proba_encoded(floats, codes)
+
+    def predict_proba_encoded(self, floats, codes):
+        positive = 1.0 / (1.0 + np.exp(-self.predict_raw(floats, codes)))
+        return np.column_stack([1.0 - positive, positive])
+
+    def _projection_key(self, p, floats, codes):
+        key = np.zeros(floats.shape[0], dtype=np.int64)
+        for k in self.proj_cat_features[p]:
+            if k < 0:
+                break
+            key = key * self._cat_radix[k] + codes[:, k]
+        for f, border in zip(self.proj_float_features[p], self.proj_float_borders[p]):
+            if f < 0:
+                break
+            key = key * 2 + (floats[:, f] > border)
+        return key
+
+    # --- PERSISTENCE ---
+    def save(self, path):
+        arrays = {name: getattr(self, name) for name in ARRAY_FIELDS}
+        np.savez_compressed(path, meta=np.array(json.dumps(self.meta)), **arrays)
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path, allow_pickle=False) as data:
+            meta = json.loads(str(data["meta"]))
+            if meta.get("format_version") != FORMAT_VERSION:
+                raise ValueError(f"Unsupported compiled model format: {meta.get('format_version')}")
+            arrays = {name: data[name] for name in ARRAY_FIELDS}
+        return cls(arrays, meta)
+
+    def save_dir(self, path):
+        """One .npy per array, so other processes can np.load(..., mmap_mode="r") and share pages."""
+        os.makedirs(path, exist_ok=True)
+        for name in ARRAY_FIELDS:
+            np.save(os.path.join(path, f"{name}.npy"), np.ascontiguousarray(getattr(self, name)))
+        with open(os.path.join(path, "meta.json"), "w") as f:
+            json.dump(self.meta, f)
+
+    @classmethod
+    def load_dir(cls, path, mmap=True):
+        with open(os.path.join(path, "meta.json")) as f:
+            meta = json.load(f)
+        if meta.get("format_version") != FORMAT_VERSION:
+            raise ValueError(f"Unsupported compiled model format: {meta.get('format_version')}")
+        mode = "r" if mmap else None
+        arrays = {name: np.load(os.path.join(path, f"{name}.npy"), mmap_mode=mode) for name in ARRAY_FIELDS}
+        return cls(arrays, meta)
+
+def file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+# --- COMPILER (needs CatBoost) ---
+def compile_catboost_model(cb_model, cat_values: dict, source_sha256=None, tolerance=DEFAULT_TOLERANCE, n_check_rows=2000):
+    """
+    Turns a fitted CatBoostClassifier into a CompiledTreeModel.
+
+    `cat_values` lists the known values of every categorical feature
+    (e.g. {"CODE_GENDER": ["F", "M", "XNA"]}); anything else is scored as
+    an unseen category, exactly like CatBoost does.
+    The result is checked against CatBoost's own leaf indexes and
+    probabilities, and a ValueError is raised on any mismatch.
+    """
+    from catboost import Pool
+
+    with tempfile.TemporaryDirectory() as tmp:
+        json_path = os.path.join(tmp, "model.json")
+        cb_model.save_model(json_path, format="json")
+        with open(json_path) as f:
+            spec = json.load(f)
+
+    feature_names = list(cb_model.feature_names_)
+    cat_feature_indices = list(cb_model.get_cat_feature_indices())
+    info = spec["features_info"]
+    float_info = info.get("float_features", [])
+    cat_info = info.get("categorical_features", [])
+    ctr_info = info.get("ctrs", [])
+
+    float_feature_indices = [f["flat_feature_index"] for f in float_info]
+    if [c["flat_feature_index"] for c in cat_info] != cat_feature_indices:
+        raise ValueError("Categorical feature layout does not match the model")
+    values_per_cat = [list(cat_values[feature_names[i]]) for i in cat_feature_indices]
+
+    trees = spec["oblivious_trees"]
+    for tree in trees:
+        # A tree that found no useful split is saved with "splits": null (one leaf)
+        tree["splits"] = tree.get("splits") or []
+    n_trees = len(trees)
+    depth = max(len(tree["splits"]) for tree in trees)
+    if depth > 8:
+        raise ValueError(f"Trees deeper than 8 levels are not supported (got {depth})")
+
+    # Global binary-feature numbering: float borders, then one-hot values, then CTR borders
+    n_float_bins = sum(len(f.get("borders", [])) for f in float_info)
+    n_one_hot = sum(len(c.get("values", [])) for c in cat_info)
+    ctr_bins = [(ctr_idx, border) for ctr_idx, ctr in enumerate(ctr_info) for border in ctr["borders"]]
+
+    # 1. Walk every split and note which input it reads
+    float_splits = []  # (tree, level, float feature, border)
+    table_splits = []  # (tree, level, projection id)
+    projections, projection_ids = [], {}
+    split_groups, group_ids = [], {}
+    level_groups = np.full((n_trees, depth), -1, dtype=np.int64)
+
+    def projection_id(cat_features, float_elements):
+        key = (tuple(cat_features), tuple(float_elements))
+        if key not in projection_ids:
+            projection_ids[key] = len(projections)
+            projections.append(key)
+        return projection_ids[key]
+
+    def group_id(flat_features):
+        # The set of original features a split depends on (used to attribute SHAP values)
+        key = tuple(sorted(set(flat_features)))
+        if key not in group_ids:
+            group_ids[key] = len(split_groups)
+            split_groups.append(key)
+        return group_ids[key]
+
+    for t, tree in enumerate(trees):
+        for level, split in enumerate(tree["splits"]):
+            kind = split["split_type"]
+            if kind == "FloatFeature":
+                f = split["float_feature_index"]
+                float_splits.append((t, level, f, np.float32(split["border"])))
+                level_groups[t, level] = group_id([float_feature_indices[f]])
+            elif kind == "OneHotFeature":
+                k = split["cat_feature_index"]
+                table_splits.append((t, level, projection_id([k], [])))
+                level_groups[t, level] = group_id([cat_feature_indices[k]])
+            elif kind == "OnlineCtr":
+                ctr_idx, border = ctr_bins[split["split_index"] - n_float_bins - n_one_hot]
+                if not np.isclose(border, split["border"]):
+                    raise ValueError(f"Could not resolve CTR for split {split['split_index']}")
+                cats, floats = [], []
+                for element in ctr_info[ctr_idx]["elements"]:
+                    if element["combination_element"] == "cat_feature_value":
+                        cats.append(element["cat_feature_index"])
+                    elif element["combination_element"] == "float_feature":
+                        floats.append((element["float_feature_index"], float(np.float32(element["border"]))))
+                    else:
+                        raise ValueError(f"Unsupported CTR element: {element['combination_element']}")
+                table_splits.append((t, level, projection_id(cats, floats)))
+                level_groups[t, level] = group_id([cat_feature_indices[k] for k in cats])
+            else:
+                raise ValueError(f"Unsupported split type: {kind}")
+
+    # 2. Float features: sorted borders and the leaf bits switched on by each bin
+    float_borders, float_border_offsets, float_leaf_bits, float_row_offsets = [], [0], [], [0]
+    for f in range(len(float_info)):
+        borders = np.unique(np.array([b for _, _, ff, b in float_splits if ff == f], dtype=np.float32))
+        table = np.zeros((len(borders) + 1, n_trees), dtype=np.uint8)
+        bins = np.arange(len(borders) + 1)
+        for t, level, ff, b in float_splits:
+            if ff == f:
+                rank = int(np.searchsorted(borders, b))
+                table[:, t] |= ((bins > rank) << level).astype(np.uint8)
+        float_borders.append(borders)
+        float_border_offsets.append(float_border_offsets[-1] + len(borders))
+        float_leaf_bits.append(table)
+        float_row_offsets.append(float_row_offsets[-1] + len(table))
+
+    # 3. Probe CatBoost once per projection key to learn each categorical split's answer
+    base_floats = [float(np.median(f["borders"])) if f.get("borders") else 0.0 for f in float_info]
+    probe_rows, probe_projection = [], []
+    for p, (cats, floats) in enumerate(projections):
+        for cat_combo in itertools.product(*[range(len(values_per_cat[k]) + 1) for k in cats]):
+            for pattern in itertools.product([0, 1], repeat=len(floats)):
+                row_floats = list(base_floats)
+                for (f, border), bit in zip(floats, pattern):
+                    b = np.float32(border)
+                    row_floats[f] = float(np.nextafter(b, np.float32(np.inf)) if bit else b)
+                row_codes = [0] * len(cat_feature_indices)
+                for k, code in zip(cats, cat_combo):
+                    row_codes[k] = code
+                probe_rows.append(_make_row(feature_names, float_feature_indices, cat_feature_indices, values_per_cat, row_floats, row_codes))
+                probe_projection.append(p)
+
+    proj_leaf_bits, proj_row_offsets = [], [0]
+    if probe_rows:
+        probe_leaves = cb_model.calc_leaf_indexes(Pool(probe_rows, cat_features=cat_feature_indices))
+        for p, (cats, floats) in enumerate(projections):
+            table = np.zeros((_projection_size(values_per_cat, cats, floats), n_trees), dtype=np.uint8)
+            rows = [i for i, row_p in enumerate(probe_projection) if row_p == p]
+            for t, level, split_p in table_splits:
+                if split_p != p:
+                    continue
+                for i in rows:
+                    # The real key of the probe row (a feature repeated in `floats` can override a pattern)
+                    key = _row_key(values_per_cat, float_feature_indices, cat_feature_indices, cats, floats, probe_rows[i])
+                    table[key, t] |= np.uint8(((probe_leaves[i, t] >> level) & 1) << level)
+            proj_leaf_bits.append(table)
+            proj_row_offsets.append(proj_row_offsets[-1] + len(table))
+
+    # 4. Leaves, padded to 2**depth per tree
+    leaf_values = np.zeros((n_trees, 1 << depth), dtype=np.float64)
+    leaf_weights = np.zeros((n_trees, 1 << depth), dtype=np.float64)
+    for t, tree in enumerate(trees):
+        values = tree["leaf_values"]
+        if len(values) != 1 << len(tree["splits"]):
+            raise ValueError("Only single-dimension (binary) models are supported")
+        leaf_values[t, :len(values)] = values
+        weights = tree.get("leaf_weights", [])
+        leaf_weights[t, :len(weights)] = weights
+
+    max_cat = max([len(cats) for cats, _ in projections] + [1])
+    max_float = max([len(floats) for _, floats in projections] + [1])
+    proj_cat_features = np.full((len(projections), max_cat), -1, dtype=np.int64)
+    proj_float_features = np.full((len(projections), max_float), -1, dtype=np.int64)
+    proj_float_borders = np.zeros((len(projections), max_float), dtype=np.float32)
+    for p, (cats, floats) in enumerate(projections):
+        proj_cat_features[p, :len(cats)] = cats
+        for j, (f, border) in enumerate(floats):
+            proj_float_features[p, j] = f
+            proj_float_borders[p, j] = border
+
+    scale, bias = spec.get("scale_and_bias", [1, [0]])
+    bias = bias[0] if isinstance(bias, list) else bias
+
+    empty_bits = np.zeros((0, n_trees), dtype=np.uint8)
+    arrays = {
+        "float_borders": np.concatenate(float_borders) if float_borders else np.zeros(0, dtype=np.float32),
+        "float_border_offsets": np.array(float_border_offsets, dtype=np.int64),
+        "float_leaf_bits": np.concatenate(float_leaf_bits) if float_leaf_bits else empty_bits,
+        "float_row_offsets": np.array(float_row_offsets, dtype=np.int64),
+        "proj_cat_features": proj_cat_features,
+        "proj_float_features": proj_float_features,
+        "proj_float_borders": proj_float_borders,
+        "proj_leaf_bits": np.concatenate(proj_leaf_bits) if proj_leaf_bits else empty_bits,
+        "proj_row_offsets": np.array(proj_row_offsets, dtype=np.int64),
+        "leaf_values": leaf_values,
+        "leaf_weights": leaf_weights,
+        "tree_depths": np.array([len(tree["splits"]) for tree in trees], dtype=np.int64),
+        "level_groups": level_groups,
+    }
+    meta = {
+        "format_version": FORMAT_VERSION,
+        "feature_names": feature_names,
+        "cat_feature_indices": cat_feature_indices,
+        "float_feature_indices": float_feature_indices,
+        "cat_values": values_per_cat,
+        "split_groups": [list(group) for group in split_groups],
+        "depth": depth,
+        "n_trees": n_trees,
+        "scale": float(scale),
+        "bias": float(bias),
+        "source_sha256": source_sha256,
+    }
+    compiled = CompiledTreeModel(arrays, meta)
+
+    # 5. Verify against CatBoost itself
+    check_rows = _random_rows(feature_names, float_feature_indices, cat_feature_indices, values_per_cat, float_info, n_check_rows)
+    check_rows += probe_rows
+    check_pool = Pool(check_rows, cat_features=cat_feature_indices)
+    floats, codes = compiled.encode(check_rows)
+    if not np.array_equal(compiled.leaf_indexes(floats, codes), cb_model.calc_leaf_indexes(check_pool)):
+        raise ValueError("Compiled leaf indexes do not match CatBoost")
+    max_error = np.abs(compiled.predict_proba_encoded(floats, codes)[:, 1] - cb_model.predict_proba(check_pool)[:, 1]).max()
+    if max_error > tolerance:
+        raise ValueError(f"Compiled probabilities differ from CatBoost by {max_error:.3g}")
+    compiled.meta["max_abs_error"] = float(max_error)
+
+    return compiled
+
+def _make_row(feature_names, float_feature_indices, cat_feature_indices, values_per_cat, row_floats, row_codes):
+    row = [None] * len(feature_names)
+    for f, i in enumerate(float_feature_indices):
+        row[i] = row_floats[f]
+    for k, i in enumerate(cat_feature_indices):
+        values = values_per_cat[k]
+        row[i] = values[row_codes[k]] if row_codes[k] < len(values) else UNSEEN_CATEGORY
+    return row
+
+def _projection_size(values_per_cat, cats, floats):
+    size = 1
+    for k in cats:
+        size *= len(values_per_cat[k]) + 1
+    return size << len(floats)
+
+def _row_key(values_per_cat, float_feature_indices, cat_feature_indices, cats, floats, row):
+    key = 0
+    for k in cats:
+        values = values_per_cat[k]
+        value = row[cat_feature_indices[k]]
+        key = key * (len(values) + 1) + (values.index(value) if value in values else len(values))
+    for f, border in floats:
+        key = key * 2 + int(np.float32(row[float_feature_indices[f]]) > np.float32(border))
+    return key
+
+def _random_rows(feature_names, float_feature_indices, cat_feature_indices, values_per_cat, float_info, n_rows):
+    # Values drawn around the model's own borders so every split gets exercised
+    rng = np.random.default_rng(0)
+    rows = []
+    for _ in range(n_rows):
+        row_floats = []
+        for f in float_info:
+            borders = f.get("borders") or [0.0]
+            low, high = min(borders), max(borders)
+            span = (high - low) or 1.0
+            row_floats.append(float(rng.uniform(low - 0.1 * span, high + 0.1 * span)))
+        row_codes = [int(rng.integers(0, len(values) + 1)) for values in values_per_cat]
+        rows.append(_make_row(feature_names, float_feature_indices, cat_feature_indices, values_per_cat, row_floats, row_codes))
+    return rows
+
+def main():
+    import joblib
+    from .. import ml_service
+
+    print(f"Compiling {ml_service.MODEL_PATH}...")
+    cb_model = joblib.load(ml_service.MODEL_PATH)
+    compiled = compile_catboost_model(cb_model, ml_service.CATEGORY_VALUES, source_sha256=file_sha256(ml_service.MODEL_PATH))
+    compiled.save(ml_service.COMPILED_MODEL_PATH)
+    print(f"✅ Saved {ml_service.COMPILED_MODEL_PATH} ({compiled.n_trees} trees, max error {compiled.meta['max_abs_error']:.2e})")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,162 @@
+# app/services/tree_shap.py
+# Exact TreeSHAP for the compiled oblivious trees (see tree_model.py).
+#
+# In an oblivious tree the path-dependent SHAP values of a row depend on
+# nothing but the leaf the row lands in. So for every tree we compute, once,
+# a table phi[leaf, feature group] by enumerating all subsets of the (at most
+# `depth`) groups the tree splits on. Explaining a batch is then a lookup of
+# each row's leaf in each tree and a sum, just like prediction.
+#
+# Conventions follow CatBoost's ShapValues:
+#   - the root of an oblivious tree is its LAST split (leaf bit depth-1),
+#   - "cover" is the training weight of the leaves under a node,
+#   - a split on a feature combination (CTR) is one player, and its value is
+#     shared equally by the features of the combination,
+#   - the extra last column is the expected value (bias).
+import json
+import os
+from math import factorial
+
+import numpy as np
+
+from .tree_model import CHUNK_ROWS, CompiledTreeModel
+
+class TreeShapExplainer:
+    def __init__(self, compiled: CompiledTreeModel, tables=None, expected_value=None):
+        self.model = compiled
+        self.n_features = len(compiled.feature_names)
+        self.n_groups = len(compiled.split_groups)
+
+        # group -> feature matrix (each group's value split equally among its features)
+        self.group_to_features = np.zeros((self.n_groups, self.n_features), dtype=np.float64)
+        for g, features in enumerate(compiled.split_groups):
+            for feature in features:
+                self.group_to_features[g, feature] = 1.0 / len(features)
+
+        if tables is None:
+            self.tables, expected = self._build_tables()
+            self.expected_value = expected * compiled.scale + compiled.bias
+        else:
+            # Precomputed (e.g. memory-mapped from a file shared by all workers)
+            self.tables, self.expected_value = tables, float(expected_value)
+
+    # --- PERSISTENCE ---
+    def save_dir(self, path):
+        os.makedirs(path, exist_ok=True)
+        np.save(os.path.join(path, "shap_tables.npy"), self.tables)
+        with open(os.path.join(path, "shap_meta.json"), "w") as f:
+            json.dump({"expected_value": self.expected_value}, f)
+
+    @classmethod
+    def load_dir(cls, compiled: CompiledTreeModel, path, mmap=True):
+        with open(os.path.join(path, "shap_meta.json")) as f:
+            meta = json.load(f)
+        tables = np.load(os.path.join(path, "shap_tables.npy"), mmap_mode="r" if mmap else None)
+        return cls(compiled, tables=tables, expected_value=meta["expected_value"])
+
+    # --- PUBLIC API ---
+    def shap_values(self, floats, codes):
+        """
+        Same layout as CatBoost's get_feature_importance(type='ShapValues'):
+        (n_rows, n_features + 1), last column = expected value.
+        """
+        n = floats.shape[0]
+        out = np.empty((n, self.n_features + 1), dtype=np.float64)
+        out[:, :-1] = self.group_values(floats, codes) @ self.group_to_features
+        out[:, -1] = self.expected_value
+        return out
+
+    def group_values(self, floats, codes):
+        """(n_rows, n_groups) SHAP value of every split group."""
+        n = floats.shape[0]
+        values = np.empty((n, self.n_groups), dtype=np.float64)
+        offsets = np.arange(self.model.n_trees, dtype=np.int64) * (1 << self.model.depth)
+        for start in range(0, n, CHUNK_ROWS):
+            stop = start + CHUNK_ROWS
+            rows = self.model.leaf_indexes(floats[start:stop], codes[start:stop]) + offsets
+            for g in range(self.n_groups):
+                values[start:stop, g] = self.tables[g][rows].sum(axis=1)
+        return values * self.model.scale
+
+    def top_k(self, floats, codes, k=5):
+        """
+        Cheaper mode: only the k largest |SHAP| features per row.
+        Returns (feature indices, shap values), both (n_rows, k), sorted by |SHAP| desc.
+        """
+        shap = self.shap_values(floats, codes)[:, :-1]
+        k = min(k, shap.shape[1])
+        magnitude = np.abs(shap)
+        if k < shap.shape[1]:
+            candidates = np.argpartition(-magnitude, k - 1, axis=1)[:, :k]
+        else:
+            candidates = np.tile(np.arange(shap.shape[1]), (shap.shape[0], 1))
+        # Stable sort so ties keep feature order, like Python's list.sort
+        order = np.argsort(-np.take_along_axis(magnitude, np.sort(candidates, axis=1), axis=1), axis=1, kind="stable")
+        indices = np.take_along_axis(np.sort(candidates, axis=1), order, axis=1)
+        return indices, np.take_along_axis(shap, indices, axis=1)
+
+    # --- PRECOMPUTATION ---
+    def _build_tables(self):
+        m = self.model
+        n_leaves = 1 << m.depth
+        # tables[g] is a flat (n_trees * n_leaves) array: SHAP of group g when a row lands in (tree, leaf)
+        tables = np.zeros((self.n_groups, m.n_trees * n_leaves), dtype=np.float64)
+        expected = 0.0
+        for t in range(m.n_trees):
+            d = int(m.tree_depths[t])
+            phi, groups, tree_expected = _tree_shap_table(
+                m.leaf_values[t, :1 << d], m.leaf_weights[t, :1 << d], m.level_groups[t, :d]
+            )
+            expected += tree_expected
+            for j, g in enumerate(groups):
+                tables[g, t * n_leaves:t * n_leaves + (1 << d)] += phi[:, j]
+        return tables, expected
+
+def _tree_shap_table(values, weights, level_groups):
+    """
+    Exact path-dependent SHAP of one oblivious tree for every leaf.
+    Returns (phi of shape (n_leaves, k), the k group ids, expected value).
+    """
+    d = len(level_groups)
+    n_leaves = 1 << d
+    leaves = np.arange(n_leaves)
+    if d == 0:
+        return np.zeros((1, 0)), [], float(values[0])
+
+    # Cover of every node: subtree[l][p] = weight of leaves whose bits above level l-1 equal p
+    subtree = [weights.reshape(-1, 1 << l).sum(axis=1) for l in range(d + 1)]
+
+    # ratio[l, L] = share of its parent's cover that leaf L's child takes at level l
+    # (levels are visited from the root, level d-1, down to level 0)
+    ratio = np.zeros((d, n_leaves), dtype=np.float64)
+    for l in range(d):
+        child = subtree[l][leaves >> l]
+        parent = subtree[l + 1][leaves >> (l + 1)]
+        ratio[l] = np.divide(child, parent, out=np.zeros(n_leaves), where=parent > 0)
+
+    groups = list(dict.fromkeys(int(g) for g in level_groups))
+    k = len(groups)
+    level_masks = [sum(1 << l for l in range(d) if level_groups[l] == g) for g in groups]
+
+    # v[S][leaf] = E[f | features in S fixed to the row's values], for a row in `leaf`
+    v = np.zeros((1 << k, n_leaves), dtype=np.float64)
+    for subset in range(1 << k):
+        fixed = 0
+        for j in range(k):
+            if subset >> j & 1:
+                fixed |= level_masks[j]
+        free_levels = [l for l in range(d) if not fixed >> l & 1]
+        weighted = values * (np.prod(ratio[free_levels], axis=0) if free_levels else 1.0)
+        totals = np.bincount(leaves & fixed, weights=weighted, minlength=n_leaves)
+        v[subset] = totals[leaves & fixed]
+
+    # Shapley weights |S|! (k - |S| - 1)! / k!
+    coef = [factorial(s) * factorial(k - s - 1) / factorial(k) for s in range(k)]
+    phi = np.zeros((n_leaves, k), dtype=np.float64)
+    for j in range(k):
+        bit = 1 << j
+        for subset in range(1 << k):
+            if not subset & bit:
+                phi[:, j] += coef[bin(subset).count("1")] * (v[subset | bit] - v[subset])
+
+    return phi, groups, float(v[0, 0])
@@ -0,0 +1,168 @@
+# app/services/write_behind.py
+# Write-behind persistence of scored loan applications.
+#
+# /apply hands its finished record to the buffer instead of doing its own
+# INSERT + COMMIT. A background task writes the queued records with one
+# multi-row INSERT ... RETURNING and one commit (one fsync) per batch, as soon
+# as `batch_size` records are waiting or `flush_ms` after the first one.
+#   await save(record)                 returns at once, the row goes out with the next batch
+#   await save(record, durable=True)   waits for that batch's commit, returns the row (with its id)
+# A durable caller is waiting, so it doesn't wait for the window: the batch is
+# flushed at once and whatever arrives meanwhile forms the next one (group commit).
+# stop() writes everything still queued (app shutdown).
+# A batch that still fails after max_retries is appended to `dead_letter_path`
+# (JSON lines) rather than lost: those callers were already told it was accepted.
+import asyncio
+import json
+import os
+import time
+
+from .. import crud, database
+from ..core import metrics
+
+_STOP = object()
+
+BATCH_SIZE_BUCKETS = [1, 2, 4, 8, 16, 32, 64, 128, 256, 512, 1024, 2048]
+FLUSH_SECONDS_BUCKETS = [0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5]
+
+async def insert_applications(records):
+    async with database.AsyncSessionLocal() as db:
+        rows = await crud.bulk_create_loan_applications_async(db, records)
+        await db.commit()
+        return rows
+
+class WriteBehindBuffer:
+    def __init__(self, write_batch, batch_size=500, flush_ms=50, max_queued=10000, max_retries=3, dead_letter_path=None, name="write_behind"):
+        """write_batch: async fn(records) -> written rows, in the same order."""
+        self.write_batch = write_batch
+        self.batch_size = max(1, int(batch_size))
+        self.window = max(0.0, float(flush_ms)) / 1000
+        self.max_queued = max(self.batch_size, int(max_queued))
+        self.max_retries = max(0, int(max_retries))
+        self.dead_letter_path = dead_letter_path
+        self.name = name
+
+        self._queue = None
+        self._full = None
+        self._task = None
+        self._durable_queued = 0
+
+        self.queue_depth = metrics.gauge(f"{name}_queue_depth", "Records waiting to be written")
+        self.batch_sizes = metrics.histogram(f"{name}_batch_size", BATCH_SIZE_BUCKETS, "Records per INSERT")
+        self.flush_seconds = metrics.histogram(f"{name}_flush_seconds", FLUSH_SECONDS_BUCKETS, "INSERT + COMMIT time per batch")
+        self.errors = metrics.counter(f"{name}_errors_total", "Batch writes that raised (retried)")
+        self.dead_lettered = metrics.counter(f"{name}_dead_lettered_total", "Records spilled to the dead-letter file after max_retries")
+        self.dropped = metrics.counter(f"{name}_dropped_total", "Records lost: not even the dead-letter file could be written")
+
+    # --- PUBLIC API ---
+    def start(self):
+        """Starts the writer task on the running event loop."""
+        if self._task is not None:
+            return
+        # Bounded: when the database falls behind, save() waits instead of growing memory
+        self._queue = asyncio.Queue(maxsize=self.max_queued)
+        self._full = asyncio.Event()
+        self._task = asyncio.create_task(self._run(), name=self.name)
+
+    async def save(self, record, durable=False):
+        """Queues one record. durable=True waits for the commit and returns the written row."""
+        self.start()
+        future = asyncio.get_running_loop().create_future() if durable else None
+        await self._queue.put((record, future))
+        if durable:
+            # Counted once queued: a caller cancelled while waiting on a full queue never was
+            self._durable_queued += 1
+        depth = self._queue.qsize()
+        self.queue_depth.set(depth)
+        if depth >= self.batch_size or durable:
+            self._full.set()
+        if future is not None:
+            return await future
+        return None
+
+    async def stop(self):
+        """Writes everything queued so far, then stops the writer task."""
+        if self._task is None:
+            return
+        await self._queue.put(_STOP)
+        self._full.set()
+        await self._task
+        self._task = None
+
+    # --- WRITER ---
+    async def _run(self):
+        stopping = False
+        while not stopping:
+            first = await self._queue.get()
+            if first is _STOP:
+                break
+            self._took(first)
+
+            # The first record opens a window; a full batch or a durable caller closes it early.
+            # Checked after the clear, so a signal sent just before it isn't lost.
+            self._full.clear()
+            if first[1] is None and not self._durable_queued and self._queue.qsize() + 1 < self.batch_size:
+                try:
+                    await asyncio.wait_for(self._full.wait(), timeout=self.window)
+                except asyncio.TimeoutError:
+                    pass
+
+            batch = [first]
+            while len(batch) < self.batch_size and not self._queue.empty():
+                item = self._queue.get_nowait()
+                if item is _STOP:
+                    stopping = True
+                    break
+                self._took(item)
+                batch.append(item)
+            self.queue_depth.set(self._queue.qsize())
+            await self._flush(batch)
+
+    def _took(self, item):
+        if item[1] is not None:
+            self._durable_queued -= 1
+
+    async def _flush(self, batch):
+        records = [record for record, _ in batch]
+        for attempt in range(self.max_retries + 1):
+            started = time.perf_counter()
+            try:
+                rows = await self.write_batch(records)
+                break
+            except Exception as e:
+                self.errors.inc()
+                print(f"❌ Writing {len(records)} applications failed (attempt {attempt + 1}): {e}")
+                if attempt == self.max_retries:
+                    await self._dead_letter(records, e)
+                    for _, future in batch:
+                        if future is not None and not future.done():
+                            future.set_exception(e)
+                    return
+                await asyncio.sleep(0.5 * (attempt + 1))
+
+        self.flush_seconds.observe(time.perf_counter() - started)
+        self.batch_sizes.observe(len(records))
+        for (_, future), row in zip(batch, rows):
+            if future is not None and not future.done():
+                future.set_result(row)
+
+    async def _dead_letter(self, records, error):
+        if self.dead_letter_path:
+            try:
+                await asyncio.to_thread(_append_json_lines, self.dead_letter_path, records, error)
+                self.dead_lettered.inc(len(records))
+                print(f"⚠️ {len(records)} applications saved to {self.dead_letter_path} for replay")
+                return
+            except OSError as e:
+                print(f"❌ Could not write {self.dead_letter_path}: {e}")
+        self.dropped.inc(len(records))
+        print(f"❌ {len(records)} applications dropped")
+
+def _append_json_lines(path, records, error):
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    failed_at = time.strftime("%Y-%m-%dT%H:%M:%S%z")
+    with open(path, "a") as f:
+        for record in records:
+            f.write(json.dumps({"record": record, "error": str(error), "failed_at": failed_at}, default=str) + "\n")
+        f.flush()
+        os.fsync(f.fileno())
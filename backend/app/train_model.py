@@ -1,96 +1,271 @@
 # backend/app/train_model.py
-import pandas as pd
+# Trains the CatBoost model served by ml_service.
+#
+# 1. Features: the CSV is read TRAIN_CHUNK_ROWS rows at a time, only the columns
+#    the model needs, straight into compact dtypes (float32, int8 target, int16
+#    category codes). Each chunk's engineered features are appended to flat
+#    files in TRAIN_FEATURE_CACHE_DIR, so peak memory is one chunk. Later runs
+#    on the same file memory-map those files instead of parsing the CSV again.
+# 2. Split: stratified over row numbers only; each side's features are gathered
+#    once, straight into the frame CatBoost trains on (no DataFrame copies).
+# 3. Train, evaluate, then save ml_model.joblib together with the compiled
+#    ml_model.npz it is served from.
+# Every stage logs its wall time and the process's peak RSS.
+#
+# Usage (from backend/):  TRAIN_DATA_PATH=data/application_train.csv python -m app.train_model
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import time
+
+import joblib
 import numpy as np
+import pandas as pd
 from catboost import CatBoostClassifier
+from sklearn.metrics import roc_auc_score
 from sklearn.model_selection import train_test_split
-from sklearn.metrics import roc_auc_score, accuracy_score
-import joblib
-import os
 
-# 1. Configuration
-# Where is the file?
-DATA_PATH = "C:/Users/vijay/credit-risk-engine/backend/data/application_train.csv"
-MODEL_PATH = "ml_model.joblib"
+try:
+    import resource
+except ImportError:
+    # Windows: no getrusage, peak RSS isn't logged
+    resource = None
 
-def train():
-    print("--- 🚀 Starting Model Training Pipeline ---")
-    
-    # 2. Load Data
-    # We only load the columns we actually need to save memory
-    required_columns = [
-        "TARGET", 
-        "AMT_INCOME_TOTAL", 
-        "AMT_CREDIT", 
-        "AMT_ANNUITY",
-        "DAYS_BIRTH", 
-        "DAYS_EMPLOYED", 
-        "NAME_CONTRACT_TYPE", 
-        "CODE_GENDER"
-    ]
-    
-    print(f"Loading data from {DATA_PATH}...")
-    if not os.path.exists(DATA_PATH):
-        print("❌ Error: File not found! Did you put application_train.csv in the 'data' folder?")
-        return
-
-    df = pd.read_csv(DATA_PATH, usecols=required_columns)
-    print(f"Data Loaded: {df.shape[0]} rows.")
-
-    # 3. Preprocessing (Cleaning)
-    print("Cleaning data...")
-    
-    # Fill missing numbers with the Median (middle value)
-    df["AMT_ANNUITY"] = df["AMT_ANNUITY"].fillna(df["AMT_ANNUITY"].median())
-    
-    # Feature Engineering: Convert 'Days Birth' (e.g. -15000) to 'Age' (e.g. 41)
-    df["AGE_YEARS"] = -df["DAYS_BIRTH"] / 365
-    
-    # Feature Engineering: Convert 'Days Employed' to 'Years Employed'
-    # Note: 365243 is a magic number in this dataset for "Unemployed", let's handle it
-    df["YEARS_EMPLOYED"] = -df["DAYS_EMPLOYED"] / 365
-    df.loc[df["YEARS_EMPLOYED"] < 0, "YEARS_EMPLOYED"] = 0 # Fix weird negative values if any
-    
-    # Drop the original confusing columns
-    df = df.drop(columns=["DAYS_BIRTH", "DAYS_EMPLOYED"])
-
-    # 4. Prepare X (Inputs) and y (Output)
-    y = df["TARGET"]
-    X = df.drop(columns=["TARGET"])
-    
-    # Identify Categorical Columns (Text) so CatBoost handles them automatically
-    cat_features = ["NAME_CONTRACT_TYPE", "CODE_GENDER"]
-
-    # 5. Split Data (80% for Training, 20% for Testing)
-    X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=42, stratify=y)
-
-    # 6. Initialize the Brain (CatBoost)
-    # scale_pos_weight=11: This is CRITICAL.
-    # Defaulters are rare (only ~8%). If we don't add this, the model will just guess "Repaid" 
-    # every time and get 92% accuracy but miss all the fraudsters.
-    # Weight 11 forces it to pay 11x more attention to mistakes on Defaulters.
-    model = CatBoostClassifier(
-        iterations=500,         # How many times to loop
-        depth=6,                # How complex the trees are
-        learning_rate=0.1,      # How fast it learns
-        cat_features=cat_features,
-        scale_pos_weight=11,    # Handle Class Imbalance
-        verbose=100             # Print status every 100 steps
+from .core import config
+from .ml_service import CAT_FEATURES, EXPECTED_ORDER, MODEL_PATH
+from .services.tree_model import compile_catboost_model, file_sha256
+
+# Bump whenever the feature engineering changes, so cached matrices are rebuilt
+FEATURE_VERSION = 1
+
+# Only the columns we actually need, already in their final dtypes
+RAW_DTYPES = {
+    "TARGET": np.int8,
+    "AMT_INCOME_TOTAL": np.float32,
+    "AMT_CREDIT": np.float32,
+    "AMT_ANNUITY": np.float32,
+    "DAYS_BIRTH": np.float32,
+    "DAYS_EMPLOYED": np.float32,
+    "NAME_CONTRACT_TYPE": "category",
+    "CODE_GENDER": "category",
+}
+FLOAT_FEATURES = [name for name in EXPECTED_ORDER if name not in CAT_FEATURES]
+CODE_DTYPE = np.int16
+MISSING_CATEGORY = "nan"  # what serving turns a missing category into (str(NaN))
+
+class FeatureMatrix:
+    """The engineered training set, one memory-mapped array per feature plus the target."""
+
+    def __init__(self, directory):
+        self.directory = directory
+        with open(os.path.join(directory, "meta.json")) as f:
+            self.meta = json.load(f)
+        self.rows = self.meta["rows"]
+        self.categories = self.meta["categories"]
+        self.columns = {name: _map(directory, name, np.float32, self.rows) for name in FLOAT_FEATURES}
+        self.columns.update({name: _map(directory, name, CODE_DTYPE, self.rows) for name in CAT_FEATURES})
+        self.target = _map(directory, "TARGET", np.int8, self.rows)
+
+    def frame(self, rows=None):
+        """Features in EXPECTED_ORDER (categoricals as pandas categories over the codes); `rows` picks a subset."""
+        data = {}
+        for name in EXPECTED_ORDER:
+            values = self.columns[name] if rows is None else self.columns[name][rows]
+            data[name] = pd.Categorical.from_codes(values, self.categories[name]) if name in CAT_FEATURES else values
+        return pd.DataFrame(data, copy=False)
+
+    def labels(self, rows=None):
+        return np.asarray(self.target if rows is None else self.target[rows])
+
+# --- FEATURES ---
+def load_features(data_path=None, cache_dir=None, chunk_rows=None):
+    """The FeatureMatrix of data_path: from the cache when it has one for this exact file, else built (and cached)."""
+    data_path = data_path or config.TRAIN_DATA_PATH
+    cache_dir = config.TRAIN_FEATURE_CACHE_DIR if cache_dir is None else cache_dir
+    if not os.path.exists(data_path):
+        raise FileNotFoundError(f"{data_path} not found (set TRAIN_DATA_PATH to application_train.csv)")
+
+    if not cache_dir:
+        staging = tempfile.mkdtemp(prefix="features-")
+        try:
+            build_features(data_path, staging, chunk_rows)
+            return FeatureMatrix(staging)
+        finally:
+            # The maps stay valid after the files are unlinked (POSIX)
+            shutil.rmtree(staging, ignore_errors=True)
+
+    target = os.path.join(cache_dir, _cache_key(data_path))
+    if os.path.exists(os.path.join(target, "meta.json")):
+        print(f"Using cached features in {target}")
+        return FeatureMatrix(target)
+
+    os.makedirs(cache_dir, exist_ok=True)
+    staging = tempfile.mkdtemp(dir=cache_dir, prefix=".staging-")
+    try:
+        build_features(data_path, staging, chunk_rows)
+        os.rename(staging, target)
+    except OSError:
+        # Another run cached the same file first; use its copy
+        shutil.rmtree(staging, ignore_errors=True)
+        if not os.path.exists(os.path.join(target, "meta.json")):
+            raise
+    except BaseException:
+        shutil.rmtree(staging, ignore_errors=True)
+        raise
+    return FeatureMatrix(target)
+
+def build_features(data_path, directory, chunk_rows=None):
+    """Streams the CSV into one flat file per feature in `directory`, meta.json last."""
+    print(f"Loading data from {data_path}...")
+    vocabularies = {name: {} for name in CAT_FEATURES}
+    files = {name: open(os.path.join(directory, f"{name}.bin"), "wb") for name in EXPECTED_ORDER + ["TARGET"]}
+    rows = 0
+    try:
+        with pd.read_csv(data_path, usecols=list(RAW_DTYPES), dtype=RAW_DTYPES, chunksize=chunk_rows or config.TRAIN_CHUNK_ROWS) as reader:
+            for chunk in reader:
+                for name, values in engineer_features(chunk, vocabularies).items():
+                    values.tofile(files[name])
+                rows += len(chunk)
+    finally:
+        for f in files.values():
+            f.close()
+    if not rows:
+        raise ValueError(f"{data_path} has no rows")
+    print(f"Data Loaded: {rows} rows.")
+
+    # Fill missing annuities with the median, which needs the whole column
+    annuity = _map(directory, "AMT_ANNUITY", np.float32, rows, mode="r+")
+    median = float(np.nanmedian(annuity))
+    annuity[np.isnan(annuity)] = median
+    annuity.flush()
+    del annuity
+
+    categories = {name: list(vocabulary) for name, vocabulary in vocabularies.items()}
+    with open(os.path.join(directory, "meta.json"), "w") as f:
+        json.dump({"rows": rows, "categories": categories, "annuity_median": median,
+                   "feature_version": FEATURE_VERSION, "source": os.path.abspath(data_path)}, f, indent=2)
+
+def engineer_features(chunk, vocabularies):
+    """One CSV chunk -> {feature: array} (float32 features, category codes, int8 target)."""
+    features = {
+        "TARGET": chunk["TARGET"].to_numpy(np.int8),
+        "AMT_INCOME_TOTAL": chunk["AMT_INCOME_TOTAL"].to_numpy(np.float32),
+        "AMT_CREDIT": chunk["AMT_CREDIT"].to_numpy(np.float32),
+        "AMT_ANNUITY": chunk["AMT_ANNUITY"].to_numpy(np.float32),
+        # 'Days Birth' (e.g. -15000) -> 'Age' (e.g. 41)
+        "AGE_YEARS": _years(chunk["DAYS_BIRTH"]),
+        # 365243 is this dataset's magic number for "Unemployed": it comes out negative, so 0
+        "YEARS_EMPLOYED": np.maximum(_years(chunk["DAYS_EMPLOYED"]), np.float32(0)),
+    }
+    # Category codes stay stable across chunks: first seen, first numbered
+    for name in CAT_FEATURES:
+        values = chunk[name]
+        if values.isna().any():
+            if MISSING_CATEGORY not in values.cat.categories:
+                values = values.cat.add_categories([MISSING_CATEGORY])
+            values = values.fillna(MISSING_CATEGORY)
+        vocabulary = vocabularies[name]
+        lookup = np.array([vocabulary.setdefault(value, len(vocabulary)) for value in values.cat.categories], dtype=CODE_DTYPE)
+        features[name] = lookup[values.cat.codes.to_numpy()]
+    return features
+
+def _years(days):
+    # Same float32 values the float64 arithmetic used to hand CatBoost
+    return (-days.to_numpy(np.float64) / 365).astype(np.float32)
+
+def _cache_key(data_path):
+    stat = os.stat(data_path)
+    source = json.dumps([os.path.abspath(data_path), stat.st_size, stat.st_mtime_ns, FEATURE_VERSION, list(RAW_DTYPES)])
+    return hashlib.sha256(source.encode()).hexdigest()[:16]
+
+def _map(directory, name, dtype, rows, mode="r"):
+    return np.memmap(os.path.join(directory, f"{name}.bin"), dtype=dtype, mode=mode, shape=(rows,))
+
+# --- TRAINING ---
+def model_params(**overrides):
+    """CatBoost hyperparameters from config (TRAIN_*), with overrides on top."""
+    params = dict(
+        iterations=config.TRAIN_ITERATIONS,      # How many times to loop
+        depth=config.TRAIN_DEPTH,                # How complex the trees are
+        learning_rate=config.TRAIN_LEARNING_RATE,  # How fast it learns
+        # scale_pos_weight: This is CRITICAL.
+        # Defaulters are rare (only ~8%). If we don't add this, the model will just guess "Repaid"
+        # every time and get 92% accuracy but miss all the fraudsters.
+        scale_pos_weight=config.TRAIN_SCALE_POS_WEIGHT,
+        thread_count=config.TRAIN_THREAD_COUNT,
     )
+    params.update(overrides)
+    return params
 
-    # 7. Train
+def split_rows(features):
+    """(training rows, held-out test rows): stratified, and the same on every run."""
+    return train_test_split(
+        np.arange(features.rows), test_size=config.TRAIN_TEST_SIZE, random_state=config.TRAIN_RANDOM_SEED, stratify=features.target
+    )
+
+def train(data_path=None, params=None, model_path=MODEL_PATH):
+    print("--- 🚀 Starting Model Training Pipeline ---")
+    started = stage = time.perf_counter()
+
+    # 1. Features (compact dtypes, cached)
+    try:
+        features = load_features(data_path)
+    except FileNotFoundError as e:
+        print(f"❌ Error: {e}")
+        return None
+    stage = _log_stage("features", stage)
+
+    # 2. Split Data (80% for Training, 20% for Testing), as row numbers
+    train_rows, test_rows = split_rows(features)
+
+    # 3. Train
     print("Training Model (This might take a minute)...")
-    model.fit(X_train, y_train)
+    model = CatBoostClassifier(**model_params(**(params or {})), cat_features=CAT_FEATURES, verbose=100)
+    model.fit(features.frame(train_rows), features.labels(train_rows))
+    stage = _log_stage("training", stage)
 
-    # 8. Evaluate
+    # 4. Evaluate
     print("Evaluating...")
-    preds_proba = model.predict_proba(X_test)[:, 1] # Probability of Default (0 to 1)
-    auc_score = roc_auc_score(y_test, preds_proba)
+    preds_proba = model.predict_proba(features.frame(test_rows))[:, 1]  # Probability of Default (0 to 1)
+    auc_score = roc_auc_score(features.labels(test_rows), preds_proba)
     print(f"✅ Model ROC-AUC Score: {auc_score:.4f} (Good is > 0.70)")
+    stage = _log_stage("evaluation", stage)
 
-    # 9. Save
-    print(f"Saving model to {MODEL_PATH}...")
-    joblib.dump(model, MODEL_PATH)
+    # 5. Save
+    save_model(model, model_path, features.categories)
+    _log_stage("saving", stage)
+    _log_stage("end to end", started)
     print("🎉 Success! Model is saved and ready for the API.")
+    return model
+
+def save_model(model, model_path, categories):
+    """
+    Writes model_path and its compiled .npz next to it. The .npz goes first and the
+    model last, each by rename, so a watching API never pairs a new model with an old .npz.
+    """
+    print(f"Saving model to {model_path}...")
+    staging = f"{model_path}.tmp"
+    joblib.dump(model, staging)
+    compiled_path = os.path.splitext(model_path)[0] + ".npz"
+    compiled = compile_catboost_model(model, categories, source_sha256=file_sha256(staging))
+    compiled.save(f"{compiled_path}.tmp.npz")
+    os.replace(f"{compiled_path}.tmp.npz", compiled_path)
+    os.replace(staging, model_path)
+    print(f"✅ Saved {compiled_path} ({compiled.n_trees} trees, max error {compiled.meta['max_abs_error']:.2e})")
+
+def _log_stage(name, started):
+    now = time.perf_counter()
+    print(f"⏱️ {name}: {now - started:.1f}s, peak RSS {_peak_rss_mb()}")
+    return now
+
+def _peak_rss_mb():
+    if resource is None:
+        return "n/a"
+    # ru_maxrss is KB on Linux, bytes on macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return f"{peak / (1 << 20 if os.uname().sysname == 'Darwin' else 1 << 10):.0f} MB"
 
 if __name__ == "__main__":
-    train()
\ No newline at end of file
+    train()
@@ -0,0 +1,285 @@
+# backend/app/tune_model.py
+# Hyperparameter search for the CatBoost model: k-fold cross-validation of
+# every candidate of a parameter grid (or TUNE_TRIALS random ones), with the
+# fits spread over a process pool.
+#
+# - The folds come from train_model's training rows (same seed, same split);
+#   its held-out test rows are never looked at here.
+# - Each fit gets TUNE_THREADS_PER_TRIAL CatBoost threads and TUNE_WORKERS fits
+#   run side by side, so workers x threads never oversubscribes the cores.
+# - Workers memory-map train_model's cached feature matrix: the page cache holds
+#   one copy of the data for all of them.
+# - A fit stops early once the loss on TUNE_EARLY_STOPPING_FRACTION of its
+#   fitting rows stops improving. AUC is measured on the validation fold, which
+#   played no part in the fit or in when it stopped.
+# Per candidate: CV AUC (mean, std), best iteration, fit time, model size
+# (joblib and compiled .npz) and the single-row latency of the path the API
+# would serve it with (compiled trees + TreeSHAP, or CatBoost when the model
+# can't be compiled). Latency is timed in this process once the pool is shut
+# down, one model at a time, so the busy fits don't skew it. The pick is the
+# fastest candidate within TUNE_AUC_TOLERANCE of the best AUC, i.e. the
+# cheapest model to serve that is as good as the most accurate one.
+#
+# Usage (from backend/):  python -m app.tune_model [--save]
+#   --save retrains the pick on all the training rows (train_model.train) and saves it
+import argparse
+import itertools
+import json
+import multiprocessing
+import os
+import random
+import statistics
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import joblib
+import numpy as np
+from catboost import CatBoostClassifier
+from sklearn.metrics import roc_auc_score
+from sklearn.model_selection import StratifiedKFold, train_test_split
+
+from . import ml_service, mock_bank, train_model
+from .core import config
+from .ml_service import CAT_FEATURES
+from .services.model_registry import ModelBundle
+from .services.tree_model import compile_catboost_model
+from .services.tree_shap import TreeShapExplainer
+
+# Searched when TUNE_GRID_FILE isn't set. scale_pos_weight stays out on purpose:
+# it moves the whole risk score scale, and with it the meaning of RISK_SCORE_CUTOFF.
+DEFAULT_GRID = {
+    "depth": [4, 6, 8],
+    "learning_rate": [0.05, 0.1],
+    "l2_leaf_reg": [1, 3, 10],
+    "iterations": [1000],  # an upper bound: early stopping picks the real count
+}
+LATENCY_CALLS = 200
+
+# --- SEARCH SPACE ---
+def load_grid(path=None):
+    path = config.TUNE_GRID_FILE if path is None else path
+    if not path:
+        return DEFAULT_GRID
+    with open(path) as f:
+        grid = json.load(f)
+    if not isinstance(grid, dict) or not all(isinstance(values, list) and values for values in grid.values()):
+        raise ValueError(f"{path} must be a JSON object of {{parameter: [values, ...]}}")
+    return grid
+
+def candidates(grid, trials=0, seed=None):
+    """Every combination of the grid, or `trials` of them drawn at random."""
+    names = sorted(grid)
+    combinations = [dict(zip(names, values)) for values in itertools.product(*(grid[name] for name in names))]
+    if 0 < trials < len(combinations):
+        combinations = random.Random(config.TRAIN_RANDOM_SEED if seed is None else seed).sample(combinations, trials)
+    return combinations
+
+# --- SEARCH ---
+def tune(grid=None, trials=None, folds=None, workers=None, threads=None, data_path=None):
+    """Cross-validates every candidate; returns (results, index of the pick) and writes TUNE_RESULTS_PATH."""
+    print("--- 🔎 Starting Hyperparameter Search ---")
+    started = time.perf_counter()
+    grid = load_grid() if grid is None else grid
+    trials = config.TUNE_TRIALS if trials is None else trials
+    folds = folds or config.TUNE_FOLDS
+    threads = threads or config.TUNE_THREADS_PER_TRIAL
+    workers = workers or config.TUNE_WORKERS or max(1, (os.cpu_count() or 1) // threads)
+    params = candidates(grid, trials)
+    print(f"{len(params)} candidates x {folds} folds on {workers} worker(s) x {threads} thread(s)")
+
+    with tempfile.TemporaryDirectory() as scratch:
+        # The workers open the cached matrix themselves, so there must be one on disk
+        features = train_model.load_features(data_path, cache_dir=config.TRAIN_FEATURE_CACHE_DIR or scratch)
+        # 1. Every (candidate, fold) fit on the pool
+        fits = {i: [] for i in range(len(params))}
+        executor = ProcessPoolExecutor(
+            max_workers=workers,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_start_worker,
+            initargs=(features.directory, folds, config.TUNE_EARLY_STOPPING_ROUNDS),
+        )
+        with executor:
+            futures = [
+                # Fold 0 also sends its model back, to be timed once the pool is idle
+                executor.submit(fit_fold, i, candidate, fold, threads, config.TUNE_EARLY_STOPPING_ROUNDS, fold == 0)
+                for i, candidate in enumerate(params) for fold in range(folds)
+            ]
+            for future in as_completed(futures):
+                fit = future.result()
+                fits[fit["candidate"]].append(fit)
+                if len(fits[fit["candidate"]]) == folds:
+                    aucs = [fit["auc"] for fit in fits[fit["candidate"]]]
+                    print(f"✅ {_describe(params[fit['candidate']])}: AUC {statistics.mean(aucs):.4f} ± {statistics.pstdev(aucs):.4f}")
+
+        # 2. Serving cost, measured with every core free
+        print("Timing single-row scoring...")
+        for i in range(len(params)):
+            fold_0 = next(fit for fit in fits[i] if fit["fold"] == 0)
+            fold_0.update(serving_cost(fold_0.pop("model"), features.categories))
+
+    results = [summarize(params[i], fits[i]) for i in range(len(params))]
+    pick = choose(results)
+    _write_results(results, pick, folds, workers, threads)
+    print_leaderboard(results, pick)
+    print(f"⏱️ search: {time.perf_counter() - started:.1f}s, results in {config.TUNE_RESULTS_PATH}")
+    return results, pick
+
+def fit_fold(candidate, params, fold, threads, early_stopping_rounds, keep_model):
+    """One candidate on one fold (runs in a worker)."""
+    features = _worker["features"]
+    fit_rows, stopping_rows, validation_rows = _worker["folds"][fold]
+    X_validation, y_validation = features.frame(validation_rows), features.labels(validation_rows)
+
+    model = CatBoostClassifier(
+        **train_model.model_params(**params, thread_count=threads),
+        cat_features=CAT_FEATURES,
+        allow_writing_files=False,  # parallel fits would share ./catboost_info
+        verbose=False,
+    )
+    started = time.perf_counter()
+    model.fit(
+        features.frame(fit_rows),
+        features.labels(fit_rows),
+        eval_set=(features.frame(stopping_rows), features.labels(stopping_rows)) if len(stopping_rows) else None,
+        early_stopping_rounds=early_stopping_rounds or None,
+    )
+    fit_seconds = time.perf_counter() - started
+
+    fit = {
+        "candidate": candidate,
+        "fold": fold,
+        "auc": float(roc_auc_score(y_validation, model.predict_proba(X_validation)[:, 1])),
+        "best_iteration": int(model.get_best_iteration() if model.get_best_iteration() is not None else model.tree_count_ - 1),
+        "fit_seconds": fit_seconds,
+    }
+    if keep_model:
+        # Sized here, as freshly trained (what train_model.save_model writes); unpickled copies come out smaller
+        fit["model_kb"] = _joblib_kb(model)
+        fit["model"] = model
+    return fit
+
+def serving_cost(model, categories):
+    """Compiled model size and the median single-row latency of scoring + explaining one applicant."""
+    with tempfile.TemporaryDirectory() as tmp:
+        model_path = os.path.join(tmp, "model.joblib")
+        cost = {"compiled_kb": None}
+        try:
+            compiled = compile_catboost_model(model, categories)
+            compiled.save(os.path.join(tmp, "model.npz"))
+            cost["compiled_kb"] = os.path.getsize(os.path.join(tmp, "model.npz")) / 1024
+            bundle = ModelBundle(model_path, None, compiled=compiled, explainer=TreeShapExplainer(compiled), model=model)
+            score = lambda application: ml_service.predict_loan_risk_compiled([application], bundle=bundle)
+        except Exception as e:
+            # Served by CatBoost then, like the registry does with a model it can't compile
+            print(f"⚠️ Could not compile ({e}); timing CatBoost instead")
+            bundle = ModelBundle(model_path, None, model=model)
+            score = lambda application: ml_service.predict_loan_risk_fast(application, bundle=bundle)
+
+        application = mock_bank.generate_applicants(1)[0]
+        for _ in range(10):
+            score(application)
+        timings = []
+        for _ in range(LATENCY_CALLS):
+            started = time.perf_counter()
+            score(application)
+            timings.append(time.perf_counter() - started)
+        cost["latency_us"] = statistics.median(timings) * 1e6
+    return cost
+
+def _joblib_kb(model):
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "model.joblib")
+        joblib.dump(model, path)
+        return os.path.getsize(path) / 1024
+
+# --- RESULTS ---
+def summarize(params, fits):
+    aucs = [fit["auc"] for fit in sorted(fits, key=lambda fit: fit["fold"])]
+    serving = next(fit for fit in fits if fit["fold"] == 0)
+    return {
+        "params": params,
+        "auc_mean": statistics.mean(aucs),
+        "auc_std": statistics.pstdev(aucs),
+        "fold_aucs": aucs,
+        # Trees to train on all the training rows: the folds' best iteration, on average
+        "best_iteration": round(statistics.mean(fit["best_iteration"] + 1 for fit in fits)),
+        "fit_seconds": statistics.mean(fit["fit_seconds"] for fit in fits),
+        "model_kb": serving["model_kb"],
+        "compiled_kb": serving["compiled_kb"],
+        "latency_us": serving["latency_us"],
+    }
+
+def choose(results, tolerance=None):
+    """Index of the lowest-latency result within `tolerance` of the best mean AUC."""
+    tolerance = config.TUNE_AUC_TOLERANCE if tolerance is None else tolerance
+    best = max(result["auc_mean"] for result in results)
+    contenders = [i for i, result in enumerate(results) if result["auc_mean"] >= best - tolerance]
+    return min(contenders, key=lambda i: (results[i]["latency_us"], -results[i]["auc_mean"]))
+
+def print_leaderboard(results, pick):
+    print(f"\n  {'AUC':>7}{'±':>8}{'trees':>7}{'fit s':>8}{'KB':>8}{'npz KB':>8}{'µs/row':>8}  params")
+    for i in sorted(range(len(results)), key=lambda i: -results[i]["auc_mean"]):
+        result = results[i]
+        compiled_kb = f"{result['compiled_kb']:.0f}" if result["compiled_kb"] is not None else "-"
+        print(f"{'→' if i == pick else ' '} {result['auc_mean']:>7.4f}{result['auc_std']:>8.4f}{result['best_iteration']:>7}"
+              f"{result['fit_seconds']:>8.1f}{result['model_kb']:>8.0f}{compiled_kb:>8}{result['latency_us']:>8.0f}  {_describe(result['params'])}")
+    print(f"→ pick: {_describe(results[pick]['params'])} (fastest within {config.TUNE_AUC_TOLERANCE} AUC of the best)\n")
+
+def _write_results(results, pick, folds, workers, threads):
+    os.makedirs(os.path.dirname(os.path.abspath(config.TUNE_RESULTS_PATH)), exist_ok=True)
+    with open(config.TUNE_RESULTS_PATH, "w") as f:
+        json.dump({
+            "finished_at": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+            "folds": folds,
+            "workers": workers,
+            "threads_per_trial": threads,
+            "early_stopping_rounds": config.TUNE_EARLY_STOPPING_ROUNDS,
+            "auc_tolerance": config.TUNE_AUC_TOLERANCE,
+            "pick": pick,
+            "candidates": results,
+        }, f, indent=2)
+
+def _describe(params):
+    return " ".join(f"{name}={value}" for name, value in params.items())
+
+# --- WORKERS ---
+_worker = {}
+
+def _start_worker(directory, folds, early_stopping_rounds):
+    # Same training rows as train_model.train, then the same folds in every worker
+    features = train_model.FeatureMatrix(directory)
+    train_rows, _ = train_model.split_rows(features)
+    splitter = StratifiedKFold(n_splits=folds, shuffle=True, random_state=config.TRAIN_RANDOM_SEED)
+    _worker["features"] = features
+    _worker["folds"] = [
+        _stopping_split(train_rows[fit], features, early_stopping_rounds) + (train_rows[validation],)
+        for fit, validation in splitter.split(train_rows, features.labels(train_rows))
+    ]
+
+def _stopping_split(rows, features, early_stopping_rounds):
+    # (fitting rows, early-stopping rows): the validation fold only ever measures AUC
+    if not early_stopping_rounds:
+        return rows, rows[:0]
+    fit, stopping = train_test_split(
+        rows, test_size=config.TUNE_EARLY_STOPPING_FRACTION, random_state=config.TRAIN_RANDOM_SEED, stratify=features.labels(rows)
+    )
+    return np.sort(fit), np.sort(stopping)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m app.tune_model", description="Cross-validated hyperparameter search.")
+    parser.add_argument("--grid", default=None, help="JSON {parameter: [values]} (default: TUNE_GRID_FILE or the built-in grid)")
+    parser.add_argument("--trials", type=int, default=config.TUNE_TRIALS, help="random candidates from the grid (0 = all)")
+    parser.add_argument("--folds", type=int, default=config.TUNE_FOLDS)
+    parser.add_argument("--workers", type=int, default=config.TUNE_WORKERS, help="parallel fits (0 = cores / threads)")
+    parser.add_argument("--threads", type=int, default=config.TUNE_THREADS_PER_TRIAL, help="CatBoost threads per fit")
+    parser.add_argument("--save", action="store_true", help="retrain the pick on all training rows and save it")
+    args = parser.parse_args(argv)
+
+    results, pick = tune(load_grid(args.grid), args.trials, args.folds, args.workers, args.threads)
+    if args.save:
+        chosen = results[pick]
+        train_model.train(params={**chosen["params"], "iterations": chosen["best_iteration"]})
+
+if __name__ == "__main__":
+    main()
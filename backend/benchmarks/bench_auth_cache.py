@@ -0,0 +1,55 @@
+# benchmarks/bench_auth_cache.py
+# Resolving the bearer token of an authenticated request: JWT decode + users
+# query every time (the old get_current_user) vs the auth cache, warm.
+# Writes one user to DATABASE_URL.
+# Run from backend/:  DATABASE_URL=... python -m benchmarks.bench_auth_cache
+import asyncio
+import time
+from datetime import timedelta
+
+from sqlalchemy import delete, event
+
+from app import auth_utils, crud, database, models
+from app.services.auth_cache import AuthCache
+
+EMAIL = "bench-auth@example.com"
+REQUESTS = 2000
+
+async def uncached(db, token):
+    payload = auth_utils.jwt.decode(token, auth_utils.SECRET_KEY, algorithms=[auth_utils.ALGORITHM])
+    return await crud.get_user_by_email_async(db, email=payload["sub"])
+
+async def run(resolve, token):
+    queries = []
+    listener = lambda conn, cursor, statement, *args: queries.append(statement)
+    event.listen(database.async_engine.sync_engine, "before_cursor_execute", listener)
+    start = time.perf_counter()
+    for _ in range(REQUESTS):
+        async with database.AsyncSessionLocal() as db:
+            assert (await resolve(db, token)).email == EMAIL
+    seconds = time.perf_counter() - start
+    event.remove(database.async_engine.sync_engine, "before_cursor_execute", listener)
+    return seconds, len(queries)
+
+async def main():
+    async with database.async_engine.begin() as conn:
+        await conn.run_sync(models.Base.metadata.create_all)
+        await conn.execute(delete(models.User).where(models.User.email == EMAIL))
+        await conn.execute(models.User.__table__.insert().values(email=EMAIL, hashed_password="x", full_name="Bench"))
+    token = auth_utils.create_access_token({"sub": EMAIL}, expires_delta=timedelta(minutes=30))
+    cache = AuthCache(max_size=100, ttl_seconds=60)
+
+    try:
+        plain_seconds, plain_queries = await run(uncached, token)
+        cached_seconds, cached_queries = await run(cache.authenticate, token)
+        print(f"{'':>10}{'s':>9}{'us/request':>12}{'queries':>9}")
+        print(f"{'uncached':>10}{plain_seconds:>9.3f}{plain_seconds / REQUESTS * 1e6:>12.1f}{plain_queries:>9}")
+        print(f"{'cached':>10}{cached_seconds:>9.3f}{cached_seconds / REQUESTS * 1e6:>12.1f}{cached_queries:>9}")
+        print(f"speedup {plain_seconds / cached_seconds:.1f}x, hit rate {cache.stats()['hit_rate']:.4f}")
+    finally:
+        async with database.async_engine.begin() as conn:
+            await conn.execute(delete(models.User).where(models.User.email == EMAIL))
+        await database.async_engine.dispose()
+
+if __name__ == "__main__":
+    asyncio.run(main())
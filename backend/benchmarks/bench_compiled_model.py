@@ -0,0 +1,51 @@
+# benchmarks/bench_compiled_model.py
+# Throughput of CatBoost predict_proba vs the compiled NumPy tree evaluator.
+# Run from backend/:  python -m benchmarks.bench_compiled_model
+import time
+
+import numpy as np
+import pandas as pd
+
+from app import ml_service
+
+SIZES = [1_000, 10_000, 100_000, 1_000_000]
+
+def synthetic_frame(n_rows, rng):
+    loan_amount = rng.uniform(50000, 2000000, n_rows)
+    return pd.DataFrame({
+        "NAME_CONTRACT_TYPE": rng.choice(["Cash loans", "Revolving loans"], n_rows),
+        "CODE_GENDER": rng.choice(["M", "F"], n_rows),
+        "AMT_INCOME_TOTAL": rng.uniform(20000, 400000, n_rows),
+        "AMT_CREDIT": loan_amount,
+        "AMT_ANNUITY": loan_amount / 12,
+        "AGE_YEARS": rng.integers(21, 65, n_rows),
+        "YEARS_EMPLOYED": rng.integers(0, 40, n_rows),
+    })[ml_service.EXPECTED_ORDER]
+
+def main():
+    compiled = ml_service.compiled_model
+    if compiled is None or ml_service.model is None:
+        print("❌ Need both ml_model.joblib and a fresh ml_model.npz (python -m app.services.tree_model)")
+        return
+
+    rng = np.random.default_rng(42)
+    print(f"{'rows':>10}{'catboost rows/s':>18}{'numpy rows/s':>16}{'max |diff|':>14}")
+    for n_rows in SIZES:
+        df = synthetic_frame(n_rows, rng)
+
+        start = time.perf_counter()
+        expected = ml_service.model.predict_proba(df)[:, 1]
+        catboost_seconds = time.perf_counter() - start
+
+        start = time.perf_counter()
+        floats, codes = compiled.encode_columns(
+            [df[ml_service.EXPECTED_ORDER[i]].to_numpy() for i in compiled.float_feature_indices],
+            [df[ml_service.EXPECTED_ORDER[i]].to_numpy() for i in compiled.cat_feature_indices],
+        )
+        actual = compiled.predict_proba_encoded(floats, codes)[:, 1]
+        numpy_seconds = time.perf_counter() - start
+
+        print(f"{n_rows:>10}{n_rows / catboost_seconds:>18,.0f}{n_rows / numpy_seconds:>16,.0f}{np.abs(actual - expected).max():>14.2e}")
+
+if __name__ == "__main__":
+    main()
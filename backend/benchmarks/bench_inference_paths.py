@@ -0,0 +1,75 @@
+# benchmarks/bench_inference_paths.py
+# Compares single-row latency of the pandas path, the pandas-free fast path
+# and (when ml_model.npz is present) the compiled-trees + TreeSHAP path.
+# Run from backend/:  python -m benchmarks.bench_inference_paths
+import random
+import time
+import statistics
+
+from app import ml_service, schemas
+
+N_REQUESTS = 2000
+
+def random_application(rng):
+    return schemas.LoanApplicationCreate(
+        full_name="Bench User",
+        income=rng.uniform(20000, 400000),
+        loan_amount=rng.uniform(50000, 2000000),
+        credit_score=rng.randint(650, 900),
+        age=rng.randint(21, 65),
+        years_employed=rng.randint(0, 40),
+        gender=rng.choice(["M", "F"]),
+    )
+
+def percentile(samples, q):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+def same_result(expected, actual, tolerance=1e-9):
+    # Compiled trees agree with CatBoost up to float rounding, not bit for bit
+    (score_a, reasons_a), (score_b, reasons_b) = expected, actual
+    if abs(score_a - score_b) > tolerance or len(reasons_a) != len(reasons_b):
+        return False
+    return all(
+        a["feature"] == b["feature"] and abs(a["shap_score"] - b["shap_score"]) <= tolerance
+        for a, b in zip(reasons_a, reasons_b)
+    )
+
+def compiled_single(application):
+    return ml_service.predict_loan_risk_compiled([application])[0]
+
+def time_path(fn, applications):
+    latencies = []
+    for application in applications:
+        start = time.perf_counter()
+        fn(application)
+        latencies.append((time.perf_counter() - start) * 1000)
+    return latencies
+
+def main():
+    rng = random.Random(42)
+    applications = [random_application(rng) for _ in range(N_REQUESTS)]
+
+    # 1. Both paths must agree exactly
+    for application in applications[:200]:
+        assert ml_service.predict_loan_risk_pandas(application) == ml_service.predict_loan_risk_fast(application)
+    print("✅ Fast path matches the pandas path exactly")
+
+    paths = [("pandas", ml_service.predict_loan_risk_pandas), ("fast", ml_service.predict_loan_risk_fast)]
+    if ml_service.explainer is not None:
+        for application in applications[:200]:
+            assert same_result(ml_service.predict_loan_risk_pandas(application), compiled_single(application))
+        print("✅ Compiled path matches the pandas path (within 1e-9)")
+        paths.append(("compiled", compiled_single))
+
+    # 2. Warm up, then time each path
+    for _, fn in paths:
+        time_path(fn, applications[:50])
+
+    print(f"{'path':<10}{'p50 ms':>10}{'p99 ms':>10}{'mean ms':>10}")
+    for name, fn in paths:
+        latencies = time_path(fn, applications)
+        print(f"{name:<10}{percentile(latencies, 0.5):>10.3f}{percentile(latencies, 0.99):>10.3f}{statistics.mean(latencies):>10.3f}")
+
+if __name__ == "__main__":
+    main()
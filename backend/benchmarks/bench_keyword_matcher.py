@@ -0,0 +1,66 @@
+# benchmarks/bench_keyword_matcher.py
+# Cost of tagging narrations as the keyword dictionary grows:
+# one `in` test per keyword (the old detectors) vs the compiled automaton.
+# Run from backend/:  python -m benchmarks.bench_keyword_matcher
+import random
+import string
+import time
+
+import numpy as np
+
+from app.services.keyword_matcher import KeywordMatcher
+from app.services.statement_analyzer import DEFAULT_KEYWORD_CATEGORIES
+from benchmarks.bench_statement_analyzer import NARRATIONS
+
+N_ROWS = 100_000
+KEYWORD_COUNTS = [7, 100, 1_000, 5_000]
+NAIVE_MAX_KEYWORDS = 1_000  # beyond this the per-keyword loop takes minutes
+
+def synthetic_narrations(n_rows, rng):
+    # Unique reference numbers, so nothing can be deduplicated
+    return [f"{rng.choice(NARRATIONS)} REF{rng.randrange(10**9):09d}" for _ in range(n_rows)]
+
+def keyword_dictionary(n_keywords, rng):
+    categories = {category: list(words) for category, words in DEFAULT_KEYWORD_CATEGORIES.items()}
+    alphabet = string.ascii_uppercase + string.digits
+    categories["merchant"] = [
+        "".join(rng.choice(alphabet) for _ in range(rng.randint(4, 12)))
+        for _ in range(n_keywords - sum(len(words) for words in categories.values()))
+    ]
+    return categories
+
+def naive_tags(narrations, categories):
+    bits = {category: 1 << i for i, category in enumerate(categories)}
+    tags = []
+    for narration in narrations:
+        narration = narration.upper()
+        tag = 0
+        for category, words in categories.items():
+            if any(word in narration for word in words):
+                tag |= bits[category]
+        tags.append(tag)
+    return np.array(tags, dtype=np.int64)
+
+def main():
+    rng = random.Random(42)
+    narrations = synthetic_narrations(N_ROWS, rng)
+    print(f"{'keywords':>10}{'naive s':>10}{'automaton s':>14}{'states':>10}")
+    for n_keywords in KEYWORD_COUNTS:
+        categories = keyword_dictionary(n_keywords, rng)
+        matcher = KeywordMatcher(categories)
+
+        start = time.perf_counter()
+        tags = matcher.tag(narrations)
+        automaton_seconds = time.perf_counter() - start
+
+        naive = "-"
+        if n_keywords <= NAIVE_MAX_KEYWORDS:
+            start = time.perf_counter()
+            expected = naive_tags(narrations, categories)
+            naive = f"{time.perf_counter() - start:.3f}"
+            assert np.array_equal(tags, expected)
+        print(f"{n_keywords:>10}{naive:>10}{automaton_seconds:>14.3f}{matcher.delta.shape[0]:>10}")
+    print("✅ Automaton tags match the per-keyword checks")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+# benchmarks/bench_listing_pagination.py
+# One heavy user's /loan-history as their table grows: loading every row (the
+# old endpoint), an OFFSET page deep into the history, and a keyset page at the
+# same depth (app/pagination.py, on ix_loan_applications_user_created).
+# Writes real rows to DATABASE_URL: point it at a scratch database.
+# Run from backend/:  DATABASE_URL=... python -m benchmarks.bench_listing_pagination
+import asyncio
+import time
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy import delete, select
+
+from app import crud, database, models, pagination
+
+USER_ID = 987654321
+TABLE_SIZES = [10_000, 100_000, 300_000]
+PAGE = 100
+REPEATS = 5
+
+def rows(start, count):
+    base = datetime(2025, 1, 1, tzinfo=timezone.utc)
+    return [
+        dict(
+            full_name=f"bench-{i}", income=50000.0, loan_amount=200000.0, credit_score=700,
+            age=35, years_employed=5, gender="M", status="APPROVED", risk_score=12.5,
+            user_id=USER_ID, risk_factors=[], model_version="bench",
+            created_at=base + timedelta(seconds=i),
+        )
+        for i in range(start, start + count)
+    ]
+
+async def timed(fn):
+    best = float("inf")
+    for _ in range(REPEATS):
+        start = time.perf_counter()
+        n = await fn()
+        best = min(best, time.perf_counter() - start)
+    return best, n
+
+async def load_all():
+    # The old endpoint: every row, sorted, materialized
+    async with database.AsyncSessionLocal() as db:
+        stmt = crud.loan_applications_query(USER_ID).order_by(models.LoanApplication.created_at.desc())
+        return len((await db.scalars(stmt)).all())
+
+async def offset_page(depth):
+    async with database.AsyncSessionLocal() as db:
+        stmt = crud.loan_applications_query(USER_ID).order_by(models.LoanApplication.created_at.desc(), models.LoanApplication.id.desc())
+        return len((await db.scalars(stmt.offset(depth).limit(PAGE))).all())
+
+async def keyset_page(cursor):
+    async with database.AsyncSessionLocal() as db:
+        page = await pagination.paginate(db, crud.loan_applications_query(USER_ID), models.LoanApplication, PAGE, cursor)
+        return len((await db.scalars(page.stmt)).all())
+
+async def cursor_at(depth):
+    # The cursor a client paging through would hold at `depth` rows in
+    async with database.AsyncSessionLocal() as db:
+        stmt = (
+            select(models.LoanApplication.created_at, models.LoanApplication.id)
+            .where(models.LoanApplication.user_id == USER_ID)
+            .order_by(models.LoanApplication.created_at.desc(), models.LoanApplication.id.desc())
+            .offset(depth - 1).limit(1)
+        )
+        created_at, row_id = (await db.execute(stmt)).one()
+        return pagination.encode_cursor(created_at, row_id)
+
+async def main():
+    async with database.async_engine.begin() as conn:
+        await conn.run_sync(models.Base.metadata.create_all)
+        await conn.execute(delete(models.LoanApplication).where(models.LoanApplication.user_id == USER_ID))
+
+    print(f"{'rows':>8}{'load all s':>12}{'offset s':>10}{'keyset s':>10}{'first page s':>14}")
+    written = 0
+    try:
+        for size in TABLE_SIZES:
+            async with database.AsyncSessionLocal() as db:
+                for start in range(written, size, 10_000):
+                    await crud.bulk_create_loan_applications_async(db, rows(start, min(10_000, size - start)))
+                await db.commit()
+            written = size
+
+            depth = size * 9 // 10  # deep into the history, where OFFSET hurts most
+            cursor = await cursor_at(depth)
+            all_seconds, n = await timed(load_all)
+            assert n == size
+            offset_seconds, _ = await timed(lambda: offset_page(depth))
+            keyset_seconds, n = await timed(lambda: keyset_page(cursor))
+            assert n == PAGE
+            first_seconds, _ = await timed(lambda: keyset_page(None))
+            print(f"{size:>8}{all_seconds:>12.4f}{offset_seconds:>10.4f}{keyset_seconds:>10.4f}{first_seconds:>14.4f}")
+    finally:
+        async with database.async_engine.begin() as conn:
+            await conn.execute(delete(models.LoanApplication).where(models.LoanApplication.user_id == USER_ID))
+        await database.async_engine.dispose()
+
+if __name__ == "__main__":
+    asyncio.run(main())
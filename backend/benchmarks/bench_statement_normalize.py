@@ -0,0 +1,90 @@
+# benchmarks/bench_statement_normalize.py
+# Amount/type normalization of statement chunks: the old row-by-row
+# df.apply(merge_amounts) vs the whole-column normalize_amounts, per layout.
+# Run from backend/:  python -m benchmarks.bench_statement_normalize
+import time
+
+import numpy as np
+import pandas as pd
+
+from app.services import statement_ingest
+
+SIZES = [10_000, 100_000, 1_000_000]
+LEGACY_MAX_ROWS = 100_000  # df.apply builds a Series per row; 1M rows takes minutes
+
+def legacy_merge_split_amounts(df):
+    # The split-column handling as it was in /analyze-statement-file
+    def merge_amounts(row):
+        w = pd.to_numeric(row['withdrawalamt'], errors='coerce') or 0
+        d = pd.to_numeric(row['depositamt'], errors='coerce') or 0
+        if d > 0: return d, "CREDIT"
+        elif w > 0: return w, "DEBIT"
+        else: return 0, "UNKNOWN"
+
+    df[['amount', 'type']] = df.apply(lambda row: pd.Series(merge_amounts(row)), axis=1)
+    return df
+
+def indian_format(values):
+    # 1234567.5 -> "12,34,567.50"
+    out = []
+    for value in values:
+        whole, fraction = f"{value:.2f}".split(".")
+        head, tail = whole[:-3], whole[-3:]
+        groups = []
+        while len(head) > 2:
+            groups.insert(0, head[-2:])
+            head = head[:-2]
+        if head:
+            groups.insert(0, head)
+        out.append(",".join(groups + [tail]) + "." + fraction if groups else tail + "." + fraction)
+    return out
+
+def split_frame(n_rows, rng, formatted=False):
+    amounts = rng.uniform(1, 500000, n_rows).round(2)
+    is_deposit = rng.random(n_rows) < 0.4
+    withdrawal = np.where(is_deposit, np.nan, amounts)
+    deposit = np.where(is_deposit, amounts, np.nan)
+    df = pd.DataFrame({"narration": "UPI-SWIGGY-XYZ", "withdrawalamt": withdrawal, "depositamt": deposit})
+    if formatted:
+        df["withdrawalamt"] = np.where(is_deposit, None, np.array(indian_format(amounts), dtype=object))
+        df["depositamt"] = np.where(is_deposit, np.array(indian_format(amounts), dtype=object), None)
+    return df
+
+def suffix_frame(n_rows, rng):
+    amounts = indian_format(rng.uniform(1, 500000, n_rows))
+    suffixes = rng.choice([" Cr", " Dr"], n_rows)
+    return pd.DataFrame({"narration": "UPI-SWIGGY-XYZ", "amount": [f"₹ {a}{s}" for a, s in zip(amounts, suffixes)]})
+
+def signed_frame(n_rows, rng):
+    return pd.DataFrame({"narration": "UPI-SWIGGY-XYZ", "amount": rng.uniform(-500000, 500000, n_rows).round(2)})
+
+LAYOUTS = [
+    ("split", lambda n, rng: split_frame(n, rng), {"kind": "split", "debit": "withdrawalamt", "credit": "depositamt"}),
+    ("split 1,23,456.78", lambda n, rng: split_frame(n, rng, formatted=True), {"kind": "split", "debit": "withdrawalamt", "credit": "depositamt"}),
+    ("₹ 1,234.00 Dr", suffix_frame, {"kind": "amount", "type": False}),
+    ("signed", signed_frame, {"kind": "amount", "type": False}),
+]
+
+def main():
+    rng = np.random.default_rng(42)
+    print(f"{'layout':<20}{'rows':>10}{'legacy s':>10}{'columnar s':>12}")
+    for name, make, layout in LAYOUTS:
+        for n_rows in SIZES:
+            df = make(n_rows, rng)
+
+            start = time.perf_counter()
+            actual = statement_ingest.normalize_amounts(df.copy(), layout)
+            columnar_seconds = time.perf_counter() - start
+
+            legacy = "-"
+            if name == "split" and n_rows <= LEGACY_MAX_ROWS:
+                start = time.perf_counter()
+                expected = legacy_merge_split_amounts(df.copy())
+                legacy = f"{time.perf_counter() - start:.3f}"
+                assert np.array_equal(actual["amount"].to_numpy(), expected["amount"].to_numpy(dtype=np.float64))
+                assert np.array_equal(actual["type"].to_numpy(), expected["type"].to_numpy())
+            print(f"{name:<20}{n_rows:>10}{legacy:>10}{columnar_seconds:>12.3f}")
+    print("✅ Split-column results match the row-by-row merge")
+
+if __name__ == "__main__":
+    main()
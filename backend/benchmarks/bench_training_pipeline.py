@@ -0,0 +1,94 @@
+# benchmarks/bench_training_pipeline.py
+# Getting application_train.csv into train/test feature frames: the old
+# pipeline (whole-file read_csv with default dtypes, per-column copies, then
+# train_test_split copying X and y) vs train_model's chunked, compact feature
+# cache, cold and warm. Each variant runs in a fresh process so its peak RSS is
+# its own. Uses a synthetic file with the real file's shape (extra columns too).
+# Run from backend/:  python -m benchmarks.bench_training_pipeline
+import multiprocessing
+import os
+import resource
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+ROWS = 2_000_000
+EXTRA_COLUMNS = 40
+
+def synthetic_csv(path, n, seed=1):
+    rng = np.random.default_rng(seed)
+    df = pd.DataFrame({
+        "SK_ID_CURR": np.arange(n),
+        "TARGET": (rng.random(n) < 0.08).astype(int),
+        "NAME_CONTRACT_TYPE": rng.choice(["Cash loans", "Revolving loans"], n, p=[0.9, 0.1]),
+        "CODE_GENDER": rng.choice(["F", "M", "XNA"], n, p=[0.6, 0.3999, 0.0001]),
+        "AMT_INCOME_TOTAL": rng.lognormal(11.9, 0.5, n).round(1),
+        "AMT_CREDIT": rng.lognormal(13, 0.7, n).round(1),
+        "AMT_ANNUITY": rng.lognormal(10, 0.5, n).round(1),
+        "DAYS_BIRTH": -rng.integers(7000, 25000, n),
+        "DAYS_EMPLOYED": np.where(rng.random(n) < 0.18, 365243, -rng.integers(0, 15000, n)),
+    })
+    for k in range(EXTRA_COLUMNS):
+        df[f"EXTRA_{k}"] = rng.random(n).round(6)
+    df.to_csv(path, index=False)
+
+def old_pipeline(path):
+    from sklearn.model_selection import train_test_split
+    columns = ["TARGET", "AMT_INCOME_TOTAL", "AMT_CREDIT", "AMT_ANNUITY", "DAYS_BIRTH", "DAYS_EMPLOYED", "NAME_CONTRACT_TYPE", "CODE_GENDER"]
+    df = pd.read_csv(path, usecols=columns)
+    df["AMT_ANNUITY"] = df["AMT_ANNUITY"].fillna(df["AMT_ANNUITY"].median())
+    df["AGE_YEARS"] = -df["DAYS_BIRTH"] / 365
+    df["YEARS_EMPLOYED"] = -df["DAYS_EMPLOYED"] / 365
+    df.loc[df["YEARS_EMPLOYED"] < 0, "YEARS_EMPLOYED"] = 0
+    df = df.drop(columns=["DAYS_BIRTH", "DAYS_EMPLOYED"])
+    y = df["TARGET"]
+    X = df.drop(columns=["TARGET"])
+    return train_test_split(X, y, test_size=0.2, random_state=42, stratify=y)
+
+def new_pipeline(path, cache_dir):
+    from sklearn.model_selection import train_test_split
+    from app import train_model
+    features = train_model.load_features(path, cache_dir=cache_dir)
+    train_rows, test_rows = train_test_split(np.arange(features.rows), test_size=0.2, random_state=42, stratify=features.target)
+    return features.frame(train_rows), features.frame(test_rows), features.labels(train_rows), features.labels(test_rows)
+
+def measure(name, fn, args, results):
+    start = time.perf_counter()
+    X_train, X_test, _, _ = fn(*args)
+    seconds = time.perf_counter() - start
+    frames_mb = (X_train.memory_usage(deep=True).sum() + X_test.memory_usage(deep=True).sum()) / 1e6
+    results.put((name, seconds, resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, frames_mb))
+
+def run(name, fn, *args):
+    context = multiprocessing.get_context("spawn")
+    results = context.Queue()
+    process = context.Process(target=measure, args=(name, fn, args, results))
+    process.start()
+    row = results.get()
+    process.join()
+    return row
+
+def main():
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "application_train.csv")
+        # In a child too: Linux carries the peak RSS across the fork + exec of every later child
+        context = multiprocessing.get_context("spawn")
+        writer = context.Process(target=synthetic_csv, args=(path, ROWS))
+        writer.start()
+        writer.join()
+        cache_dir = os.path.join(tmp, "feature_cache")
+        print(f"{ROWS:,} rows x {EXTRA_COLUMNS + 9} columns, {os.path.getsize(path) / 1e6:.0f} MB CSV")
+
+        rows = [
+            run("old: read_csv + copies", old_pipeline, path),
+            run("new: cold (builds cache)", new_pipeline, path, cache_dir),
+            run("new: warm (memory-mapped)", new_pipeline, path, cache_dir),
+        ]
+        print(f"{'':>28}{'s':>8}{'peak RSS MB':>13}{'frames MB':>11}")
+        for name, seconds, peak_mb, frames_mb in rows:
+            print(f"{name:>28}{seconds:>8.2f}{peak_mb:>13.0f}{frames_mb:>11.0f}")
+
+if __name__ == "__main__":
+    main()
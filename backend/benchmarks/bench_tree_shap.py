@@ -0,0 +1,46 @@
+# benchmarks/bench_tree_shap.py
+# SHAP throughput: CatBoost ShapValues vs TreeSHAP over the compiled trees.
+# Run from backend/:  python -m benchmarks.bench_tree_shap
+import time
+
+import numpy as np
+from catboost import Pool
+
+from app import ml_service
+from benchmarks.bench_compiled_model import synthetic_frame
+
+SIZES = [100, 1_000, 10_000, 100_000]
+
+def main():
+    explainer = ml_service.explainer
+    if explainer is None or ml_service.model is None:
+        print("❌ Need both ml_model.joblib and a fresh ml_model.npz (python -m app.services.tree_model)")
+        return
+
+    rng = np.random.default_rng(7)
+    compiled = ml_service.compiled_model
+    print(f"{'rows':>10}{'catboost rows/s':>18}{'treeshap rows/s':>18}{'top-5 rows/s':>16}{'max |diff|':>14}")
+    for n_rows in SIZES:
+        df = synthetic_frame(n_rows, rng)
+
+        start = time.perf_counter()
+        expected = ml_service.model.get_feature_importance(Pool(df, cat_features=ml_service.CAT_FEATURES), type="ShapValues")
+        catboost_seconds = time.perf_counter() - start
+
+        floats, codes = compiled.encode_columns(
+            [df[ml_service.EXPECTED_ORDER[i]].to_numpy() for i in compiled.float_feature_indices],
+            [df[ml_service.EXPECTED_ORDER[i]].to_numpy() for i in compiled.cat_feature_indices],
+        )
+        start = time.perf_counter()
+        actual = explainer.shap_values(floats, codes)
+        shap_seconds = time.perf_counter() - start
+
+        start = time.perf_counter()
+        explainer.top_k(floats, codes, k=5)
+        top_k_seconds = time.perf_counter() - start
+
+        print(f"{n_rows:>10}{n_rows / catboost_seconds:>18,.0f}{n_rows / shap_seconds:>18,.0f}"
+              f"{n_rows / top_k_seconds:>16,.0f}{np.abs(actual - expected).max():>14.2e}")
+
+if __name__ == "__main__":
+    main()
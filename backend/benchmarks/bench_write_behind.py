@@ -0,0 +1,59 @@
+# benchmarks/bench_write_behind.py
+# Saving scored applications: one INSERT + COMMIT per request (the old /apply)
+# vs the write-behind buffer (one multi-row INSERT + COMMIT per batch), with
+# many requests in flight at once. Writes real rows to DATABASE_URL.
+# Run from backend/:  DATABASE_URL=... python -m benchmarks.bench_write_behind
+import asyncio
+import time
+
+from app import crud, database, models
+from app.services.write_behind import WriteBehindBuffer, insert_applications
+
+REQUESTS = 2000
+CONCURRENCY = [1, 16, 64]
+
+def record(i):
+    return dict(
+        full_name=f"bench-{i}", income=50000.0, loan_amount=200000.0, credit_score=700,
+        age=35, years_employed=5, gender="M", status="APPROVED", risk_score=12.5,
+        user_id=None, risk_factors=[], model_version="bench",
+    )
+
+async def per_request_commit(rec):
+    async with database.AsyncSessionLocal() as db:
+        return await crud.save_loan_application_async(db, rec)
+
+async def run(save, concurrency):
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one(i):
+        async with semaphore:
+            return await save(record(i))
+
+    start = time.perf_counter()
+    rows = await asyncio.gather(*(one(i) for i in range(REQUESTS)))
+    return time.perf_counter() - start, rows
+
+async def main():
+    async with database.async_engine.begin() as conn:
+        await conn.run_sync(models.Base.metadata.create_all)
+
+    print(f"{'in flight':>10}{'per-request s':>15}{'write-behind s':>16}{'durable s':>11}{'speedup':>9}")
+    for concurrency in CONCURRENCY:
+        sync_seconds, _ = await run(per_request_commit, concurrency)
+
+        writer = WriteBehindBuffer(insert_applications, batch_size=500, flush_ms=10)
+        behind_seconds, _ = await run(writer.save, concurrency)
+        await writer.stop()  # includes the final flush
+
+        writer = WriteBehindBuffer(insert_applications, batch_size=500, flush_ms=10)
+        durable_seconds, rows = await run(lambda rec: writer.save(rec, durable=True), concurrency)
+        await writer.stop()
+        assert all(row.id is not None for row in rows)
+
+        print(f"{concurrency:>10}{sync_seconds:>15.3f}{behind_seconds:>16.3f}{durable_seconds:>11.3f}{sync_seconds / durable_seconds:>8.1f}x")
+    print("✅ Durable write-behind saves returned their generated ids")
+    await database.async_engine.dispose()
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,46 @@
+# migrations/env.py
+# Runs the migrations in versions/ against the API's database (app/database.py's
+# DATABASE_URL), with app/models.py as the target for --autogenerate.
+from logging.config import fileConfig
+
+from alembic import context
+from sqlalchemy import create_engine, text
+from sqlalchemy.pool import NullPool
+
+from app import database, models
+
+config = context.config
+
+# From the alembic CLI only: inside the API the server's logging stays as it is
+if config.config_file_name is not None and config.attributes.get("configure_logging", True):
+    fileConfig(config.config_file_name, disable_existing_loggers=False)
+
+target_metadata = models.Base.metadata
+
+# Every API worker migrates at startup: on Postgres one takes this lock and
+# migrates, the others wait for it and then find nothing left to do
+MIGRATION_LOCK_KEY = 72_410_019
+
+def run_migrations_offline():
+    """`alembic upgrade head --sql`: print the SQL instead of running it."""
+    context.configure(url=database.SQLALCHEMY_DATABASE_URL, target_metadata=target_metadata, literal_binds=True)
+    with context.begin_transaction():
+        context.run_migrations()
+
+def run_migrations_online():
+    engine = create_engine(database.SQLALCHEMY_DATABASE_URL, poolclass=NullPool)
+    with engine.connect() as connection:
+        if connection.dialect.name == "postgresql":
+            # Session-level: released when the connection closes
+            connection.execute(text("SELECT pg_advisory_lock(:key)"), {"key": MIGRATION_LOCK_KEY})
+            connection.commit()
+        # SQLite can't ALTER most things in place: batch mode rebuilds the table
+        context.configure(connection=connection, target_metadata=target_metadata, render_as_batch=connection.dialect.name == "sqlite")
+        with context.begin_transaction():
+            context.run_migrations()
+    engine.dispose()
+
+if context.is_offline_mode():
+    run_migrations_offline()
+else:
+    run_migrations_online()
@@ -0,0 +1,137 @@
+"""Baseline: the schema as create_all() and migrate_db.py left it
+
+Revision ID: 0001
+Revises:
+Create Date: 2026-10-18
+
+Until now tables came from Base.metadata.create_all() at startup, plus
+migrate_db.py for columns added later. This revision brings any of those
+databases to the same place: missing tables are created, and existing ones
+get whichever columns and indexes they are missing. A fresh database just
+gets the tables.
+"""
+from typing import Sequence, Union
+
+from alembic import context, op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0001"
+down_revision: Union[str, Sequence[str], None] = None
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def created_at():
+    return sa.Column("created_at", sa.DateTime(timezone=True), server_default=sa.func.now())
+
+
+# table -> (columns, indexes as (name, columns, unique))
+TABLES = {
+    "loan_applications": (
+        lambda: [
+            sa.Column("id", sa.Integer(), primary_key=True),
+            sa.Column("full_name", sa.String()),
+            sa.Column("income", sa.Float()),
+            sa.Column("loan_amount", sa.Float()),
+            sa.Column("credit_score", sa.Integer()),
+            sa.Column("age", sa.Integer()),
+            sa.Column("years_employed", sa.Integer()),
+            sa.Column("gender", sa.String()),
+            sa.Column("status", sa.String()),
+            sa.Column("risk_score", sa.Float()),
+            sa.Column("user_id", sa.Integer(), nullable=True),
+            sa.Column("risk_factors", sa.String(), nullable=True),
+            sa.Column("model_version", sa.String(), nullable=True),
+            created_at(),
+        ],
+        [
+            ("ix_loan_applications_id", ["id"], False),
+            ("ix_loan_applications_full_name", ["full_name"], False),
+            ("ix_loan_applications_user_created", ["user_id", "created_at", "id"], False),
+            ("ix_loan_applications_created", ["created_at", "id"], False),
+        ],
+    ),
+    "users": (
+        lambda: [
+            sa.Column("id", sa.Integer(), primary_key=True),
+            sa.Column("email", sa.String()),
+            sa.Column("hashed_password", sa.String()),
+            sa.Column("full_name", sa.String()),
+            created_at(),
+        ],
+        [
+            ("ix_users_id", ["id"], False),
+            ("ix_users_email", ["email"], True),
+        ],
+    ),
+    "risk_analysis_history": (
+        lambda: [
+            sa.Column("id", sa.Integer(), primary_key=True),
+            sa.Column("user_id", sa.Integer()),
+            sa.Column("filename", sa.String()),
+            sa.Column("result", sa.String()),
+            created_at(),
+        ],
+        [
+            ("ix_risk_analysis_history_id", ["id"], False),
+            ("ix_risk_analysis_history_user_created", ["user_id", "created_at", "id"], False),
+        ],
+    ),
+    "statement_jobs": (
+        lambda: [
+            sa.Column("id", sa.String(), primary_key=True),
+            sa.Column("user_id", sa.Integer(), nullable=True),
+            sa.Column("filename", sa.String()),
+            sa.Column("status", sa.String()),
+            sa.Column("error", sa.String(), nullable=True),
+            sa.Column("history_id", sa.Integer(), nullable=True),
+            created_at(),
+            sa.Column("started_at", sa.DateTime(timezone=True), nullable=True),
+            sa.Column("finished_at", sa.DateTime(timezone=True), nullable=True),
+        ],
+        [
+            ("ix_statement_jobs_user_id", ["user_id"], False),
+        ],
+    ),
+}
+
+
+# Single-column user_id indexes from before the (user_id, created_at, id) ones, which cover them
+SUPERSEDED_INDEXES = {
+    "loan_applications": ["ix_loan_applications_user_id"],
+    "risk_analysis_history": ["ix_risk_analysis_history_user_id"],
+}
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # --sql (offline) can't look at the database: it writes the script for an empty one
+    inspector = None if context.is_offline_mode() else sa.inspect(op.get_bind())
+    existing_tables = set(inspector.get_table_names()) if inspector else set()
+
+    for table, (columns, indexes) in TABLES.items():
+        if table not in existing_tables:
+            op.create_table(table, *columns())
+            existing_indexes = set()
+        else:
+            # An older create_all() table: add what migrate_db.py used to (user_id, risk_factors, model_version...)
+            existing_columns = {column["name"] for column in inspector.get_columns(table)}
+            for column in columns():
+                if column.name not in existing_columns and not column.primary_key:
+                    op.add_column(table, column)
+            existing_indexes = {index["name"] for index in inspector.get_indexes(table)}
+
+        for name, index_columns, unique in indexes:
+            if name not in existing_indexes:
+                op.create_index(name, table, index_columns, unique=unique)
+        for name in SUPERSEDED_INDEXES.get(table, []):
+            if name in existing_indexes:
+                op.drop_index(name, table_name=table)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    for table in reversed(list(TABLES)):
+        op.drop_table(table)
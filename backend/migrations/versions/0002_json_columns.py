@@ -0,0 +1,76 @@
+"""risk_factors and analysis results as JSON(B) instead of json.dumps strings
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-18
+
+Postgres: the text columns are converted in place to JSONB. SQLite: the JSON
+type is stored as text anyway, so only the declared type changes (batch mode
+rebuilds the table). Either way, empty strings (which never parsed) become NULL.
+
+Old rows were written with plain json.dumps, which emits bare NaN / Infinity /
+-Infinity for non-finite floats (e.g. average_balance over a blank
+closingbalance cell). jsonb refuses those tokens, so such documents are
+rewritten first with the non-finite values as null.
+"""
+import json
+import math
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0002"
+down_revision: Union[str, Sequence[str], None] = "0001"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+COLUMNS = [("loan_applications", "risk_factors"), ("risk_analysis_history", "result")]
+
+# models.JSONDocument as of this revision
+JSON_DOCUMENT = sa.JSON().with_variant(postgresql.JSONB(), "postgresql")
+
+
+def _finite(document):
+    # NaN / Infinity -> None, anywhere in the document
+    if isinstance(document, float):
+        return document if math.isfinite(document) else None
+    if isinstance(document, dict):
+        return {key: _finite(value) for key, value in document.items()}
+    if isinstance(document, list):
+        return [_finite(value) for value in document]
+    return document
+
+
+def _drop_non_finite(table, column):
+    conn = op.get_bind()
+    rows = conn.execute(sa.text(
+        f"SELECT id, {column} FROM {table} WHERE {column} LIKE '%NaN%' OR {column} LIKE '%Infinity%'"
+    )).all()
+    for row_id, text in rows:
+        try:
+            document = json.loads(text)  # Python's json reads the bare tokens back as floats
+        except ValueError:
+            continue
+        cleaned = json.dumps(_finite(document))
+        if cleaned != text:
+            conn.execute(sa.text(f"UPDATE {table} SET {column} = :value WHERE id = :id"), {"value": cleaned, "id": row_id})
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    for table, column in COLUMNS:
+        op.execute(f"UPDATE {table} SET {column} = NULL WHERE {column} = ''")
+        _drop_non_finite(table, column)
+        with op.batch_alter_table(table) as batch:
+            batch.alter_column(column, type_=JSON_DOCUMENT, existing_type=sa.String(), postgresql_using=f"{column}::jsonb")
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    for table, column in COLUMNS:
+        with op.batch_alter_table(table) as batch:
+            batch.alter_column(column, type_=sa.String(), existing_type=JSON_DOCUMENT, postgresql_using=f"{column}::text")
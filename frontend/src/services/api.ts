@@ -66,11 +66,26 @@ export interface AuthResponse {
 export interface HistoryItem {
     id: number;
     filename: string;
-    result: string; // JSON string
+    result: Record<string, unknown>; // The statement analysis, already parsed
     created_at: string;
 }
 
 // 3. The API Functions
+
+// Listing endpoints return one page at a time; the next page's cursor comes back in
+// X-Next-Cursor (absent on the last page). Follows it until every row is in.
+const fetchAllPages = async <T>(path: string) => {
+    const rows: T[] = [];
+    let cursor: string | undefined;
+    do {
+        const response = await api.get<T[]>(path, { params: cursor ? { cursor } : undefined });
+        rows.push(...response.data);
+        const next = response.headers['x-next-cursor'];
+        cursor = typeof next === 'string' && next ? next : undefined;
+    } while (cursor);
+    return rows;
+};
+
 export const registerUser = async (user: User) => {
     const response = await api.post('/register', user);
     return response.data;
@@ -86,8 +101,7 @@ export const loginUser = async (credentials: FormData) => {
 };
 
 export const fetchHistory = async () => {
-    const response = await api.get<HistoryItem[]>('/history');
-    return response.data;
+    return fetchAllPages<HistoryItem>('/history');
 };
 
 export const submitApplication = async (data: LoanApplication) => {
@@ -96,13 +110,11 @@ export const submitApplication = async (data: LoanApplication) => {
 };
 
 export const fetchApplications = async () => {
-    const response = await api.get<LoanResponse[]>('/applications');
-    return response.data;
+    return fetchAllPages<LoanResponse>('/applications');
 };
 
 export const fetchLoanHistory = async () => {
-    const response = await api.get<LoanResponse[]>('/loan-history');
-    return response.data;
+    return fetchAllPages<LoanResponse>('/loan-history');
 };
 
 export const verifyIncome = async (claimed_salary: number) => {